@@ -0,0 +1,51 @@
+import fcntl
+import os
+import tempfile
+from contextlib import contextmanager
+
+# Lock file taken around builds and reloads of an index directory
+LOCK_FILE = ".build.lock"
+
+
+def temp_path(path: str) -> str:
+    """
+    Create a uniquely named empty file next to path, to be written and then
+    os.replace-d over it. Unlike a fixed "<path>.tmp", two processes (or
+    threads) writing the same file never share a temporary name.
+    """
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    os.close(fd)
+    # mkstemp creates 0600 files; the replaced file is read by other workers
+    os.chmod(tmp_path, 0o644)
+    return tmp_path
+
+
+@contextmanager
+def atomic_write(path: str, mode: str = 'wb'):
+    """Open a temporary file for writing and move it over path once it is written"""
+    tmp_path = temp_path(path)
+    try:
+        with open(tmp_path, mode) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+@contextmanager
+def directory_lock(directory: str):
+    """
+    Hold an exclusive flock on a lock file in directory. Blocks until any
+    other process (or thread) holding it is done, so builds of a shared index
+    directory run one at a time across workers.
+    """
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, LOCK_FILE), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,117 @@
+import os
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .atomic_files import atomic_write
+
+BM25_INDEX_FILE = "bm25_index.npz"
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Rank offset of reciprocal rank fusion; larger values flatten the gap between top ranks
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, accent-free word tokens"""
+    text = unicodedata.normalize('NFKD', text.lower())
+    return TOKEN.findall("".join(c for c in text if not unicodedata.combining(c)))
+
+
+class BM25Index:
+    """
+    Okapi BM25 over the document texts. Postings are stored as flat arrays
+    (document ids and precomputed per-posting weights, sliced per term by
+    offsets), so scoring a query is one weighted bincount over the postings
+    of its terms.
+    """
+
+    def __init__(self, terms: np.ndarray, offsets: np.ndarray, docs: np.ndarray, weights: np.ndarray, num_documents: int):
+        self.terms = terms
+        self.offsets = offsets
+        self.docs = docs
+        self.weights = weights
+        self.num_documents = num_documents
+        self._term_ids: Dict[str, int] = {term: i for i, term in enumerate(terms.tolist())}
+
+    @classmethod
+    def from_texts(cls, texts: Iterable[str], k1: float = BM25_K1, b: float = BM25_B) -> "BM25Index":
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        lengths = []
+        for doc, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings[term].append((doc, tf))
+        num_documents = len(lengths)
+        lengths = np.asarray(lengths, dtype=np.float32)
+        average_length = float(lengths.mean()) if num_documents else 0.0
+
+        terms = sorted(postings)
+        counts = np.asarray([len(postings[term]) for term in terms], dtype=np.int64)
+        docs = np.asarray([doc for term in terms for doc, _ in postings[term]], dtype=np.int32)
+        tf = np.asarray([tf for term in terms for _, tf in postings[term]], dtype=np.float32)
+        # Query-independent part of each posting's score: idf * saturated, length-normalized tf
+        idf = np.log(1 + (num_documents - counts + 0.5) / (counts + 0.5)).astype(np.float32)
+        norm = k1 * (1 - b + b * lengths[docs] / max(average_length, 1e-9))
+        weights = np.repeat(idf, counts) * tf * (k1 + 1) / (tf + norm)
+        return cls(
+            np.asarray(terms, dtype=str),
+            np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+            docs, weights.astype(np.float32), num_documents
+        )
+
+    def save(self, directory: str):
+        path = os.path.join(directory, BM25_INDEX_FILE)
+        with atomic_write(path) as f:
+            np.savez(
+                f, terms=self.terms, offsets=self.offsets, docs=self.docs,
+                weights=self.weights, num_documents=self.num_documents
+            )
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["BM25Index"]:
+        path = os.path.join(directory, BM25_INDEX_FILE)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return cls(data['terms'], data['offsets'], data['docs'], data['weights'], int(data['num_documents']))
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every document for a query; repeated query terms count repeatedly"""
+        postings = [
+            (self.offsets[term], self.offsets[term + 1], count)
+            for term, count in Counter(
+                self._term_ids[token] for token in tokenize(query) if token in self._term_ids
+            ).items()
+        ]
+        if not postings:
+            return np.zeros(self.num_documents, dtype=np.float32)
+        docs = np.concatenate([self.docs[start:end] for start, end, _ in postings])
+        weights = np.concatenate([self.weights[start:end] * count for start, end, count in postings])
+        return np.bincount(docs, weights=weights, minlength=self.num_documents).astype(np.float32)
+
+    def search(self, query: str, k: int, mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Scores and ids of the k best matching documents, best first; only documents with a match count"""
+        scores = self.scores(query)
+        if mask is not None:
+            scores[~mask] = 0
+        ids = np.flatnonzero(scores > 0)
+        if len(ids) > k:
+            ids = ids[np.argpartition(-scores[ids], k)[:k]]
+        ids = ids[np.argsort(-scores[ids], kind='stable')]
+        return scores[ids], ids
+
+
+def reciprocal_rank_fusion(rankings: List[np.ndarray], k: int = RRF_K) -> np.ndarray:
+    """Ids from several best-first rankings, ordered by the sum of 1 / (k + rank) across them"""
+    fused: Dict[int, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, i in enumerate(ranking.tolist()):
+            fused[i] += 1.0 / (k + rank + 1)
+    return np.asarray(sorted(fused, key=fused.get, reverse=True), dtype=np.int64)
@@ -0,0 +1,113 @@
+import json
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .atomic_files import atomic_write, temp_path
+
+CATALOG_CACHE_DIR = os.getenv("CATALOG_CACHE_DIR", "data/catalog_cache")
+CATALOG_CACHE_MANIFEST = "catalog.json"
+
+# Bump whenever the cached columns change meaning, so older caches are rebuilt
+CATALOG_CACHE_VERSION = 1
+STRING_COLUMNS = ('name', 'category', 'glass_type', 'alcoholic', 'instructions', 'ingredients_text')
+LIST_COLUMNS = ('ingredient_names',)
+
+# Values are NUL-terminated UTF-8, so a whole column decodes with one split
+SEPARATOR = "\x00"
+
+
+def _column_path(directory: str, column: str) -> str:
+    return os.path.join(directory, f"{column}.utf8")
+
+
+def _counts_path(directory: str, column: str) -> str:
+    return os.path.join(directory, f"{column}.counts.npy")
+
+
+def _encode(values: List[str]) -> bytes:
+    return "".join(value.replace(SEPARATOR, "") + SEPARATOR for value in values).encode('utf-8')
+
+
+class CatalogCacheWriter:
+    """
+    Writes the parsed catalog column by column, one chunk at a time.
+
+    Files are written under unique temporary names and only renamed into
+    place by commit(), after the old manifest has been removed, so a reader
+    never pairs a manifest with half-written columns.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.rows = 0
+        os.makedirs(directory, exist_ok=True)
+        self._tmp_paths = {
+            column: temp_path(_column_path(directory, column))
+            for column in STRING_COLUMNS + LIST_COLUMNS
+        }
+        self._files = {column: open(path, 'wb') for column, path in self._tmp_paths.items()}
+        self._counts: Dict[str, List[np.ndarray]] = {column: [] for column in LIST_COLUMNS}
+
+    def write(self, columns: Dict[str, List]):
+        """Append one chunk of rows"""
+        for column in STRING_COLUMNS:
+            self._files[column].write(_encode(columns[column]))
+        for column in LIST_COLUMNS:
+            values = columns[column]
+            self._counts[column].append(np.fromiter((len(v) for v in values), dtype=np.int32, count=len(values)))
+            self._files[column].write(_encode([item for v in values for item in v]))
+        self.rows += len(columns[STRING_COLUMNS[0]])
+
+    def commit(self, catalog_sha256: str):
+        """Move the written columns into place and record which catalog they came from"""
+        manifest_path = os.path.join(self.directory, CATALOG_CACHE_MANIFEST)
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+        for column, f in self._files.items():
+            f.close()
+            os.replace(self._tmp_paths[column], _column_path(self.directory, column))
+        for column, counts in self._counts.items():
+            counts = np.concatenate(counts) if counts else np.empty(0, dtype=np.int32)
+            with atomic_write(_counts_path(self.directory, column)) as f:
+                np.save(f, counts)
+
+        with atomic_write(manifest_path, 'w') as f:
+            json.dump({'version': CATALOG_CACHE_VERSION, 'catalog_sha256': catalog_sha256, 'rows': self.rows}, f)
+
+    def abort(self):
+        for column, f in self._files.items():
+            f.close()
+            if os.path.exists(self._tmp_paths[column]):
+                os.remove(self._tmp_paths[column])
+
+
+def load_catalog_cache(directory: str, catalog_sha256: str) -> Optional[Dict[str, List]]:
+    """Cached columns for the catalog with this hash, or None if there is no usable cache"""
+    try:
+        with open(os.path.join(directory, CATALOG_CACHE_MANIFEST)) as f:
+            manifest = json.load(f)
+        if manifest.get('version') != CATALOG_CACHE_VERSION or manifest.get('catalog_sha256') != catalog_sha256:
+            return None
+        rows = manifest['rows']
+
+        columns: Dict[str, List] = {}
+        for column in STRING_COLUMNS + LIST_COLUMNS:
+            with open(_column_path(directory, column), 'rb') as f:
+                values = f.read().decode('utf-8').split(SEPARATOR)[:-1]
+            if column in LIST_COLUMNS:
+                counts = np.load(_counts_path(directory, column))
+                if len(counts) != rows or int(counts.sum()) != len(values):
+                    return None
+                ends = np.cumsum(counts).tolist()
+                values = [values[end - count:end] for end, count in zip(ends, counts.tolist())]
+            elif len(values) != rows:
+                return None
+            columns[column] = values
+        return columns
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Could not load catalog cache: {str(e)}")
+        return None
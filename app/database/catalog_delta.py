@@ -0,0 +1,69 @@
+import hashlib
+import os
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .atomic_files import atomic_write
+
+ROW_HASHES_FILE = "row_hashes.npy"
+ROW_HASH_BYTES = 16
+
+
+def row_hashes(texts: Iterable[str]) -> np.ndarray:
+    """Content hash of each document text; rows with equal text share a vector"""
+    return np.asarray(
+        [hashlib.blake2b(text.encode('utf-8'), digest_size=ROW_HASH_BYTES).digest() for text in texts],
+        dtype=f"S{ROW_HASH_BYTES}"
+    )
+
+
+def save_row_hashes(directory: str, hashes: np.ndarray):
+    path = os.path.join(directory, ROW_HASHES_FILE)
+    with atomic_write(path) as f:
+        np.save(f, hashes)
+
+
+def load_row_hashes(directory: str) -> Optional[np.ndarray]:
+    path = os.path.join(directory, ROW_HASHES_FILE)
+    if not os.path.exists(path):
+        return None
+    return np.load(path)
+
+
+class CatalogDelta:
+    """
+    Difference between the rows an index was built from and the current catalog.
+
+    Old rows whose text is still present are kept at their relative position;
+    rows that are new or changed are appended after them. new_order lists, for
+    each position of the updated index, the catalog row stored there.
+    """
+
+    def __init__(self, old_hashes: np.ndarray, new_hashes: np.ndarray):
+        old_positions: Dict[bytes, List[int]] = defaultdict(list)
+        for position, digest in enumerate(old_hashes.tolist()):
+            old_positions[digest].append(position)
+
+        # Old position reused by each catalog row, or -1 if the row must be embedded
+        source = np.full(len(new_hashes), -1, dtype=np.int64)
+        for row, digest in enumerate(new_hashes.tolist()):
+            positions = old_positions.get(digest)
+            if positions:
+                source[row] = positions.pop(0)
+
+        reused = source >= 0
+        kept_rows = np.flatnonzero(reused)
+        kept_rows = kept_rows[np.argsort(source[kept_rows], kind='stable')]
+        self.kept = source[kept_rows]
+        self.removed = np.setdiff1d(np.arange(len(old_hashes)), self.kept)
+        self.added = np.flatnonzero(~reused)
+        self.new_order = np.concatenate([kept_rows, self.added])
+
+    @property
+    def unchanged(self) -> bool:
+        return not len(self.added) and not len(self.removed)
+
+    def summary(self) -> Dict[str, int]:
+        return {'kept': len(self.kept), 'added': len(self.added), 'removed': len(self.removed)}
@@ -0,0 +1,176 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Optional
+
+FAVORITES_DB_PATH = os.getenv("FAVORITES_DB_PATH", "data/favorites.sqlite")
+FAVORITES_CACHE_USERS = int(os.getenv("FAVORITES_CACHE_USERS", "10000"))
+LEGACY_FAVORITES_FILE = "data/favorites.json"
+
+# Favorites of requests that carry no session or user id, and of the legacy
+# favorites.json until they are claimed by a session
+DEFAULT_USER = "default"
+
+
+class FavoritesStore:
+    """
+    Favorite ingredients per user, stored one row per (user, ingredient) in
+    SQLite (WAL mode) so every add or remove is a single atomic row write and
+    several worker processes can share the file.
+
+    Reads go through an in-process LRU cache of favorites sets. The cache is
+    dropped whenever SQLite's data_version shows another connection (another
+    worker) has committed since the last read, so workers never serve stale
+    favorites. Each process opens its own connection on first use, so a
+    store created in a preloading gunicorn master is safe in forked workers.
+    """
+
+    def __init__(self, path: str = FAVORITES_DB_PATH, cache_users: int = FAVORITES_CACHE_USERS):
+        self.path = path
+        self.cache_users = cache_users
+        self._cache: "OrderedDict[str, FrozenSet[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'cache_hits': 0, 'reads': 0, 'writes': 0}
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_pid: Optional[int] = None
+        self._data_version = 0
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # The lock may have been held by another thread of the parent at fork time
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        """This process's connection, opened on first use; caller holds _lock"""
+        if self._db is not None and self._db_pid == os.getpid():
+            return self._db
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        db = sqlite3.connect(self.path, check_same_thread=False, timeout=30, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS favorites ("
+            "user_id TEXT NOT NULL, ingredient TEXT NOT NULL, added_at REAL NOT NULL, "
+            "PRIMARY KEY (user_id, ingredient)) WITHOUT ROWID"
+        )
+        self._db, self._db_pid = db, os.getpid()
+        # The cache may have been filled through the parent's connection
+        self._cache.clear()
+        self._data_version = self._current_data_version()
+        self._import_legacy_file()
+        return db
+
+    def _current_data_version(self) -> int:
+        return self._db.execute("PRAGMA data_version").fetchone()[0]
+
+    def _import_legacy_file(self):
+        """Copy favorites from the old whole-file JSON store into the default user, once per database"""
+        try:
+            # The write lock makes concurrently starting workers import at most once
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if self._db.execute("PRAGMA user_version").fetchone()[0] == 0:
+                    if os.path.exists(LEGACY_FAVORITES_FILE):
+                        with open(LEGACY_FAVORITES_FILE, 'r') as f:
+                            ingredients = json.load(f)
+                        now = time.time()
+                        self._db.executemany(
+                            "INSERT OR IGNORE INTO favorites (user_id, ingredient, added_at) VALUES (?, ?, ?)",
+                            [(DEFAULT_USER, str(ingredient).lower(), now) for ingredient in ingredients]
+                        )
+                    self._db.execute("PRAGMA user_version = 1")
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        except Exception as e:
+            print(f"Error importing legacy favorites: {e}")
+
+    def _cache_put(self, user_id: str, favorites: FrozenSet[str]):
+        self._cache[user_id] = favorites
+        self._cache.move_to_end(user_id)
+        while len(self._cache) > self.cache_users:
+            self._cache.popitem(last=False)
+
+    def get(self, user_id: Optional[str] = None) -> FrozenSet[str]:
+        """Favorites of a user"""
+        user_id = user_id or DEFAULT_USER
+        with self._lock:
+            self._connection()
+            version = self._current_data_version()
+            if version != self._data_version:
+                self._cache.clear()
+                self._data_version = version
+            favorites = self._cache.get(user_id)
+            if favorites is not None:
+                self._cache.move_to_end(user_id)
+                self.stats['cache_hits'] += 1
+                return favorites
+            rows = self._db.execute(
+                "SELECT ingredient FROM favorites WHERE user_id = ?", (user_id,)
+            ).fetchall()
+            favorites = frozenset(ingredient for ingredient, in rows)
+            self._cache_put(user_id, favorites)
+            self.stats['reads'] += 1
+            return favorites
+
+    def add(self, user_id: Optional[str], ingredient: str) -> bool:
+        """Add an ingredient; False if it was already a favorite"""
+        user_id = user_id or DEFAULT_USER
+        with self._lock:
+            changed = self._connection().execute(
+                "INSERT OR IGNORE INTO favorites (user_id, ingredient, added_at) VALUES (?, ?, ?)",
+                (user_id, ingredient, time.time())
+            ).rowcount > 0
+            self._after_write(user_id)
+            return changed
+
+    def remove(self, user_id: Optional[str], ingredient: str) -> bool:
+        """Remove an ingredient; False if it was not a favorite"""
+        user_id = user_id or DEFAULT_USER
+        with self._lock:
+            changed = self._connection().execute(
+                "DELETE FROM favorites WHERE user_id = ? AND ingredient = ?", (user_id, ingredient)
+            ).rowcount > 0
+            self._after_write(user_id)
+            return changed
+
+    def claim(self, user_id: str, from_user: str = DEFAULT_USER) -> int:
+        """
+        Move every favorite of from_user (by default the legacy import) to
+        user_id, keeping user_id's own favorites; returns how many moved.
+        """
+        with self._lock:
+            db = self._connection()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.execute(
+                    "INSERT OR IGNORE INTO favorites (user_id, ingredient, added_at) "
+                    "SELECT ?, ingredient, added_at FROM favorites WHERE user_id = ?",
+                    (user_id, from_user)
+                )
+                moved = db.execute("DELETE FROM favorites WHERE user_id = ?", (from_user,)).rowcount
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+            self._after_write(user_id)
+            self._cache.pop(from_user, None)
+            return moved
+
+    def _after_write(self, user_id: str):
+        # Our own commits do not change data_version, so refresh just this user's entry
+        self._cache.pop(user_id, None)
+        self.stats['writes'] += 1
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats['cached_users'] = len(self._cache)
+            stats['users'] = self._connection().execute("SELECT COUNT(DISTINCT user_id) FROM favorites").fetchone()[0]
+        return stats
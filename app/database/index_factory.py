@@ -0,0 +1,212 @@
+import math
+import os
+from typing import Dict, Optional, Tuple
+
+import faiss
+import numpy as np
+
+# "auto" picks by catalog size; "flat" is exact, "ivf" and "hnsw" are approximate
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "auto").lower()
+INDEX_TYPES = ("flat", "ivf", "hnsw")
+# Catalog sizes up to which "auto" uses each index type; larger catalogs get IVF
+AUTO_FLAT_MAX = int(os.getenv("AUTO_FLAT_MAX", "20000"))
+AUTO_HNSW_MAX = int(os.getenv("AUTO_HNSW_MAX", "500000"))
+
+# How vectors are stored in the index: "fp32" (exact), "fp16", "sq8" (8-bit scalar
+# quantization) or "pq" (product quantization, PQ_M sub-vectors of PQ_NBITS bits)
+VECTOR_ENCODING = os.getenv("VECTOR_ENCODING", "fp32").lower()
+ENCODINGS = ("fp32", "fp16", "sq8", "pq")
+PQ_M = int(os.getenv("PQ_M", "0"))  # 0 picks dimension / 16
+PQ_NBITS = int(os.getenv("PQ_NBITS", "8"))
+
+# Build-time parameters (part of the index manifest)
+HNSW_M = int(os.getenv("HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "80"))
+IVF_TRAINING_POINTS_PER_LIST = 64
+MAX_TRAINING_POINTS = 100000
+
+# Search-time parameters; changing them needs no rebuild
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+# Compressed indexes fetch RERANK_FACTOR * k candidates and reorder them by exact distance
+VECTOR_RERANK = os.getenv("VECTOR_RERANK", "true").lower() == "true"
+RERANK_FACTOR = int(os.getenv("RERANK_FACTOR", "4"))
+
+
+def build_options() -> Dict:
+    """Configured build-time settings; an index built with different ones is rebuilt"""
+    return {
+        'index_type': VECTOR_INDEX_TYPE,
+        'hnsw_m': HNSW_M,
+        'hnsw_ef_construction': HNSW_EF_CONSTRUCTION,
+        'encoding': VECTOR_ENCODING,
+        'pq_m': PQ_M,
+        'pq_nbits': PQ_NBITS,
+    }
+
+
+def choose_index_type(num_vectors: int, index_type: str = VECTOR_INDEX_TYPE) -> str:
+    """Resolve "auto" to a concrete index type for a catalog size"""
+    if index_type != "auto":
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown VECTOR_INDEX_TYPE {index_type!r}; expected auto or one of {INDEX_TYPES}")
+        return index_type
+    if num_vectors <= AUTO_FLAT_MAX:
+        return "flat"
+    if num_vectors <= AUTO_HNSW_MAX:
+        return "hnsw"
+    return "ivf"
+
+
+def ivf_nlist(num_vectors: int) -> int:
+    """Number of IVF lists: about 4 * sqrt(n), with enough training points per list"""
+    return max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // IVF_TRAINING_POINTS_PER_LIST))
+
+
+def pq_code(num_vectors: int, dimension: int) -> str:
+    """PQ code string: sub-vector count dividing the dimension, and bits the catalog can train"""
+    m = PQ_M or max(1, dimension // 16)
+    while dimension % m:
+        m -= 1
+    nbits = max(1, min(PQ_NBITS, int(math.log2(max(num_vectors, 2)))))
+    # The HNSW factory syntax only accepts the default 8 bits, spelled without "x8"
+    return f"PQ{m}" if nbits == 8 else f"PQ{m}x{nbits}"
+
+
+def factory_string(index_type: str, num_vectors: int, dimension: int, encoding: str = VECTOR_ENCODING) -> str:
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown VECTOR_ENCODING {encoding!r}; expected one of {ENCODINGS}")
+    code = {
+        "fp32": "Flat", "fp16": "SQfp16", "sq8": "SQ8", "pq": pq_code(num_vectors, dimension)
+    }[encoding]
+    if index_type == "flat":
+        # IndexPQ rejects ID selectors, so flat PQ is a single IVF list (still exhaustive)
+        return f"IVF1,{code}" if encoding == "pq" else code
+    if index_type == "hnsw":
+        if "x" in code:
+            raise ValueError("HNSW with PQ encoding needs PQ_NBITS=8")
+        return f"HNSW{HNSW_M}" if encoding == "fp32" else f"HNSW{HNSW_M}_{code}"
+    return f"IVF{ivf_nlist(num_vectors)},{code}"
+
+
+def build_index(
+    vectors: np.ndarray, index_type: str, encoding: str = VECTOR_ENCODING, seed: int = 1234
+) -> faiss.Index:
+    """Build and fill an L2 index of the given type and encoding over vectors, in row order"""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    num_vectors, dimension = vectors.shape
+    index = faiss.index_factory(
+        dimension, factory_string(index_type, num_vectors, dimension, encoding), faiss.METRIC_L2
+    )
+
+    if index_type == "hnsw":
+        faiss.downcast_index(index).hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    if not index.is_trained:
+        nlist = faiss.downcast_index(index).nlist if index_type == "ivf" else 1
+        sample_size = min(num_vectors, max(MAX_TRAINING_POINTS, nlist * IVF_TRAINING_POINTS_PER_LIST))
+        sample = vectors[np.random.default_rng(seed).choice(num_vectors, sample_size, replace=False)]
+        index.train(sample)
+    index.add(vectors)
+    if isinstance(faiss.downcast_index(index), faiss.IndexIVF):
+        # Stored vectors are looked up by id for preference reranking
+        faiss.downcast_index(index).make_direct_map()
+    configure_search(index)
+    return index
+
+
+def update_index(
+    index: faiss.Index, removed: np.ndarray, added_vectors: np.ndarray, vectors: np.ndarray
+) -> Optional[faiss.Index]:
+    """
+    Apply a catalog delta to a built index in place: drop the removed positions
+    (later positions shift down, keeping their order) and append added_vectors.
+    vectors holds every vector of the updated index, for index types that are
+    refilled instead. Returns None when the index needs a full build.
+    """
+    inner = faiss.downcast_index(index)
+    if len(removed):
+        if isinstance(inner, faiss.IndexFlatCodes):
+            inner.remove_ids(faiss.IDSelectorBatch(np.asarray(removed, dtype=np.int64)))
+        elif isinstance(inner, faiss.IndexIVF):
+            # Removing from IVF lists leaves gaps in the ids; refill the trained index instead
+            inner.make_direct_map(False)
+            inner.reset()
+            added_vectors = vectors
+        else:
+            # HNSW graphs cannot drop nodes
+            return None
+    if len(added_vectors):
+        index.add(np.ascontiguousarray(added_vectors, dtype=np.float32))
+    if isinstance(inner, faiss.IndexIVF):
+        inner.make_direct_map()
+    configure_search(index)
+    return index
+
+
+def index_type_of(index: faiss.Index) -> str:
+    """Index type of a loaded FAISS index"""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    return "flat"
+
+
+def is_exact(index: faiss.Index) -> bool:
+    """Whether the index stores full float32 vectors, so its distances need no rerank"""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    return isinstance(index, (faiss.IndexFlat, faiss.IndexIVFFlat))
+
+
+def rerank_exact(
+    query_vectors: np.ndarray, ids: np.ndarray, vectors: np.ndarray, k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Reorder candidate ids by exact L2 distance to each query, keeping k; missing results have id -1"""
+    distances_out = np.full((len(query_vectors), k), np.inf, dtype=np.float32)
+    ids_out = np.full((len(query_vectors), k), -1, dtype=np.int64)
+    for row, (query, candidates) in enumerate(zip(query_vectors, ids)):
+        # Sorted ids read memory-mapped vectors in file order
+        candidates = np.unique(candidates[candidates >= 0])
+        if not len(candidates):
+            continue
+        diff = np.asarray(vectors[candidates], dtype=np.float32) - query
+        distances = np.einsum('ij,ij->i', diff, diff)
+        top = np.argsort(distances, kind='stable')[:k]
+        distances_out[row, :len(top)] = distances[top]
+        ids_out[row, :len(top)] = candidates[top]
+    return distances_out, ids_out
+
+
+def configure_search(index: faiss.Index, nprobe: int = IVF_NPROBE, ef_search: int = HNSW_EF_SEARCH):
+    """Apply search-time parameters to an index, for searches that pass no SearchParameters"""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIVF):
+        index.nprobe = min(nprobe, index.nlist)
+    elif isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = ef_search
+
+
+def search_parameters(
+    index: faiss.Index, selector: Optional[faiss.IDSelector] = None,
+    nprobe: Optional[int] = None, ef_search: Optional[int] = None
+) -> faiss.SearchParameters:
+    """
+    SearchParameters of the type the index expects. Parameters passed to a
+    search replace the index's own settings, so nprobe / efSearch are always
+    filled in (from the index unless given).
+    """
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF()
+        params.nprobe = min(nprobe or index.nprobe, index.nlist)
+    elif isinstance(index, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = ef_search or index.hnsw.efSearch
+    else:
+        params = faiss.SearchParameters()
+    if selector is not None:
+        params.sel = selector
+    return params
@@ -0,0 +1,70 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Dict, Optional
+
+from .atomic_files import atomic_write
+
+MANIFEST_FILE = "manifest.json"
+
+# Bump whenever the document text or metadata produced for the index changes,
+# so persisted indexes built by older code are rebuilt instead of reused.
+INDEX_FORMAT_VERSION = 3
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    """Content hash of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_fingerprint(csv_path: str, embedding_model: str, build_options: Optional[Dict] = None) -> Dict:
+    """Describe the inputs an index was built from"""
+    return {
+        'format_version': INDEX_FORMAT_VERSION,
+        'catalog_sha256': file_sha256(csv_path),
+        'embedding_model': embedding_model,
+        'build_options': build_options or {},
+    }
+
+
+def load_manifest(directory: str) -> Optional[Dict]:
+    """Load the manifest stored next to a persisted index, if any"""
+    path = os.path.join(directory, MANIFEST_FILE)
+    try:
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                return json.load(f)
+    except Exception as e:
+        print(f"Error loading index manifest: {e}")
+    return None
+
+
+def save_manifest(directory: str, manifest: Dict):
+    """Atomically write the manifest next to a persisted index"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, MANIFEST_FILE)
+    with atomic_write(path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+
+def manifest_matches(manifest: Optional[Dict], fingerprint: Dict) -> bool:
+    """Check whether a persisted index was built from the given inputs"""
+    if not manifest:
+        return False
+    return all(manifest.get(key) == value for key, value in fingerprint.items())
+
+
+def new_manifest(fingerprint: Dict, dimension: int, num_documents: int, **details) -> Dict:
+    """Manifest for a freshly built index; details describe how it was built (e.g. index type)"""
+    return {
+        **fingerprint,
+        'dimension': dimension,
+        'num_documents': num_documents,
+        **details,
+        'built_at': datetime.now().isoformat(),
+    }
@@ -0,0 +1,117 @@
+import json
+import os
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .atomic_files import atomic_write
+
+INGREDIENT_INDEX_FILE = "ingredient_index.json"
+
+
+def normalize_ingredient(name: str) -> str:
+    """Lowercase an ingredient and reduce it to space-separated words"""
+    return " ".join(re.findall(r"[a-z0-9]+", name.lower()))
+
+
+class IngredientIndex:
+    """
+    Exact inverted index from normalized ingredient name to the sorted ids of
+    the cocktails that use it. Ids are positions in the vector index.
+
+    A query term matches every ingredient whose name contains all of the
+    term's words, so "lemon" matches "Lemon", "Lemon juice" and "Lemon peel"
+    but "gin" does not match "Ginger ale".
+    """
+
+    def __init__(self, postings: Dict[str, np.ndarray], num_documents: int):
+        self.postings = postings
+        self.num_documents = num_documents
+        self._names_by_word: Dict[str, set] = defaultdict(set)
+        for name in postings:
+            for word in name.split():
+                self._names_by_word[word].add(name)
+
+    @classmethod
+    def from_ingredient_lists(cls, ingredient_lists: Iterable[List[str]]) -> "IngredientIndex":
+        """Build the index from each cocktail's ingredient list, in id order"""
+        postings = defaultdict(list)
+        num_documents = 0
+        for doc_id, ingredients in enumerate(ingredient_lists):
+            num_documents += 1
+            for name in set(normalize_ingredient(i) for i in ingredients or []):
+                if name:
+                    postings[name].append(doc_id)
+        return cls({name: np.asarray(ids, dtype=np.int32) for name, ids in postings.items()}, num_documents)
+
+    def save(self, directory: str):
+        path = os.path.join(directory, INGREDIENT_INDEX_FILE)
+        with atomic_write(path, 'w') as f:
+            json.dump({
+                'num_documents': self.num_documents,
+                'postings': {name: ids.tolist() for name, ids in self.postings.items()}
+            }, f)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["IngredientIndex"]:
+        path = os.path.join(directory, INGREDIENT_INDEX_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as f:
+            data = json.load(f)
+        return cls(
+            {name: np.asarray(ids, dtype=np.int32) for name, ids in data['postings'].items()},
+            data['num_documents']
+        )
+
+    def matching_ingredients(self, term: str) -> List[str]:
+        """Ingredient names matched by a query term"""
+        words = normalize_ingredient(term).split()
+        if not words:
+            return []
+        names = set(self._names_by_word.get(words[0], ()))
+        for word in words[1:]:
+            names &= self._names_by_word.get(word, set())
+        # All words must also appear in order, e.g. "lemon juice" but not "juice lemon"
+        phrase = f" {' '.join(words)} "
+        return sorted(name for name in names if phrase in f" {name} ")
+
+    def lookup(self, term: str) -> np.ndarray:
+        """Sorted ids of cocktails containing any ingredient matched by term"""
+        ids = [self.postings[name] for name in self.matching_ingredients(term)]
+        if not ids:
+            return np.empty(0, dtype=np.int32)
+        if len(ids) == 1:
+            return ids[0]
+        return np.unique(np.concatenate(ids))
+
+    def query(
+        self,
+        all_of: Optional[List[str]] = None,
+        any_of: Optional[List[str]] = None,
+        none_of: Optional[List[str]] = None
+    ) -> np.ndarray:
+        """
+        Boolean ingredient query over posting lists. Returns sorted ids of
+        cocktails that contain every term in all_of, at least one term in
+        any_of (when given) and no term in none_of.
+        """
+        result = None
+        # Intersect the shortest lists first so the working set shrinks fastest
+        for ids in sorted((self.lookup(term) for term in all_of or []), key=len):
+            result = ids if result is None else np.intersect1d(result, ids, assume_unique=True)
+            if not len(result):
+                return result
+
+        if any_of:
+            union = np.unique(np.concatenate([self.lookup(term) for term in any_of]))
+            result = union if result is None else np.intersect1d(result, union, assume_unique=True)
+
+        if result is None:
+            result = np.arange(self.num_documents, dtype=np.int32)
+
+        for term in none_of or []:
+            result = np.setdiff1d(result, self.lookup(term), assume_unique=True)
+        return result
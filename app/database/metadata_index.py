@@ -0,0 +1,199 @@
+import os
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import faiss
+import numpy as np
+
+from .atomic_files import atomic_write
+from .index_factory import search_parameters
+
+METADATA_INDEX_FILE = "metadata_bitmaps.npz"
+FILTER_FIELDS = ('alcoholic', 'category', 'glass_type', 'type')
+
+# Approximate indexes answer filters matching at most this many cocktails with an
+# exact scan over them; HNSW / IVF searches with a selector miss most of a small set
+EXACT_FILTER_MAX = int(os.getenv("EXACT_FILTER_MAX", "1024"))
+# Short filtered results are retried with efSearch / nprobe this many times larger
+FILTER_RETRY_SCALE = 4
+FILTER_RETRIES = 3
+EXACT_SCAN_BLOCK = 65536
+
+
+def normalize_value(value) -> str:
+    return " ".join(str(value).lower().split())
+
+
+class MetadataIndex:
+    """
+    Per-field bitmaps over cocktail metadata, one bitmap per (field, value).
+
+    Bitmaps are stored packed (one bit per cocktail, little-endian bit order)
+    so they can be handed to FAISS as an IDSelectorBitmap and applied during
+    the search itself rather than after retrieval.
+    """
+
+    def __init__(self, bitmaps: Dict[str, Dict[str, np.ndarray]], num_documents: int):
+        self.bitmaps = bitmaps
+        self.num_documents = num_documents
+
+    @classmethod
+    def from_metadata(cls, metadatas: Iterable[Dict], fields=FILTER_FIELDS) -> "MetadataIndex":
+        """Build bitmaps from each cocktail's metadata, in id order"""
+        ids_by_value = {field: defaultdict(list) for field in fields}
+        num_documents = 0
+        for doc_id, metadata in enumerate(metadatas):
+            num_documents += 1
+            for field in fields:
+                if metadata.get(field) is not None:
+                    ids_by_value[field][normalize_value(metadata[field])].append(doc_id)
+
+        bitmaps = {}
+        for field, values in ids_by_value.items():
+            bitmaps[field] = {}
+            for value, ids in values.items():
+                mask = np.zeros(num_documents, dtype=bool)
+                mask[ids] = True
+                bitmaps[field][value] = np.packbits(mask, bitorder='little')
+        return cls(bitmaps, num_documents)
+
+    def save(self, directory: str):
+        path = os.path.join(directory, METADATA_INDEX_FILE)
+        arrays = {
+            f"{field}\x1f{value}": bitmap
+            for field, values in self.bitmaps.items()
+            for value, bitmap in values.items()
+        }
+        with atomic_write(path) as f:
+            np.savez(f, __num_documents__=np.asarray(self.num_documents), **arrays)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["MetadataIndex"]:
+        path = os.path.join(directory, METADATA_INDEX_FILE)
+        if not os.path.exists(path):
+            return None
+        bitmaps = defaultdict(dict)
+        with np.load(path) as data:
+            num_documents = int(data['__num_documents__'])
+            for key in data.files:
+                if key == '__num_documents__':
+                    continue
+                field, value = key.split('\x1f', 1)
+                bitmaps[field][value] = data[key]
+        return cls(dict(bitmaps), num_documents)
+
+    def values(self, field: str) -> List[str]:
+        """Known values of a field"""
+        return sorted(self.bitmaps.get(field, {}))
+
+    def bitmap(self, filters: Dict[str, Union[str, List[str]]]) -> np.ndarray:
+        """
+        Packed bitmap of cocktails matching all fields in filters. A list of
+        values matches any of them; an unknown field or value matches nothing.
+        """
+        size = (self.num_documents + 7) // 8
+        result = None
+        for field, wanted in filters.items():
+            if isinstance(wanted, str) or not isinstance(wanted, (list, tuple, set)):
+                wanted = [wanted]
+            field_bitmap = np.zeros(size, dtype=np.uint8)
+            for value in wanted:
+                bitmap = self.bitmaps.get(field, {}).get(normalize_value(value))
+                if bitmap is not None:
+                    field_bitmap |= bitmap
+            result = field_bitmap if result is None else result & field_bitmap
+        if result is None:
+            result = np.packbits(np.ones(self.num_documents, dtype=bool), bitorder='little')
+        return result
+
+    def mask(self, filters: Dict[str, Union[str, List[str]]]) -> np.ndarray:
+        """Boolean mask of cocktails matching filters"""
+        return np.unpackbits(self.bitmap(filters), count=self.num_documents, bitorder='little').astype(bool)
+
+    def count(self, filters: Dict[str, Union[str, List[str]]]) -> int:
+        return int(np.unpackbits(self.bitmap(filters)).sum())
+
+
+def ids_to_bitmap(ids: np.ndarray, num_documents: int) -> np.ndarray:
+    """Packed bitmap with the given ids set"""
+    mask = np.zeros(num_documents, dtype=bool)
+    mask[np.asarray(ids, dtype=np.int64)] = True
+    return np.packbits(mask, bitorder='little')
+
+
+def exact_search(
+    index, query_vectors: np.ndarray, ids: np.ndarray, k: int, vectors: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Exact L2 search over the given ids only, in blocks. Candidate vectors come
+    from vectors (full precision) when given, else from the index itself.
+    """
+    query_vectors = np.ascontiguousarray(np.atleast_2d(query_vectors), dtype=np.float32)
+    distances = np.full((len(query_vectors), k), np.inf, dtype=np.float32)
+    labels = np.full((len(query_vectors), k), -1, dtype=np.int64)
+    query_norms = np.einsum('ij,ij->i', query_vectors, query_vectors)[:, None]
+    for start in range(0, len(ids), EXACT_SCAN_BLOCK):
+        block = np.asarray(ids[start:start + EXACT_SCAN_BLOCK], dtype=np.int64)
+        candidates = (
+            np.asarray(vectors[block], dtype=np.float32) if vectors is not None
+            else index.reconstruct_batch(block)
+        )
+        block_distances = (
+            np.einsum('ij,ij->i', candidates, candidates)[None, :]
+            - 2.0 * (query_vectors @ candidates.T) + query_norms
+        )
+        merged_distances = np.hstack([distances, block_distances])
+        merged_labels = np.hstack([labels, np.broadcast_to(block, block_distances.shape)])
+        top = np.argsort(merged_distances, axis=1, kind='stable')[:, :k]
+        distances = np.take_along_axis(merged_distances, top, axis=1)
+        labels = np.take_along_axis(merged_labels, top, axis=1)
+    labels[np.isinf(distances)] = -1
+    return distances, labels
+
+
+def search_with_bitmap(
+    index, query_vectors: np.ndarray, k: int, bitmap: Optional[np.ndarray] = None,
+    vectors: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Search a FAISS index, restricting candidates to the ids set in bitmap. On
+    approximate indexes a small filtered set is scanned exactly, and a search
+    returning fewer than min(k, matching) hits is retried with a wider
+    efSearch / nprobe, then scanned exactly, so k results come back whenever
+    k cocktails match. vectors optionally holds full-precision vectors for the scan.
+    """
+    query_vectors = np.ascontiguousarray(np.atleast_2d(query_vectors), dtype=np.float32)
+    if bitmap is None:
+        return index.search(query_vectors, k)
+    bitmap = np.ascontiguousarray(bitmap, dtype=np.uint8)
+    # Flat indexes visit every vector, so the selector alone gives exact filtered results
+    exhaustive = not isinstance(faiss.downcast_index(index), (faiss.IndexIVF, faiss.IndexHNSW))
+    if not exhaustive:
+        allowed = np.flatnonzero(np.unpackbits(bitmap, count=index.ntotal, bitorder='little'))
+        if len(allowed) <= EXACT_FILTER_MAX:
+            return exact_search(index, query_vectors, allowed, k, vectors)
+
+    selector = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+    # bitmap must stay referenced until the search returns
+    params = search_parameters(index, selector)
+    distances, ids = index.search(query_vectors, k, params=params)
+    if exhaustive:
+        return distances, ids
+
+    inner = faiss.downcast_index(index)
+    expected = min(k, len(allowed))
+    for _ in range(FILTER_RETRIES):
+        if (ids >= 0).sum(axis=1).min() >= expected:
+            return distances, ids
+        if isinstance(inner, faiss.IndexIVF):
+            if params.nprobe >= inner.nlist:
+                break
+            params = search_parameters(index, selector, nprobe=params.nprobe * FILTER_RETRY_SCALE)
+        elif isinstance(inner, faiss.IndexHNSW):
+            params = search_parameters(index, selector, ef_search=max(params.efSearch, k) * FILTER_RETRY_SCALE)
+        else:
+            break
+        distances, ids = index.search(query_vectors, k, params=params)
+    if (ids >= 0).sum(axis=1).min() >= expected:
+        return distances, ids
+    return exact_search(index, query_vectors, allowed, k, vectors)
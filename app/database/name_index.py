@@ -0,0 +1,161 @@
+import os
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+from .atomic_files import atomic_write
+
+NAME_INDEX_FILE = "name_index.npz"
+# Fuzzy matches may differ from the query by this share of its length (at least one edit)
+NAME_MAX_EDIT_RATIO = float(os.getenv("NAME_MAX_EDIT_RATIO", "0.25"))
+# Names sharing the most trigrams with the query that are checked by edit distance
+NAME_FUZZY_CANDIDATES = 20
+# Longest run of words checked when looking for a cocktail name inside a message
+NAME_MAX_WORDS = 8
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase, accent-free, punctuation-free form of a cocktail name"""
+    text = unicodedata.normalize('NFKD', name.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[\W_]+", " ", text).split())
+
+
+def _trigrams(key: str) -> Set[str]:
+    padded = f" {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, limit: Optional[int] = None) -> int:
+    """
+    Levenshtein distance counting an adjacent transposition as one edit. With
+    a limit, gives up early and returns limit + 1 once the distance must exceed it.
+    """
+    if limit is not None and abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class NameIndex:
+    """
+    Cocktail name lookup. Normalized names resolve through a hash map; other
+    queries are matched against the names sharing the most character
+    trigrams with them, accepting the closest one within a few edits
+    ("margerita" finds Margarita, "pina colada" finds Piña Colada).
+    """
+
+    def __init__(
+        self, keys: np.ndarray, positions: np.ndarray, grams: np.ndarray,
+        offsets: np.ndarray, members: np.ndarray, num_documents: int
+    ):
+        self.keys = keys
+        self.positions = positions
+        self.grams = grams
+        self.offsets = offsets
+        self.members = members
+        self.num_documents = num_documents
+        self._exact: Dict[str, int] = {key: i for i, key in enumerate(keys.tolist())}
+        self._gram_ids: Dict[str, int] = {gram: i for i, gram in enumerate(grams.tolist())}
+        # Trigrams per name, for the Dice overlap with a query
+        self._gram_counts = np.bincount(members, minlength=len(keys))
+
+    @classmethod
+    def from_names(cls, names: Iterable[str]) -> "NameIndex":
+        """Index catalog names by row position; duplicate names resolve to their first row"""
+        first_position: Dict[str, int] = {}
+        num_documents = 0
+        for position, name in enumerate(names):
+            num_documents += 1
+            key = normalize_name(name)
+            if key:
+                first_position.setdefault(key, position)
+
+        keys = list(first_position)
+        postings: Dict[str, List[int]] = defaultdict(list)
+        for i, key in enumerate(keys):
+            for gram in _trigrams(key):
+                postings[gram].append(i)
+        grams = sorted(postings)
+        counts = np.asarray([len(postings[gram]) for gram in grams], dtype=np.int64)
+        return cls(
+            np.asarray(keys, dtype=str),
+            np.asarray([first_position[key] for key in keys], dtype=np.int32),
+            np.asarray(grams, dtype=str),
+            np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+            np.asarray([i for gram in grams for i in postings[gram]], dtype=np.int32),
+            num_documents
+        )
+
+    def save(self, directory: str):
+        path = os.path.join(directory, NAME_INDEX_FILE)
+        with atomic_write(path) as f:
+            np.savez(
+                f, keys=self.keys, positions=self.positions, grams=self.grams,
+                offsets=self.offsets, members=self.members, num_documents=self.num_documents
+            )
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["NameIndex"]:
+        path = os.path.join(directory, NAME_INDEX_FILE)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return cls(
+                data['keys'], data['positions'], data['grams'],
+                data['offsets'], data['members'], int(data['num_documents'])
+            )
+
+    def mentions(self, text: str) -> bool:
+        """Whether any run of words in the text is exactly a cocktail name"""
+        words = normalize_name(text).split()
+        return any(
+            " ".join(words[start:end]) in self._exact
+            for start in range(len(words))
+            for end in range(start + 1, min(len(words), start + NAME_MAX_WORDS) + 1)
+        )
+
+    def lookup(self, name: str) -> Optional[int]:
+        """Row position of the cocktail best matching a name, or None if no name is close enough"""
+        key = normalize_name(name)
+        if not key:
+            return None
+        exact = self._exact.get(key)
+        if exact is not None:
+            return int(self.positions[exact])
+
+        query_grams = _trigrams(key)
+        grams = [self._gram_ids[gram] for gram in query_grams if gram in self._gram_ids]
+        if not grams:
+            return None
+        shared = np.bincount(
+            np.concatenate([self.members[self.offsets[g]:self.offsets[g + 1]] for g in grams]),
+            minlength=len(self.keys)
+        )
+        dice = 2 * shared / (len(query_grams) + self._gram_counts)
+        candidates = np.flatnonzero(shared)
+        if len(candidates) > NAME_FUZZY_CANDIDATES:
+            candidates = candidates[np.argpartition(-dice[candidates], NAME_FUZZY_CANDIDATES)[:NAME_FUZZY_CANDIDATES]]
+        candidates = candidates[np.argsort(-dice[candidates], kind='stable')]
+
+        max_edits = max(1, int(len(key) * NAME_MAX_EDIT_RATIO))
+        best, best_distance = None, max_edits + 1
+        for candidate in candidates.tolist():
+            distance = edit_distance(key, str(self.keys[candidate]), best_distance - 1)
+            if distance < best_distance:
+                best, best_distance = candidate, distance
+        return int(self.positions[best]) if best is not None else None
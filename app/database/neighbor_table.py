@@ -0,0 +1,135 @@
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+
+from .atomic_files import atomic_write
+
+NEIGHBORS_FILE = "neighbors.npz"
+# Neighbors stored per cocktail; "similar to X" requests for more fall back to a vector search
+SIMILAR_TOP_K = int(os.getenv("SIMILAR_TOP_K", "20"))
+# Rows per side of the similarity blocks compared on incremental updates
+NEIGHBOR_BLOCK_ROWS = 2048
+# Rows per batched index search; each gathers rows x candidates x dimension floats for the rerank
+NEIGHBOR_SEARCH_ROWS = 256
+# Index hits per row reranked by exact cosine similarity, as a multiple of k
+NEIGHBOR_CANDIDATE_FACTOR = 2
+# An incremental update touching more than this share of rows recomputes the whole table
+NEIGHBOR_REBUILD_RATIO = 0.25
+
+
+def _unit(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+class NeighborTable:
+    """
+    Precomputed nearest neighbors of every cocktail, by cosine similarity of
+    the stored cocktail vectors. ids is an int32 (n, k) table of index
+    positions, best first (-1 pads rows with fewer neighbors), and scores the
+    float16 similarities, so a lookup needs neither a search nor an embedding
+    call. Candidates come from a batched search of the catalog's FAISS index
+    and are reranked exactly; incremental builds only recompute the rows a
+    catalog delta can have changed.
+    """
+
+    def __init__(self, ids: np.ndarray, scores: np.ndarray):
+        self.ids = ids
+        self.scores = scores
+
+    @property
+    def num_documents(self) -> int:
+        return len(self.ids)
+
+    @property
+    def k(self) -> int:
+        return self.ids.shape[1]
+
+    @staticmethod
+    def _search_rows(index, vectors: np.ndarray, rows: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k neighbors of some rows, excluding themselves, from a search of the index reranked by cosine"""
+        ids = np.full((len(rows), k), -1, dtype=np.int32)
+        scores = np.full((len(rows), k), -np.inf, dtype=np.float16)
+        if not k:
+            return ids, scores
+        candidates = min(k * NEIGHBOR_CANDIDATE_FACTOR + 1, index.ntotal)
+        for start in range(0, len(rows), NEIGHBOR_SEARCH_ROWS):
+            block = rows[start:start + NEIGHBOR_SEARCH_ROWS]
+            queries = _unit(vectors[block])
+            _, found = index.search(np.asarray(vectors[block], dtype=np.float32), candidates)
+            valid = (found >= 0) & (found != block[:, None])
+            safe = np.where(valid, found, 0)
+            # Exact cosine of every candidate, gathered in sorted order for the memmap
+            unique, inverse = np.unique(safe, return_inverse=True)
+            similarities = np.einsum(
+                'ijd,id->ij', _unit(vectors[unique])[inverse.reshape(safe.shape)], queries
+            )
+            similarities[~valid] = -np.inf
+            order = np.argsort(-similarities, axis=1, kind='stable')[:, :k]
+            top = np.take_along_axis(similarities, order, axis=1)
+            top_ids = np.take_along_axis(found, order, axis=1)
+            width = top.shape[1]
+            ids[start:start + len(block), :width] = np.where(np.isfinite(top), top_ids, -1)
+            scores[start:start + len(block), :width] = top
+        return ids, scores
+
+    @classmethod
+    def from_index(cls, index, vectors: np.ndarray, k: int = SIMILAR_TOP_K) -> "NeighborTable":
+        """Top-k neighbors of every row by a batched search of the index built over the vectors"""
+        k = max(0, min(k, len(vectors) - 1))
+        return cls(*cls._search_rows(index, vectors, np.arange(len(vectors)), k))
+
+    def updated(self, kept: np.ndarray, index, vectors: np.ndarray, k: int = SIMILAR_TOP_K) -> "NeighborTable":
+        """
+        Table for the catalog after a delta: kept lists the old positions of the
+        rows now at positions 0..len(kept)-1, and the rows after them are new.
+        Only new rows, rows whose neighbors were removed, and rows that a new
+        row now beats their last neighbor are searched again.
+        """
+        num_rows, num_kept = len(vectors), len(kept)
+        k = max(0, min(k, num_rows - 1))
+        if k != self.k or num_rows - num_kept > NEIGHBOR_REBUILD_RATIO * num_rows:
+            return self.from_index(index, vectors, k)
+
+        new_position = np.full(len(self.ids) + 1, -1, dtype=np.int32)
+        new_position[kept] = np.arange(num_kept)
+        old_ids = self.ids[kept]
+        # -1 padding maps through the sentinel slot at the end and stays -1
+        ids = np.vstack([new_position[old_ids], np.full((num_rows - num_kept, k), -1, dtype=np.int32)])
+        scores = np.vstack([self.scores[kept], np.full((num_rows - num_kept, k), -np.inf, dtype=np.float16)])
+
+        stale = np.zeros(num_rows, dtype=bool)
+        stale[num_kept:] = True
+        stale[:num_kept] = ((ids[:num_kept] < 0) & (old_ids >= 0)).any(axis=1)
+        if k and num_rows > num_kept:
+            threshold = scores[:num_kept, -1].astype(np.float32)
+            for start in range(0, num_kept, NEIGHBOR_BLOCK_ROWS):
+                block = _unit(vectors[start:min(start + NEIGHBOR_BLOCK_ROWS, num_kept)])
+                best = np.full(len(block), -np.inf, dtype=np.float32)
+                for added in range(num_kept, num_rows, NEIGHBOR_BLOCK_ROWS):
+                    similarities = block @ _unit(vectors[added:min(added + NEIGHBOR_BLOCK_ROWS, num_rows)]).T
+                    best = np.maximum(best, similarities.max(axis=1))
+                stale[start:start + len(block)] |= best > threshold[start:start + len(block)]
+
+        rows = np.flatnonzero(stale)
+        ids[rows], scores[rows] = self._search_rows(index, vectors, rows, k)
+        return NeighborTable(ids, scores)
+
+    def save(self, directory: str):
+        path = os.path.join(directory, NEIGHBORS_FILE)
+        with atomic_write(path) as f:
+            np.savez(f, ids=self.ids, scores=self.scores)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["NeighborTable"]:
+        path = os.path.join(directory, NEIGHBORS_FILE)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return cls(data['ids'], data['scores'])
+
+    def neighbors(self, position: int, limit: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Positions and similarities of the nearest cocktails to one cocktail, best first"""
+        ids, scores = self.ids[position, :limit], self.scores[position, :limit]
+        return ids[ids >= 0], scores[ids >= 0]
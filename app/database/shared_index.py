@@ -0,0 +1,166 @@
+import json
+import mmap
+import os
+from typing import Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+from langchain.schema import Document
+
+from .atomic_files import atomic_write
+from .index_factory import RERANK_FACTOR, VECTOR_RERANK, configure_search, is_exact, rerank_exact
+from .index_manifest import load_manifest
+from .metadata_index import search_with_bitmap
+
+VECTORS_FILE = "vectors.npy"
+NORMS_FILE = "norms.npy"
+DOCUMENTS_FILE = "documents.jsonl"
+OFFSETS_FILE = "documents.offsets.npy"
+INDEX_FILE = "index.faiss"
+
+
+def _save_npy(path: str, array: np.ndarray):
+    """Write an .npy file atomically so concurrent readers never see a partial file"""
+    with atomic_write(path) as f:
+        np.save(f, array)
+
+
+def shared_index_exists(directory: str) -> bool:
+    """Check whether an exported read-only index is present"""
+    return all(
+        os.path.exists(os.path.join(directory, name))
+        for name in (VECTORS_FILE, NORMS_FILE, DOCUMENTS_FILE, OFFSETS_FILE)
+    )
+
+
+def export_shared_index(vector_store, directory: str, vectors: Optional[np.ndarray] = None):
+    """
+    Export a LangChain FAISS store into flat files that can be memory-mapped.
+    Vectors and documents are stored in FAISS id order. Pass the original
+    vectors when the index cannot reconstruct them exactly.
+    """
+    os.makedirs(directory, exist_ok=True)
+    index = vector_store.index
+    if vectors is None:
+        vectors = index.reconstruct_n(0, index.ntotal)
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+
+    offsets = [0]
+    documents_path = os.path.join(directory, DOCUMENTS_FILE)
+    with atomic_write(documents_path) as f:
+        for i in range(index.ntotal):
+            doc_id = vector_store.index_to_docstore_id[i]
+            doc = vector_store.docstore.search(doc_id)
+            line = json.dumps({
+                'id': doc_id,
+                'page_content': doc.page_content,
+                'metadata': doc.metadata
+            }).encode('utf-8') + b'\n'
+            f.write(line)
+            offsets.append(offsets[-1] + len(line))
+
+    _save_npy(os.path.join(directory, OFFSETS_FILE), np.asarray(offsets, dtype=np.int64))
+    _save_npy(os.path.join(directory, NORMS_FILE), np.einsum('ij,ij->i', vectors, vectors))
+    _save_npy(os.path.join(directory, VECTORS_FILE), vectors)
+
+
+class SharedVectorStore:
+    """
+    Read-only vector store backed by memory-mapped files.
+
+    Every worker process maps the same files, so the vectors and documents
+    live once in the OS page cache instead of once per process. IVF, HNSW and
+    compressed indexes are opened from the saved FAISS index with
+    IO_FLAG_MMAP and searched like the in-memory store (with the same exact
+    rerank for compressed codes). A flat fp32 index is searched as an exact
+    L2 scan of vectors.npy instead, since faiss 1.7.4 can only map the
+    inverted lists of IVF indexes and would load the flat codes privately.
+    """
+
+    def __init__(self, directory: str, embeddings):
+        self.directory = directory
+        self.embeddings = embeddings
+        self.vectors = np.load(os.path.join(directory, VECTORS_FILE), mmap_mode='r')
+        self.norms = np.load(os.path.join(directory, NORMS_FILE), mmap_mode='r')
+        self.offsets = np.load(os.path.join(directory, OFFSETS_FILE), mmap_mode='r')
+        with open(os.path.join(directory, DOCUMENTS_FILE), 'rb') as f:
+            self._documents = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.index = None
+        manifest = load_manifest(directory) or {}
+        index_path = os.path.join(directory, INDEX_FILE)
+        is_flat_fp32 = manifest.get('index_type', 'flat') == 'flat' and manifest.get('encoding', 'fp32') == 'fp32'
+        if not is_flat_fp32 and os.path.exists(index_path):
+            self.index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP)
+            configure_search(self.index)
+
+    @property
+    def ntotal(self) -> int:
+        return self.vectors.shape[0]
+
+    @property
+    def dimension(self) -> int:
+        return self.vectors.shape[1]
+
+    def get_document(self, i: int) -> Document:
+        """Decode a single document by its position in the index"""
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        record = json.loads(self._documents[start:end])
+        return Document(page_content=record['page_content'], metadata=record['metadata'])
+
+    def search(
+        self, query_vectors: np.ndarray, k: int, bitmap: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        L2 search returning (distances, ids) like faiss.Index.search.
+        bitmap restricts candidates the same way an IDSelectorBitmap does.
+        """
+        query_vectors = np.atleast_2d(np.asarray(query_vectors, dtype=np.float32))
+        if self.index is not None:
+            if is_exact(self.index) or not VECTOR_RERANK:
+                return search_with_bitmap(self.index, query_vectors, k, bitmap)
+            _, ids = search_with_bitmap(self.index, query_vectors, k * RERANK_FACTOR, bitmap, self.vectors)
+            return rerank_exact(query_vectors, ids, self.vectors, k)
+        k = min(k, self.ntotal)
+        distances = (
+            self.norms[None, :]
+            - 2.0 * (query_vectors @ self.vectors.T)
+            + np.einsum('ij,ij->i', query_vectors, query_vectors)[:, None]
+        )
+        if bitmap is not None:
+            allowed = np.unpackbits(bitmap, count=self.ntotal, bitorder='little').astype(bool)
+            distances[:, ~allowed] = np.inf
+        ids = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        top = np.take_along_axis(distances, ids, axis=1)
+        order = np.argsort(top, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        ids = np.take_along_axis(ids, order, axis=1)
+        ids[np.isinf(top)] = -1
+        return top, ids
+
+    def similarity_search_with_score_by_vector(
+        self, embedding: List[float], k: int = 4, filter: Optional[Dict] = None, fetch_k: int = 20
+    ) -> List[Tuple[Document, float]]:
+        """Search by vector, applying an equality filter on metadata like LangChain's FAISS"""
+        distances, ids = self.search(np.asarray([embedding]), fetch_k if filter else k)
+        results = []
+        for distance, i in zip(distances[0], ids[0]):
+            doc = self.get_document(int(i))
+            if filter and any(doc.metadata.get(key) != value for key, value in filter.items()):
+                continue
+            results.append((doc, float(distance)))
+            if len(results) >= k:
+                break
+        return results
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs) -> List[Tuple[Document, float]]:
+        embedding = self.embeddings.embed_query(query)
+        return self.similarity_search_with_score_by_vector(embedding, k, **kwargs)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, **kwargs)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    def add_documents(self, documents: List[Document], **kwargs):
+        raise NotImplementedError("SharedVectorStore is read-only")
@@ -0,0 +1,69 @@
+import os
+from typing import Iterable, Optional
+
+import numpy as np
+
+from .atomic_files import atomic_write
+
+INGREDIENT_VECTORS_FILE = "ingredient_vectors.npz"
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class IngredientVectors:
+    """
+    One precomputed vector per catalog ingredient: the normalized centroid of
+    the vectors of every cocktail that uses it. Ingredient vectors live in the
+    same space as the cocktails, so they need no embedding calls.
+    """
+
+    def __init__(self, names: np.ndarray, vectors: np.ndarray):
+        self.names = names
+        self.vectors = vectors
+        self._positions = {str(name): i for i, name in enumerate(names)}
+
+    @classmethod
+    def from_index(cls, ingredient_index, cocktail_vectors: np.ndarray) -> "IngredientVectors":
+        """Average cocktail vectors over each ingredient's posting list"""
+        names = sorted(ingredient_index.postings)
+        vectors = np.empty((len(names), cocktail_vectors.shape[1]), dtype=np.float32)
+        for i, name in enumerate(names):
+            vectors[i] = cocktail_vectors[ingredient_index.postings[name]].mean(axis=0)
+        return cls(np.asarray(names), _normalize_rows(vectors))
+
+    def save(self, directory: str):
+        path = os.path.join(directory, INGREDIENT_VECTORS_FILE)
+        with atomic_write(path) as f:
+            np.savez(f, names=self.names, vectors=self.vectors)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["IngredientVectors"]:
+        path = os.path.join(directory, INGREDIENT_VECTORS_FILE)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return cls(data['names'], data['vectors'])
+
+    def profile(self, ingredient_names: Iterable[str]) -> Optional[np.ndarray]:
+        """Unit taste vector for a set of catalog ingredient names, or None if none are known"""
+        positions = [self._positions[name] for name in ingredient_names if name in self._positions]
+        if not positions:
+            return None
+        return _normalize_rows(self.vectors[positions].mean(axis=0))
+
+
+def preference_scores(
+    query_vector: np.ndarray,
+    candidate_vectors: np.ndarray,
+    profile: Optional[np.ndarray],
+    weight: float
+) -> np.ndarray:
+    """Blend cosine similarity to the query with cosine similarity to the taste profile"""
+    candidates = _normalize_rows(np.asarray(candidate_vectors, dtype=np.float32))
+    scores = candidates @ _normalize_rows(np.asarray(query_vector, dtype=np.float32))
+    if profile is not None:
+        scores = (1.0 - weight) * scores + weight * (candidates @ profile)
+    return scores
@@ -1,8 +1,11 @@
-from fastapi import FastAPI, Request, Body, HTTPException
+from fastapi import FastAPI, Request, Response, Body, HTTPException
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 import os
+import json
+import secrets
+import uuid
 from typing import Optional
 from dotenv import load_dotenv
 from pydantic import BaseModel
@@ -20,13 +23,41 @@ app = FastAPI(title="Cocktail Advisor Chat")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="app/templates")
 
-# Initialize services
-llm_service = LLMService()
+# Initialize services once per process (or once in the master with gunicorn --preload)
 cocktail_service = CocktailService()
+llm_service = LLMService(cocktail_service)
+
+SESSION_COOKIE = "session_id"
+# Favorites are stored per session id, so the cookie outlives the browser session
+SESSION_COOKIE_MAX_AGE = 365 * 24 * 3600
+# Admin endpoints are disabled unless a token is configured; clients send it as X-Admin-Token
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
 
 class Message(BaseModel):
     text: str
 
+def _session_id(request: Request, body: dict) -> str:
+    """Session id from the request body or cookie, or a new one"""
+    return body.get("session_id") or request.cookies.get(SESSION_COOKIE) or uuid.uuid4().hex
+
+def _require_admin(request: Request):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not secrets.compare_digest(request.headers.get("x-admin-token", ""), ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+def _on_catalog_swap():
+    # Cached answers may name cocktails that are no longer in the catalog
+    if llm_service.response_cache is not None:
+        llm_service.response_cache.clear()
+
+@app.middleware("http")
+async def pick_up_catalog_reloads(request: Request, call_next):
+    # /admin/reload rebuilds the index in the worker that receives it; the other
+    # workers notice the new manifest here and load it in the background
+    cocktail_service.check_for_reload(_on_catalog_swap)
+    return await call_next(request)
+
 @app.get("/", response_class=HTMLResponse)
 async def chat_page(request: Request):
     return templates.TemplateResponse("index.html", {
@@ -34,7 +65,7 @@ async def chat_page(request: Request):
     })
 
 @app.post("/chat")
-async def chat(request: Request):
+async def chat(request: Request, http_response: Response):
     try:
         body = await request.json()
         message_text = body.get("text", "")
@@ -42,7 +73,11 @@ async def chat(request: Request):
         if not message_text or not message_text.strip():
             raise HTTPException(status_code=400, detail="Message text cannot be empty")
             
-        response = await llm_service.process_message(message_text)
+        session_id = _session_id(request, body)
+        http_response.set_cookie(
+            SESSION_COOKIE, session_id, max_age=SESSION_COOKIE_MAX_AGE, httponly=True, samesite="lax"
+        )
+        response = await llm_service.process_message(message_text, session_id)
         if not response:
             return {"response": "I apologize, but I couldn't generate a proper response. Could you try rephrasing your question?"}
         return {"response": response}
@@ -56,6 +91,74 @@ async def chat(request: Request):
             detail=f"An error occurred while processing your message: {str(e)}"
         )
 
+@app.post("/chat/stream")
+async def chat_stream(request: Request):
+    """Stream the response as server-sent events: results, then tokens, then done"""
+    try:
+        body = await request.json()
+    except ValueError as ve:
+        raise HTTPException(status_code=422, detail=str(ve))
+    message_text = body.get("text", "")
+    if not message_text or not message_text.strip():
+        raise HTTPException(status_code=400, detail="Message text cannot be empty")
+    session_id = _session_id(request, body)
+
+    async def event_stream():
+        # If the client goes away, Starlette cancels this generator, which closes
+        # the upstream OpenAI stream as well
+        async for event in llm_service.stream_message(message_text, session_id):
+            if await request.is_disconnected():
+                break
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+    response = StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    response.set_cookie(
+        SESSION_COOKIE, session_id, max_age=SESSION_COOKIE_MAX_AGE, httponly=True, samesite="lax"
+    )
+    return response
+
+@app.get("/stats")
+async def stats(request: Request):
+    _require_admin(request)
+    stats = {
+        "embedding_cache": cocktail_service.get_cache_stats(),
+        "chat_pipeline": llm_service.pipeline_stats,
+        "sessions": llm_service.sessions.get_stats(),
+        "favorites": cocktail_service.favorites.get_stats()
+    }
+    if llm_service.response_cache is not None:
+        stats["response_cache"] = llm_service.response_cache.get_stats()
+    if llm_service.intent_classifier is not None:
+        stats["intent_classifier"] = llm_service.intent_classifier.stats
+    return stats
+
+@app.post("/admin/reload", status_code=202)
+async def reload_catalog(request: Request):
+    """Rebuild the catalog index in the background and swap it in without dropping requests"""
+    _require_admin(request)
+    if not cocktail_service.reload_catalog(_on_catalog_swap):
+        raise HTTPException(status_code=409, detail="A reload is already in progress")
+    return cocktail_service.get_reload_status()
+
+@app.get("/admin/reload")
+async def reload_status(request: Request):
+    _require_admin(request)
+    return cocktail_service.get_reload_status()
+
+@app.post("/admin/claim-favorites")
+async def claim_favorites(request: Request, body: dict = Body(default={})):
+    """Attach the favorites imported from the legacy favorites.json to a session"""
+    _require_admin(request)
+    session_id = body.get("session_id") or request.cookies.get(SESSION_COOKIE)
+    if not session_id:
+        raise HTTPException(status_code=400, detail="No session_id in the body or cookie")
+    claimed = cocktail_service.favorites.claim(session_id)
+    return {"session_id": session_id, "claimed": claimed}
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to the Cocktail Recommendation System"}
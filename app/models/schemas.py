@@ -1,4 +1,47 @@
-from pydantic import BaseModel
+from typing import List, Literal
+from pydantic import BaseModel, Field
 
 class ChatResponse(BaseModel):
     message: str
+
+# Tool schemas for the tool-calling chat pipeline. The docstrings and field
+# descriptions are sent to the model as the tool definitions.
+
+class SearchByIngredients(BaseModel):
+    """Find cocktails that contain any of the given ingredients."""
+    ingredients: List[str] = Field(..., description="Ingredients the cocktails should contain, e.g. ['gin', 'lemon']")
+    excluded_ingredients: List[str] = Field(default_factory=list, description="Ingredients the cocktails must not contain")
+    count: int = Field(5, ge=1, le=20, description="Number of cocktails to return")
+
+class GetNonAlcoholicCocktails(BaseModel):
+    """Find non-alcoholic cocktails (mocktails)."""
+    count: int = Field(5, ge=1, le=20, description="Number of cocktails to return")
+
+class GetSimilarCocktails(BaseModel):
+    """Find cocktails similar to a named cocktail."""
+    cocktail_name: str = Field(..., description="Name of the reference cocktail, e.g. 'Margarita'")
+    count: int = Field(5, ge=1, le=20, description="Number of cocktails to return")
+
+class GetRecipe(BaseModel):
+    """Get the full recipe (ingredients, glass, instructions) of a named cocktail; misspelled names are matched."""
+    cocktail_name: str = Field(..., description="Name of the cocktail, e.g. 'Mojito'")
+
+class SearchWithPreferences(BaseModel):
+    """Free-text cocktail search, ranked towards the user's favorite ingredients."""
+    query: str = Field(..., description="What the user is looking for, e.g. 'sweet fruity summer drink'")
+    alcoholic_only: bool = Field(False, description="Only return alcoholic cocktails")
+    count: int = Field(5, ge=1, le=20, description="Number of cocktails to return")
+
+class UpdateFavorites(BaseModel):
+    """Add, remove or list the user's favorite ingredients."""
+    action: Literal["add", "remove", "list"] = Field(..., description="What to do with the favorites")
+    ingredients: List[str] = Field(default_factory=list, description="Ingredients to add or remove")
+
+COCKTAIL_TOOLS = [
+    SearchByIngredients,
+    GetNonAlcoholicCocktails,
+    GetSimilarCocktails,
+    GetRecipe,
+    SearchWithPreferences,
+    UpdateFavorites,
+]
@@ -0,0 +1,274 @@
+import hashlib
+import json
+import os
+import random
+import shutil
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from ..database.atomic_files import atomic_write
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+# Upper bound on embedding requests in flight; lowered automatically while rate limited
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "8"))
+EMBED_MAX_BACKOFF = float(os.getenv("EMBED_MAX_BACKOFF", "60"))
+# Partial vectors are flushed to disk at least this often (in rows)
+EMBED_CHECKPOINT_ROWS = int(os.getenv("EMBED_CHECKPOINT_ROWS", "10000"))
+
+CHECKPOINT_JOB_FILE = "job.json"
+CHECKPOINT_VECTORS_FILE = "vectors.npy"
+CHECKPOINT_DONE_FILE = "done.npy"
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status if isinstance(status, int) else None
+
+
+def is_rate_limit(error: Exception) -> bool:
+    return (
+        _status_code(error) == 429
+        or type(error).__name__ == 'RateLimitError'
+        or 'rate limit' in str(error).lower()
+    )
+
+
+def is_transient(error: Exception) -> bool:
+    """Errors worth retrying: rate limits, server errors, timeouts and dropped connections"""
+    status = _status_code(error)
+    return (
+        is_rate_limit(error)
+        or (status is not None and status >= 500)
+        or isinstance(error, (ConnectionError, TimeoutError))
+        or type(error).__name__ in ('APIConnectionError', 'APITimeoutError', 'InternalServerError')
+    )
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Delay requested by the server's Retry-After header, if any"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveLimit:
+    """
+    Concurrency limit for embedding requests. A rate-limited request halves the
+    limit and pauses every worker for the backoff delay; after as many
+    successes in a row as the current limit, it grows by one up to maximum.
+    """
+
+    def __init__(self, maximum: int):
+        self.maximum = max(1, maximum)
+        self.limit = self.maximum
+        self.active = 0
+        self._successes = 0
+        self._pause_until = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.active >= self.limit:
+                self._cond.wait()
+            self.active += 1
+            pause = self._pause_until - time.monotonic()
+        if pause > 0:
+            time.sleep(pause)
+
+    def release(self, rate_limited: bool = False, backoff: float = 0.0):
+        with self._cond:
+            self.active -= 1
+            if rate_limited:
+                self.limit = max(1, self.limit // 2)
+                self._successes = 0
+                self._pause_until = max(self._pause_until, time.monotonic() + backoff)
+            else:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.maximum:
+                    self.limit += 1
+                    self._successes = 0
+            self._cond.notify_all()
+
+
+class BulkEmbedder:
+    """
+    Embeds large text lists in batches with bounded, rate-limit-aware parallelism.
+
+    Finished batches are written into a memory-mapped vectors file in
+    checkpoint_dir together with a per-batch done mask, so a build that is
+    interrupted resumes with the batches still missing. The checkpoint is
+    tied to the model and the exact texts, and removed once the job completes.
+    One job at a time may use a checkpoint_dir; CocktailService embeds under
+    the vector store directory lock.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        checkpoint_dir: Optional[str] = None,
+        batch_size: int = EMBED_BATCH_SIZE,
+        concurrency: int = EMBED_CONCURRENCY,
+        max_retries: int = EMBED_MAX_RETRIES,
+        checkpoint_rows: int = EMBED_CHECKPOINT_ROWS
+    ):
+        self.embeddings = embeddings
+        self.checkpoint_dir = checkpoint_dir
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.checkpoint_rows = checkpoint_rows
+        self._limit = AdaptiveLimit(self.concurrency)
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            'rows': 0, 'embedded_rows': 0, 'resumed_rows': 0, 'batches': 0,
+            'retries': 0, 'rate_limited': 0, 'seconds': 0.0, 'rows_per_second': 0.0
+        }
+
+    def _job_id(self, texts: List[str]) -> str:
+        digest = hashlib.sha256(f"{getattr(self.embeddings, 'model', '')}\0{self.batch_size}\0".encode('utf-8'))
+        for text in texts:
+            digest.update(text.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """One embedding request, retried with backoff on rate limits and transient errors"""
+        for attempt in range(self.max_retries + 1):
+            self._limit.acquire()
+            try:
+                vectors = self.embeddings.embed_documents(texts)
+            except Exception as e:
+                rate_limited = is_rate_limit(e)
+                backoff = retry_after(e) or min(EMBED_MAX_BACKOFF, 2 ** attempt) * random.uniform(0.5, 1.0)
+                self._limit.release(rate_limited, backoff)
+                if attempt == self.max_retries or not is_transient(e):
+                    raise
+                with self._stats_lock:
+                    self.stats['retries'] += 1
+                    self.stats['rate_limited'] += int(rate_limited)
+                if not rate_limited:
+                    # Rate limits pause every worker inside AdaptiveLimit instead
+                    time.sleep(backoff)
+                continue
+            self._limit.release()
+            return vectors
+
+    def _load_checkpoint(self, job: str, num_rows: int, num_batches: int) -> Tuple[Optional[np.ndarray], np.ndarray]:
+        """Vectors and done mask of an earlier run of the same job, if one was interrupted"""
+        done = np.zeros(num_batches, dtype=bool)
+        if not self.checkpoint_dir:
+            return None, done
+        try:
+            with open(os.path.join(self.checkpoint_dir, CHECKPOINT_JOB_FILE)) as f:
+                meta = json.load(f)
+            if meta.get('job') != job or meta.get('rows') != num_rows:
+                return None, done
+            vectors = np.load(os.path.join(self.checkpoint_dir, CHECKPOINT_VECTORS_FILE), mmap_mode='r+')
+            saved = np.load(os.path.join(self.checkpoint_dir, CHECKPOINT_DONE_FILE))
+            if vectors.shape[0] != num_rows or len(saved) != num_batches:
+                return None, done
+            return vectors, saved
+        except FileNotFoundError:
+            return None, done
+        except Exception as e:
+            print(f"Ignoring unreadable embedding checkpoint: {str(e)}")
+            return None, done
+
+    def _create_checkpoint(self, job: str, num_rows: int, dimension: int) -> np.ndarray:
+        shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
+        os.makedirs(self.checkpoint_dir)
+        vectors = np.lib.format.open_memmap(
+            os.path.join(self.checkpoint_dir, CHECKPOINT_VECTORS_FILE), mode='w+',
+            dtype=np.float32, shape=(num_rows, dimension)
+        )
+        with open(os.path.join(self.checkpoint_dir, CHECKPOINT_JOB_FILE), 'w') as f:
+            json.dump({'job': job, 'rows': num_rows, 'dimension': dimension, 'batch_size': self.batch_size}, f)
+        return vectors
+
+    def _save_checkpoint(self, vectors: np.ndarray, done: np.ndarray):
+        """Flush finished vectors before marking their batches done"""
+        if isinstance(vectors, np.memmap):
+            vectors.flush()
+        path = os.path.join(self.checkpoint_dir, CHECKPOINT_DONE_FILE)
+        with atomic_write(path) as f:
+            np.save(f, done)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Vectors for texts, in order, as a float32 matrix"""
+        start_time = time.perf_counter()
+        num_rows = len(texts)
+        batches = [(start, min(start + self.batch_size, num_rows)) for start in range(0, num_rows, self.batch_size)]
+        # A single batch has nothing to resume
+        checkpointed = bool(self.checkpoint_dir) and len(batches) > 1
+        job = self._job_id(texts) if checkpointed else ""
+        vectors, done = self._load_checkpoint(job, num_rows, len(batches)) if checkpointed else (None, np.zeros(len(batches), dtype=bool))
+        resumed = sum(end - start for (start, end), finished in zip(batches, done) if finished)
+        if resumed:
+            print(f"Resuming embedding job: {resumed}/{num_rows} rows already embedded")
+
+        rows_since_checkpoint = 0
+        embedded = 0
+        pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="bulk-embed")
+        try:
+            pending = {
+                pool.submit(self._embed_batch, texts[start:end]): (i, start, end)
+                for i, (start, end) in enumerate(batches) if not done[i]
+            }
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    i, start, end = pending.pop(future)
+                    batch_vectors = np.asarray(future.result(), dtype=np.float32)
+                    if vectors is None:
+                        vectors = (
+                            self._create_checkpoint(job, num_rows, batch_vectors.shape[1]) if checkpointed
+                            else np.empty((num_rows, batch_vectors.shape[1]), dtype=np.float32)
+                        )
+                    vectors[start:end] = batch_vectors
+                    done[i] = True
+                    embedded += end - start
+                    rows_since_checkpoint += end - start
+
+                if checkpointed and rows_since_checkpoint >= self.checkpoint_rows:
+                    self._save_checkpoint(vectors, done)
+                    rows_since_checkpoint = 0
+                    elapsed = time.perf_counter() - start_time
+                    print(
+                        f"Embedded {resumed + embedded}/{num_rows} rows "
+                        f"({embedded / elapsed:.0f} rows/s, concurrency {self._limit.limit})"
+                    )
+        except BaseException:
+            pool.shutdown(wait=True, cancel_futures=True)
+            if checkpointed and vectors is not None:
+                self._save_checkpoint(vectors, done)
+                print(f"Embedding interrupted; {int(done.sum())}/{len(batches)} batches saved for resume")
+            raise
+        pool.shutdown(wait=True)
+
+        result = np.array(vectors, dtype=np.float32) if vectors is not None else np.empty((0, 0), dtype=np.float32)
+        if checkpointed:
+            shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
+
+        elapsed = time.perf_counter() - start_time
+        with self._stats_lock:
+            self.stats.update(
+                rows=num_rows, embedded_rows=embedded, resumed_rows=resumed, batches=len(batches),
+                seconds=elapsed, rows_per_second=embedded / elapsed if elapsed else 0.0
+            )
+        if num_rows > self.batch_size:
+            print(f"Embedded {embedded} rows in {elapsed:.1f}s ({self.stats['rows_per_second']:.0f} rows/s)")
+        return result
+
+    def get_stats(self) -> Dict:
+        with self._stats_lock:
+            return dict(self.stats)
@@ -1,220 +1,1032 @@
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional, Tuple
 import pandas as pd
-from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import FAISS
 import os
 from ..utils.data_processor import process_cocktail_data, initialize_vector_store
-import json
+from ..database.atomic_files import directory_lock
+from ..database.index_manifest import (
+    MANIFEST_FILE, build_fingerprint, load_manifest, save_manifest, manifest_matches, new_manifest
+)
+from ..database.shared_index import VECTORS_FILE, SharedVectorStore, export_shared_index, shared_index_exists
+from ..database.ingredient_index import IngredientIndex
+from ..database.metadata_index import MetadataIndex, ids_to_bitmap, search_with_bitmap
+from ..database.taste_profile import IngredientVectors, preference_scores
+from ..database.neighbor_table import SIMILAR_TOP_K, NeighborTable
+from ..database.name_index import NameIndex
+from ..database.bm25_index import BM25Index, reciprocal_rank_fusion
+from ..database.index_factory import (
+    RERANK_FACTOR, VECTOR_ENCODING, VECTOR_RERANK, build_index, build_options, choose_index_type,
+    configure_search, factory_string, is_exact, rerank_exact, update_index
+)
+from ..database.catalog_delta import CatalogDelta, load_row_hashes, row_hashes, save_row_hashes
+import faiss
+import numpy as np
+from ..database.favorites_store import FavoritesStore
+from .embedding_provider import create_embeddings
+from .embedding_cache import normalize_text
+from .bulk_embedder import BulkEmbedder
+import asyncio
+import contextvars
+import functools
+import threading
+import shutil
+import tempfile
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from langchain.schema import Document
-from datetime import datetime
+from langchain_community.docstore.in_memory import InMemoryDocstore
+import uuid
+
+CATALOG_PATH = os.getenv("COCKTAILS_CSV", "data/cocktails.csv")
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR", "data/vector_store")
+# "memory" keeps a private FAISS index per process; "shared" serves a read-only,
+# memory-mapped copy that all worker processes share through the page cache
+VECTOR_STORE_MODE = os.getenv("VECTOR_STORE_MODE", "memory").lower()
+# How strongly the favorites taste profile reorders preference searches (0 disables it)
+PREFERENCE_WEIGHT = float(os.getenv("PREFERENCE_WEIGHT", "0.3"))
+PREFERENCE_FETCH_FACTOR = 4
+# Distinct favorites sets whose taste profiles are kept in memory
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "1024"))
+# Threads available to the async API for FAISS and other CPU-bound retrieval work
+SEARCH_THREADS = int(os.getenv("SEARCH_THREADS", "4"))
+# Rebuild from the previous index when the catalog changes: only new or edited rows are embedded
+INCREMENTAL_BUILD = os.getenv("INCREMENTAL_BUILD", "true").lower() == "true"
+# Seconds between checks for a manifest written by a reload in another worker process
+CATALOG_CHECK_INTERVAL = float(os.getenv("CATALOG_CHECK_INTERVAL", "5"))
+# Partial vectors of an interrupted build, picked up by the next one
+EMBEDDING_CHECKPOINT_DIR = "embedding_checkpoint"
+# "vector" (FAISS only), "hybrid" (FAISS and BM25 hits fused by reciprocal rank) or
+# "lexical" (BM25 only, no embedding call). Queries whose embedding fails or times
+# out are answered lexically in every mode.
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid").lower()
+HYBRID_FETCH_FACTOR = 4
+EMBED_QUERY_TIMEOUT = float(os.getenv("EMBED_QUERY_TIMEOUT", "10"))
+
+NON_ALCOHOLIC_QUERY = "non-alcoholic cocktails"
+NON_ALCOHOLIC_FILTERS = {"type": "cocktail", "alcoholic": "non alcoholic"}
+
+
+class CatalogSnapshot:
+    """Everything built from one version of the catalog; replaced as a whole on reload"""
+
+    def __init__(self, generation: int):
+        self.generation = generation
+        self.vector_store = None
+        self.exact_vectors = None  # Memory-mapped float32 vectors behind a compressed index
+        self.ingredient_index = None
+        self.metadata_index = None
+        self.ingredient_vectors = None
+        self.neighbor_table = None
+        self.name_index = None
+        self.bm25_index = None
+        self.manifest_mtime = None  # Of the manifest this snapshot was loaded from
+
+
+def _manifest_mtime() -> Optional[int]:
+    try:
+        return os.stat(os.path.join(VECTOR_STORE_DIR, MANIFEST_FILE)).st_mtime_ns
+    except OSError:
+        return None
+
+
+# Snapshot a call is working on, so a reload in the middle of it does not mix catalogs
+_pinned_catalog: contextvars.ContextVar = contextvars.ContextVar("pinned_catalog", default=None)
+
+
+def _on_snapshot(method):
+    """Run a public method against the catalog snapshot current when it was called"""
+    if asyncio.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def async_wrapper(self, *args, **kwargs):
+            if _pinned_catalog.get() is not None:
+                return await method(self, *args, **kwargs)
+            token = _pinned_catalog.set(CocktailService._catalog)
+            try:
+                return await method(self, *args, **kwargs)
+            finally:
+                _pinned_catalog.reset(token)
+        return async_wrapper
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if _pinned_catalog.get() is not None:
+            return method(self, *args, **kwargs)
+        token = _pinned_catalog.set(CocktailService._catalog)
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            _pinned_catalog.reset(token)
+    return wrapper
+
 
 class CocktailService:
-    _vector_store = None  # Class-level singleton
+    _catalog: Optional[CatalogSnapshot] = None  # Class-level singleton, swapped by reload_catalog
+    _reload_lock = threading.Lock()
+    _reload_status: Dict = {'state': 'idle'}
+    _last_catalog_check = 0.0
+    # Bounded pool shared by all instances; threads are only started on first use
+    _executor = ThreadPoolExecutor(max_workers=SEARCH_THREADS, thread_name_prefix="cocktail-search")
 
     def __init__(self):
         try:
-            # Initialize OpenAI embeddings
-            self.embeddings = OpenAIEmbeddings(openai_api_key=os.getenv("OPENAI_API_KEY"))
+            # Embeddings from the configured provider (EMBEDDING_PROVIDER), behind a cache
+            self.embeddings = create_embeddings()
             
-            # Initialize/load vector store only if not already created
-            if CocktailService._vector_store is None:
-                print("Creating vector store...")
-                CocktailService._vector_store = self._initialize_vector_store()
-            self.vector_store = CocktailService._vector_store
+            # Initialize/load the catalog only if not already created
+            if CocktailService._catalog is None:
+                CocktailService._catalog = self._load_catalog(generation=1)
             
-            # Load saved favorites
-            self.favorites_file = "data/favorites.json"
-            self.favorite_ingredients = self._load_favorites()
+            # Per-user favorites; they are kept out of the catalog index
+            self.favorites = FavoritesStore()
+            self._profile_cache: "OrderedDict[Tuple[int, frozenset], Optional[np.ndarray]]" = OrderedDict()
+            self._profile_lock = threading.Lock()
         except Exception as e:
             print(f"Error initializing CocktailService: {str(e)}")
             raise
+
+    def _load_catalog(self, generation: int) -> CatalogSnapshot:
+        """Load (or build) the vector store and the indexes derived from it"""
+        catalog = CatalogSnapshot(generation)
+        # The loaders below read self.vector_store etc., which resolve to the snapshot being built
+        token = _pinned_catalog.set(catalog)
+        try:
+            # Other workers building or loading the same directory wait here, then reuse the build
+            with directory_lock(VECTOR_STORE_DIR):
+                self._load_catalog_files(catalog)
+            return catalog
+        finally:
+            _pinned_catalog.reset(token)
+
+    def _load_catalog_files(self, catalog: CatalogSnapshot):
+        catalog.vector_store = self._initialize_vector_store()
+        if not self.read_only:
+            catalog.exact_vectors = self._open_exact_vectors()
+        catalog.ingredient_index = self._initialize_ingredient_index()
+        catalog.metadata_index = self._initialize_metadata_index()
+        catalog.ingredient_vectors = self._initialize_ingredient_vectors()
+        catalog.neighbor_table = self._initialize_neighbor_table()
+        catalog.name_index = self._initialize_name_index()
+        catalog.bm25_index = self._initialize_bm25_index()
+        catalog.manifest_mtime = _manifest_mtime()
+
+    @staticmethod
+    def _current_catalog() -> CatalogSnapshot:
+        return _pinned_catalog.get() or CocktailService._catalog
+
+    @property
+    def vector_store(self):
+        return self._current_catalog().vector_store
+
+    @property
+    def exact_vectors(self) -> Optional[np.ndarray]:
+        return self._current_catalog().exact_vectors
+
+    @property
+    def ingredient_index(self) -> IngredientIndex:
+        return self._current_catalog().ingredient_index
+
+    @property
+    def metadata_index(self) -> MetadataIndex:
+        return self._current_catalog().metadata_index
+
+    @property
+    def ingredient_vectors(self) -> IngredientVectors:
+        return self._current_catalog().ingredient_vectors
+
+    @property
+    def neighbor_table(self) -> NeighborTable:
+        return self._current_catalog().neighbor_table
+
+    @property
+    def name_index(self) -> NameIndex:
+        return self._current_catalog().name_index
+
+    @property
+    def bm25_index(self) -> BM25Index:
+        return self._current_catalog().bm25_index
+
+    def reload_catalog(self, on_swap: Optional[Callable[[], None]] = None) -> bool:
+        """
+        Rebuild the catalog from the current CSV in a background thread and swap
+        it in when ready; on_swap runs right after the swap. Searches already
+        running finish on the old snapshot. Returns False if a reload is already
+        in progress.
+        """
+        if not CocktailService._reload_lock.acquire(blocking=False):
+            return False
+        CocktailService._reload_status = {'state': 'running', 'started_at': time.time()}
+        threading.Thread(target=self._reload, args=(on_swap,), name="catalog-reload", daemon=True).start()
+        return True
+
+    def _reload(self, on_swap: Optional[Callable[[], None]] = None):
+        status = CocktailService._reload_status
+        try:
+            catalog = self._load_catalog(generation=CocktailService._catalog.generation + 1)
+            CocktailService._catalog = catalog
+            with self._profile_lock:
+                self._profile_cache.clear()
+            if on_swap is not None:
+                on_swap()
+            status.update(state='done', generation=catalog.generation, num_documents=self._index_size())
+            print(f"Catalog reloaded (generation {catalog.generation})")
+        except Exception as e:
+            print(f"Error reloading catalog: {str(e)}")
+            status.update(state='failed', error=str(e))
+        finally:
+            status['finished_at'] = time.time()
+            CocktailService._reload_lock.release()
+
+    def check_for_reload(self, on_swap: Optional[Callable[[], None]] = None) -> bool:
+        """
+        Reload in the background if another process (a worker that received
+        /admin/reload) has written a newer manifest than the one this process
+        serves. Cheap enough to call per request: the manifest is stat'ed at most
+        every CATALOG_CHECK_INTERVAL seconds. Returns True if a reload was started.
+        """
+        now = time.monotonic()
+        if now - CocktailService._last_catalog_check < CATALOG_CHECK_INTERVAL:
+            return False
+        CocktailService._last_catalog_check = now
+        mtime = _manifest_mtime()
+        if mtime is None or mtime == CocktailService._catalog.manifest_mtime:
+            return False
+        print("Catalog index changed on disk, reloading")
+        return self.reload_catalog(on_swap)
+
+    def get_reload_status(self) -> Dict:
+        """State of the last catalog reload"""
+        return {**CocktailService._reload_status, 'generation': CocktailService._catalog.generation}
         
     def _initialize_vector_store(self):
-        """Initialize the vector store with cocktail data"""
+        """Load the persisted vector store, rebuilding it only if the catalog changed"""
         try:
-            print("Creating vector store...")
-            # Process cocktail data into Documents
-            documents = process_cocktail_data("data/cocktails.csv")
+            fingerprint = build_fingerprint(CATALOG_PATH, self.embeddings.model, build_options())
+            manifest = load_manifest(VECTOR_STORE_DIR)
             
-            # Initialize vector store without metadata_config
-            vector_store = FAISS.from_documents(
-                documents=documents,
-                embedding=self.embeddings
-            )
+            vector_store = None
+            if manifest_matches(manifest, fingerprint):
+                if VECTOR_STORE_MODE == "shared" and shared_index_exists(VECTOR_STORE_DIR):
+                    return self._open_shared_vector_store()
+                vector_store = self._load_vector_store(manifest)
             
-            # Add index optimization
-            vector_store.index.nprobe = 3  # Increase search accuracy
+            if vector_store is None:
+                vector_store = self._build_vector_store(fingerprint, manifest)
+            
+            if VECTOR_STORE_MODE == "shared":
+                if not shared_index_exists(VECTOR_STORE_DIR):
+                    export_shared_index(vector_store, VECTOR_STORE_DIR)
+                return self._open_shared_vector_store()
             return vector_store
         
         except Exception as e:
             print(f"Error initializing vector store: {str(e)}")
             raise
 
-    def search_cocktails(self, query: str, k: int = 5):
-        """Search for cocktails based on query"""
-        results = self.vector_store.similarity_search(query, k=k)
-        return results
+    def _load_vector_store(self, manifest: Dict):
+        """Load the index from disk, returning None if it is unusable"""
+        try:
+            print(f"Loading vector store from {VECTOR_STORE_DIR}...")
+            vector_store = FAISS.load_local(
+                VECTOR_STORE_DIR,
+                self.embeddings,
+                allow_dangerous_deserialization=True  # Files are written by _build_vector_store
+            )
+            if vector_store.index.d != manifest.get('dimension'):
+                print("Persisted index dimension does not match manifest")
+                return None
+            # nprobe / efSearch come from the current configuration, not from build time
+            configure_search(vector_store.index)
+            return vector_store
+        except Exception as e:
+            print(f"Could not load persisted vector store: {str(e)}")
+            return None
 
-    def _load_favorites(self) -> set:
-        """Load favorites from file"""
+    def _previous_build(self, manifest: Optional[Dict], fingerprint: Dict, index_type: str):
+        """Index, row hashes and vectors of the last build, if the new catalog can be applied to it as a delta"""
+        if not INCREMENTAL_BUILD or not manifest or manifest.get('index_type') != index_type:
+            return None
+        if any(manifest.get(key) != value for key, value in fingerprint.items() if key != 'catalog_sha256'):
+            return None
         try:
-            if os.path.exists(self.favorites_file):
-                with open(self.favorites_file, 'r') as f:
-                    return set(json.load(f))
-            return set()
+            num_documents = manifest.get('num_documents')
+            hashes = load_row_hashes(VECTOR_STORE_DIR)
+            vectors = np.load(os.path.join(VECTOR_STORE_DIR, VECTORS_FILE), mmap_mode='r')
+            if hashes is None or len(hashes) != num_documents or vectors.shape != (num_documents, manifest.get('dimension')):
+                return None
+            # A private copy: the index being served is never modified
+            index = faiss.read_index(os.path.join(VECTOR_STORE_DIR, "index.faiss"))
+            if index.ntotal != num_documents:
+                return None
+            return index, hashes, vectors
         except Exception as e:
-            print(f"Error loading favorites: {e}")
-            return set()
+            print(f"Could not reuse the previous index: {str(e)}")
+            return None
 
-    def _save_favorites(self):
-        """Save favorites to file"""
+    def _embed_documents(self, documents: List[Document], dimension: Optional[int] = None) -> np.ndarray:
+        if not documents:
+            return np.empty((0, dimension or 0), dtype=np.float32)
+        # Batched, rate-limit aware and resumable from a checkpoint if the build is interrupted.
+        # Catalog texts bypass the query cache (they would only evict queries from it),
+        # normalized the same way the cache normalizes query texts.
+        provider = getattr(self.embeddings, 'embeddings', self.embeddings)
+        embedder = BulkEmbedder(provider, checkpoint_dir=os.path.join(VECTOR_STORE_DIR, EMBEDDING_CHECKPOINT_DIR))
+        vectors = embedder.embed([normalize_text(doc.page_content) for doc in documents])
+        self._embedding_stats = embedder.get_stats()
+        return vectors
+
+    def _build_vector_store(self, fingerprint: Dict, manifest: Optional[Dict] = None):
+        """Embed the catalog (or only its changes), persist the index and record its manifest"""
+        print("Catalog changed or no usable index found, building vector store...")
+        # Process cocktail data into Documents
+        documents = process_cocktail_data(CATALOG_PATH)
+        hashes = row_hashes(doc.page_content for doc in documents)
+        
+        # Flat, IVF or HNSW depending on VECTOR_INDEX_TYPE and catalog size, encoded per VECTOR_ENCODING
+        index_type = choose_index_type(len(documents))
+        self._embedding_stats = None
+        previous = self._previous_build(manifest, fingerprint, index_type)
+        delta = None
+        neighbor_table = None
+        if previous is None:
+            vectors = self._embed_documents(documents)
+            index = build_index(vectors, index_type, VECTOR_ENCODING)
+        else:
+            # Unchanged rows keep their vectors and positions; new and edited rows are appended
+            index, old_hashes, old_vectors = previous
+            delta = CatalogDelta(old_hashes, hashes)
+            print(f"Updating index from the previous build: {delta.summary()}")
+            documents = [documents[i] for i in delta.new_order]
+            hashes = hashes[delta.new_order]
+            added_vectors = self._embed_documents(documents[len(delta.kept):], index.d)
+            vectors = np.vstack([np.asarray(old_vectors[delta.kept], dtype=np.float32), added_vectors])
+            index = update_index(index, delta.removed, added_vectors, vectors)
+            if index is None:
+                index = build_index(vectors, index_type, VECTOR_ENCODING)
+            # Only rows the delta can have changed are searched again
+            previous_table = NeighborTable.load(VECTOR_STORE_DIR)
+            if previous_table is not None and previous_table.num_documents == len(old_hashes):
+                neighbor_table = previous_table.updated(delta.kept, index, vectors)
+        if neighbor_table is None:
+            neighbor_table = NeighborTable.from_index(index, vectors)
+        docstore_ids = [str(uuid.uuid4()) for _ in documents]
+        vector_store = FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=InMemoryDocstore(dict(zip(docstore_ids, documents))),
+            index_to_docstore_id=dict(enumerate(docstore_ids))
+        )
+        
+        # The manifest is written last, so an interrupted save is rebuilt next start
+        self._save_vector_store(vector_store)
+        ingredient_index = IngredientIndex.from_ingredient_lists(
+            doc.metadata['ingredient_names'] for doc in documents
+        )
+        ingredient_index.save(VECTOR_STORE_DIR)
+        MetadataIndex.from_metadata(doc.metadata for doc in documents).save(VECTOR_STORE_DIR)
+        IngredientVectors.from_index(ingredient_index, vectors).save(VECTOR_STORE_DIR)
+        neighbor_table.save(VECTOR_STORE_DIR)
+        NameIndex.from_names(doc.metadata['name'] for doc in documents).save(VECTOR_STORE_DIR)
+        BM25Index.from_texts(doc.page_content for doc in documents).save(VECTOR_STORE_DIR)
+        export_shared_index(vector_store, VECTOR_STORE_DIR, vectors)
+        save_row_hashes(VECTOR_STORE_DIR, hashes)
+        save_manifest(
+            VECTOR_STORE_DIR,
+            new_manifest(
+                fingerprint, index.d, index.ntotal,
+                index_type=index_type, encoding=VECTOR_ENCODING,
+                index_factory=factory_string(index_type, index.ntotal, index.d, VECTOR_ENCODING),
+                index_bytes=os.path.getsize(os.path.join(VECTOR_STORE_DIR, "index.faiss")),
+                delta=delta.summary() if delta else None,
+                embedding=self._embedding_stats
+            )
+        )
+        print(f"Built {index_type} index ({VECTOR_ENCODING}) over {index.ntotal} cocktails")
+        return vector_store
+
+    @staticmethod
+    def _save_vector_store(vector_store):
+        """
+        Save index.faiss / index.pkl under new inodes: workers in shared mode may
+        have the old index.faiss memory-mapped, and rewriting it in place would pull
+        the pages out from under them.
+        """
+        tmp_dir = tempfile.mkdtemp(prefix=".index.", dir=VECTOR_STORE_DIR)
+        try:
+            vector_store.save_local(tmp_dir)
+            for name in os.listdir(tmp_dir):
+                os.replace(os.path.join(tmp_dir, name), os.path.join(VECTOR_STORE_DIR, name))
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def _open_exact_vectors(self) -> Optional[np.ndarray]:
+        """Full-precision vectors for reranking, mapped from disk only when the index is compressed"""
+        path = os.path.join(VECTOR_STORE_DIR, VECTORS_FILE)
+        if is_exact(self.vector_store.index) or not os.path.exists(path):
+            return None
+        vectors = np.load(path, mmap_mode='r')
+        if vectors.shape[0] != self.vector_store.index.ntotal:
+            print("Exported vectors do not match the index; serving compressed distances")
+            return None
+        return vectors
+
+    def _open_shared_vector_store(self):
+        """Open the read-only, memory-mapped copy of the index"""
+        print(f"Opening shared read-only vector store at {VECTOR_STORE_DIR}...")
+        return SharedVectorStore(VECTOR_STORE_DIR, self.embeddings)
+
+    def _initialize_ingredient_index(self) -> IngredientIndex:
+        """Load the ingredient index saved with the vector store, or rebuild it from the documents"""
+        ntotal = self._index_size()
+        index = IngredientIndex.load(VECTOR_STORE_DIR)
+        if index is not None and index.num_documents == ntotal:
+            return index
+        
+        print("Building ingredient index from vector store documents...")
+        index = IngredientIndex.from_ingredient_lists(
+            self._get_document(i).metadata.get('ingredient_names', []) for i in range(ntotal)
+        )
         try:
-            os.makedirs(os.path.dirname(self.favorites_file), exist_ok=True)
-            with open(self.favorites_file, 'w') as f:
-                json.dump(list(self.favorite_ingredients), f)
+            index.save(VECTOR_STORE_DIR)
         except Exception as e:
-            print(f"Error saving favorites: {e}")
+            print(f"Could not save ingredient index: {e}")
+        return index
 
-    def add_favorite_ingredient(self, ingredient: str):
-        """Add an ingredient to favorites and store in vector DB"""
+    def _initialize_metadata_index(self) -> MetadataIndex:
+        """Load the metadata bitmaps saved with the vector store, or rebuild them from the documents"""
+        ntotal = self._index_size()
+        index = MetadataIndex.load(VECTOR_STORE_DIR)
+        if index is not None and index.num_documents == ntotal:
+            return index
+        
+        print("Building metadata bitmaps from vector store documents...")
+        index = MetadataIndex.from_metadata(self._get_document(i).metadata for i in range(ntotal))
         try:
-            ingredient = ingredient.lower()
-            self.favorite_ingredients.add(ingredient)
-            self._save_favorites()
-
-            # Create a document for the preference
-            preference_doc = Document(
-                page_content=f"User likes {ingredient} in cocktails",
-                metadata={
-                    'type': 'preference',
-                    'ingredient': ingredient,
-                    'timestamp': datetime.now().isoformat()
-                }
+            index.save(VECTOR_STORE_DIR)
+        except Exception as e:
+            print(f"Could not save metadata bitmaps: {e}")
+        return index
+
+    def _initialize_ingredient_vectors(self) -> IngredientVectors:
+        """Load the precomputed ingredient vectors, or rebuild them from the cocktail vectors"""
+        vectors = IngredientVectors.load(VECTOR_STORE_DIR)
+        if vectors is not None and len(vectors.names) == len(self.ingredient_index.postings):
+            return vectors
+        
+        print("Building ingredient vectors from cocktail vectors...")
+        vectors = IngredientVectors.from_index(
+            self.ingredient_index, self._get_vectors(np.arange(self._index_size()))
+        )
+        try:
+            vectors.save(VECTOR_STORE_DIR)
+        except Exception as e:
+            print(f"Could not save ingredient vectors: {e}")
+        return vectors
+
+    def _initialize_neighbor_table(self) -> NeighborTable:
+        """Load the precomputed cocktail neighbors, or rebuild them from the cocktail vectors"""
+        ntotal = self._index_size()
+        table = NeighborTable.load(VECTOR_STORE_DIR)
+        if table is not None and table.num_documents == ntotal and table.k == min(SIMILAR_TOP_K, max(ntotal - 1, 0)):
+            return table
+        
+        print("Building cocktail neighbor table from cocktail vectors...")
+        vectors = self._get_vectors(np.arange(ntotal))
+        index = self.vector_store.index
+        if index is None:
+            # A shared flat fp32 store scans vectors.npy; search a temporary flat index instead
+            index = faiss.IndexFlatL2(vectors.shape[1])
+            index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+        table = NeighborTable.from_index(index, vectors)
+        try:
+            table.save(VECTOR_STORE_DIR)
+        except Exception as e:
+            print(f"Could not save neighbor table: {e}")
+        return table
+
+    def _initialize_name_index(self) -> NameIndex:
+        """Load the cocktail name index saved with the vector store, or rebuild it from the documents"""
+        ntotal = self._index_size()
+        index = NameIndex.load(VECTOR_STORE_DIR)
+        if index is not None and index.num_documents == ntotal:
+            return index
+        
+        print("Building cocktail name index from vector store documents...")
+        index = NameIndex.from_names(self._get_document(i).metadata['name'] for i in range(ntotal))
+        try:
+            index.save(VECTOR_STORE_DIR)
+        except Exception as e:
+            print(f"Could not save name index: {e}")
+        return index
+
+    def _initialize_bm25_index(self) -> BM25Index:
+        """Load the BM25 index saved with the vector store, or rebuild it from the documents"""
+        ntotal = self._index_size()
+        index = BM25Index.load(VECTOR_STORE_DIR)
+        if index is not None and index.num_documents == ntotal:
+            return index
+        
+        print("Building BM25 index from vector store documents...")
+        index = BM25Index.from_texts(self._get_document(i).page_content for i in range(ntotal))
+        try:
+            index.save(VECTOR_STORE_DIR)
+        except Exception as e:
+            print(f"Could not save BM25 index: {e}")
+        return index
+
+    def _index_size(self) -> int:
+        """Number of vectors in the index"""
+        if self.read_only:
+            return self.vector_store.ntotal
+        return self.vector_store.index.ntotal
+
+    def _get_document(self, i: int) -> Document:
+        """Document stored at a position in the index"""
+        if self.read_only:
+            return self.vector_store.get_document(i)
+        return self.vector_store.docstore.search(self.vector_store.index_to_docstore_id[i])
+
+    def _get_vectors(self, ids: np.ndarray) -> np.ndarray:
+        """Stored cocktail vectors for positions in the index"""
+        if self.read_only:
+            return np.asarray(self.vector_store.vectors[ids])
+        if self.exact_vectors is not None:
+            return np.asarray(self.exact_vectors[ids], dtype=np.float32)
+        index = self.vector_store.index
+        return np.vstack([index.reconstruct(int(i)) for i in ids]) if len(ids) else np.empty((0, index.d), np.float32)
+
+    def _search_batch(
+        self, embeddings: np.ndarray, k: int, bitmap: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """One index search for nq query vectors; missing results have id -1"""
+        if self.read_only:
+            return self.vector_store.search(embeddings, k, bitmap=bitmap)
+        if self.exact_vectors is not None and VECTOR_RERANK:
+            # Compressed codes pick candidates; full vectors order them
+            _, ids = search_with_bitmap(
+                self.vector_store.index, embeddings, k * RERANK_FACTOR, bitmap, self.exact_vectors
             )
-            
-            # Add to vector store
-            self.vector_store.add_documents([preference_doc])
-            
+            return rerank_exact(np.asarray(embeddings, dtype=np.float32), ids, self.exact_vectors, k)
+        return search_with_bitmap(self.vector_store.index, embeddings, k, bitmap)
+
+    def _filter_bitmap(
+        self, filters: Optional[Dict] = None, allowed_ids: Optional[np.ndarray] = None
+    ) -> Optional[np.ndarray]:
+        """Bitmap for metadata filters, optionally narrowed to an explicit set of ids"""
+        bitmap = self.metadata_index.bitmap(filters) if filters else None
+        if allowed_ids is not None:
+            allowed = ids_to_bitmap(allowed_ids, self.metadata_index.num_documents)
+            bitmap = allowed if bitmap is None else bitmap & allowed
+        return bitmap
+
+    def _search_ids(
+        self, embedding: List[float], k: int, filters: Optional[Dict] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Distances and index positions of the nearest cocktails to an embedding. filters
+        (e.g. {"alcoholic": "non alcoholic"}) are applied inside the index search, so k
+        results come back whenever k cocktails match.
+        """
+        distances, ids = self._search_batch(np.asarray([embedding]), k, self._filter_bitmap(filters))
+        found = ids[0] >= 0
+        return distances[0][found], ids[0][found]
+
+    def _merge_batch(
+        self, embeddings: List[List[float]], k: int, bitmap: Optional[np.ndarray] = None
+    ) -> List[Tuple[Document, float]]:
+        """Search all query vectors at once and merge hits, keeping each cocktail's best distance"""
+        if not len(embeddings):
+            return []
+        distances, ids = self._search_batch(np.asarray(embeddings, dtype=np.float32), k, bitmap)
+        best = {}
+        for distance, i in zip(distances.ravel(), ids.ravel()):
+            if i >= 0 and (i not in best or distance < best[i]):
+                best[i] = distance
+        ranked = sorted(best.items(), key=lambda item: item[1])[:k]
+        return [(self._get_document(int(i)), float(distance)) for i, distance in ranked]
+
+    def _taste_profile(self, user_id: Optional[str] = None) -> Optional[np.ndarray]:
+        """Taste vector for a user's favorites, cached per distinct favorites set"""
+        favorites = self.favorites.get(user_id)
+        # Profiles depend on the catalog's ingredient vectors, so each snapshot has its own
+        key = (self._current_catalog().generation, favorites)
+        with self._profile_lock:
+            if key in self._profile_cache:
+                self._profile_cache.move_to_end(key)
+                return self._profile_cache[key]
+        names = set()
+        for ingredient in favorites:
+            names.update(self.ingredient_index.matching_ingredients(ingredient))
+        profile = self.ingredient_vectors.profile(names)
+        with self._profile_lock:
+            self._profile_cache[key] = profile
+            while len(self._profile_cache) > PROFILE_CACHE_SIZE:
+                self._profile_cache.popitem(last=False)
+        return profile
+
+    @staticmethod
+    def _cocktail_summary(metadata: Dict) -> Dict:
+        """Fields returned to callers for a cocktail"""
+        return {
+            'name': metadata['name'],
+            'ingredients': metadata['ingredients'],
+            'category': metadata['category'],
+            'glass_type': metadata['glass_type'],
+            'alcoholic': metadata['alcoholic']
+        }
+
+    @property
+    def read_only(self) -> bool:
+        """Whether the index is the shared, memory-mapped copy"""
+        return isinstance(self.vector_store, SharedVectorStore)
+
+    def _embed_query(self, query: str) -> Optional[List[float]]:
+        """Query embedding, or None in lexical mode or when the embedding service fails"""
+        if RETRIEVAL_MODE == "lexical":
+            return None
+        try:
+            return self.embeddings.embed_query(query)
+        except Exception as e:
+            print(f"Embedding failed, falling back to lexical search: {str(e)}")
+            return None
+
+    async def _aembed_query(self, query: str) -> Optional[List[float]]:
+        """Async _embed_query; an embedding slower than EMBED_QUERY_TIMEOUT also falls back"""
+        if RETRIEVAL_MODE == "lexical":
+            return None
+        try:
+            return await asyncio.wait_for(self.embeddings.aembed_query(query), EMBED_QUERY_TIMEOUT)
+        except Exception as e:
+            print(f"Embedding failed, falling back to lexical search: {str(e) or type(e).__name__}")
+            return None
+
+    def _fuse_lexical(
+        self, query: str, vector_ids: Optional[np.ndarray], k: int, filters: Optional[Dict] = None
+    ) -> np.ndarray:
+        """
+        Final ranking per RETRIEVAL_MODE: vector hits alone, or fused with BM25 hits
+        by reciprocal rank. Without vector hits (no embedding) BM25 ranks alone.
+        """
+        if vector_ids is not None and RETRIEVAL_MODE == "vector":
+            return vector_ids[:k]
+        mask = self.metadata_index.mask(filters) if filters else None
+        _, lexical_ids = self.bm25_index.search(query, k * HYBRID_FETCH_FACTOR, mask)
+        if vector_ids is None:
+            return lexical_ids[:k]
+        return reciprocal_rank_fusion([vector_ids, lexical_ids])[:k]
+
+    def _search_query(
+        self, query: str, embedding: Optional[List[float]], k: int, filters: Optional[Dict] = None
+    ) -> List[Document]:
+        vector_ids = None
+        if embedding is not None:
+            fetch = k if RETRIEVAL_MODE == "vector" else k * HYBRID_FETCH_FACTOR
+            _, vector_ids = self._search_ids(embedding, fetch, filters)
+        return [self._get_document(int(i)) for i in self._fuse_lexical(query, vector_ids, k, filters)]
+
+    @_on_snapshot
+    def search_cocktails(self, query: str, k: int = 5, filters: Optional[Dict] = None):
+        """Search for cocktails based on query, optionally restricted by metadata filters"""
+        return self._search_query(query, self._embed_query(query), k, filters)
+
+    async def _run_in_executor(self, func, *args):
+        """Run blocking retrieval work on the bounded search pool, on the caller's catalog snapshot"""
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(CocktailService._executor, functools.partial(context.run, func, *args))
+
+    @_on_snapshot
+    async def asearch_cocktails(self, query: str, k: int = 5, filters: Optional[Dict] = None):
+        """Async search_cocktails: embeds without blocking the event loop and searches on the pool"""
+        embedding = await self._aembed_query(query)
+        return await self._run_in_executor(self._search_query, query, embedding, k, filters)
+
+    def get_cache_stats(self) -> Dict:
+        """Embedding cache hit/miss counters"""
+        return self.embeddings.get_stats()
+
+    def add_favorite_ingredient(self, ingredient: str, user_id: Optional[str] = None):
+        """Add an ingredient to a user's favorites"""
+        try:
+            ingredient = ingredient.lower()
+            self.favorites.add(user_id, ingredient)
             return {"message": f"Added {ingredient} to favorites"}
         except Exception as e:
             print(f"Error adding favorite: {str(e)}")
             raise
 
-    def get_favorite_ingredients(self):
-        """Get user's favorite ingredients"""
-        return list(self.favorite_ingredients)
+    def get_favorite_ingredients(self, user_id: Optional[str] = None):
+        """Get a user's favorite ingredients"""
+        return sorted(self.favorites.get(user_id))
         
+    @_on_snapshot
     def search_cocktails_by_ingredient(self, ingredient: str, limit: int = 5) -> List[Dict]:
         """Search for cocktails containing specific ingredient"""
-        try:
-            # Convert ingredient to lowercase for case-insensitive search
-            ingredient = ingredient.lower().strip()
-            
-            # Search using the ingredient as a query
-            results = self.vector_store.similarity_search(
-                f"cocktail with {ingredient}",
-                k=limit
-            )
-            
-            # Filter results to ensure they contain the ingredient
-            matching_cocktails = []
-            for result in results:
-                if ingredient in result.metadata['ingredients'].lower():
-                    matching_cocktails.append({
-                        'name': result.metadata['name'],
-                        'ingredients': result.metadata['ingredients'],
-                        'category': result.metadata['category'],
-                        'glass_type': result.metadata['glass_type'],
-                        'alcoholic': result.metadata['alcoholic']
-                    })
-                    
-            return matching_cocktails
+        return self.search_cocktails_by_ingredients(include=[ingredient], limit=limit)
 
+    def _rank_ingredient_matches(self, ids: np.ndarray, terms: List[str], limit: int) -> np.ndarray:
+        """
+        The best limit of the exact matches: cocktails matching more of the requested
+        ingredients first, then by BM25 score of those ingredients (cocktails where
+        they make up more of the recipe rank higher) instead of catalog order.
+        """
+        if len(ids) <= 1 or not terms:
+            return ids[:limit]
+        matched = np.zeros(len(ids), dtype=np.int32)
+        for term in terms:
+            matched += np.isin(ids, self.ingredient_index.lookup(term), assume_unique=True)
+        scores = self.bm25_index.scores(" ".join(terms))[ids]
+        order = np.lexsort((-scores, -matched))
+        return ids[order[:limit]]
+
+    @_on_snapshot
+    def search_cocktails_by_ingredients(
+        self,
+        include: List[str] = None,
+        exclude: List[str] = None,
+        any_of: List[str] = None,
+        limit: int = 5
+    ) -> List[Dict]:
+        """
+        Exact ingredient search, e.g. gin AND lemon but NOT grenadine:
+        search_cocktails_by_ingredients(include=["gin", "lemon"], exclude=["grenadine"])
+        """
+        try:
+            ids = self.ingredient_index.query(all_of=include, any_of=any_of, none_of=exclude)
+            return [
+                self._cocktail_summary(self._get_document(int(i)).metadata)
+                for i in self._rank_ingredient_matches(ids, (include or []) + (any_of or []), limit)
+            ]
         except Exception as e:
             print(f"Error searching by ingredient: {str(e)}")
             return []
-        
-    def get_similar_cocktails(self, cocktail_name: str, limit: int = 5) -> List[Dict]:
-        """Find similar cocktails based on ingredients"""
-        cocktail_name = cocktail_name.lower().strip()
-        
-        # Find the reference cocktail
-        reference_cocktail = None
-        for cocktail in self.vector_store.cocktail_data.values():
-            if cocktail['name'].lower() == cocktail_name:
-                reference_cocktail = cocktail
+
+    @_on_snapshot
+    def search_cocktails_batch(
+        self,
+        queries: List[str],
+        k: int = 5,
+        filters: Optional[Dict] = None,
+        allowed_ids: Optional[np.ndarray] = None
+    ) -> List[Tuple[Document, float]]:
+        """
+        Search several queries with one embedding call and one index search (nq = len(queries)).
+        Returns the k best distinct cocktails across all queries as (document, distance) pairs.
+        """
+        embeddings = self.embeddings.embed_documents(queries) if queries else []
+        return self._merge_batch(embeddings, k, self._filter_bitmap(filters, allowed_ids))
+
+    @_on_snapshot
+    async def asearch_cocktails_batch(
+        self,
+        queries: List[str],
+        k: int = 5,
+        filters: Optional[Dict] = None,
+        allowed_ids: Optional[np.ndarray] = None
+    ) -> List[Tuple[Document, float]]:
+        """Async search_cocktails_batch"""
+        embeddings = await self.embeddings.aembed_documents(queries) if queries else []
+        return await self._run_in_executor(
+            self._merge_batch, embeddings, k, self._filter_bitmap(filters, allowed_ids)
+        )
+
+    def _split_known_ingredients(self, ingredients: List[str]) -> Tuple[List[str], List[str]]:
+        """Separate terms found in the catalog's ingredient vocabulary from the rest"""
+        known = [i for i in ingredients if self.ingredient_index.matching_ingredients(i)]
+        unknown = [i for i in ingredients if i not in known]
+        return known, unknown
+
+    @staticmethod
+    def _add_unique(results: List[Dict], docs: List[Tuple[Document, float]], limit: int) -> List[Dict]:
+        seen = {r['name'] for r in results}
+        for doc, _ in docs:
+            if len(results) >= limit:
                 break
-                
-        if not reference_cocktail:
+            if doc.metadata['name'] not in seen:
+                seen.add(doc.metadata['name'])
+                results.append(CocktailService._cocktail_summary(doc.metadata))
+        return results
+
+    @staticmethod
+    def _merge_by_share(groups: List[List[Dict]], shares: List[int], limit: int) -> List[Dict]:
+        """
+        Merge ranked result lists, reserving each non-empty list a part of the limit
+        proportional to its share (e.g. its number of query terms), at least one slot;
+        slots a list cannot fill go to the others. Duplicates by name are dropped.
+        """
+        active = [i for i, group in enumerate(groups) if group and shares[i]]
+        quotas = [0] * len(groups)
+        for i in active:
+            quotas[i] = max(1, limit * shares[i] // sum(shares[j] for j in active))
+        merged, seen = [], set()
+
+        def take(group: List[Dict], count: int):
+            for result in group:
+                if count <= 0 or len(merged) >= limit:
+                    break
+                if result['name'] not in seen:
+                    seen.add(result['name'])
+                    merged.append(result)
+                    count -= 1
+
+        for i in active:
+            take(groups[i], quotas[i])
+        for i in active:
+            take(groups[i], limit - len(merged))
+        return merged
+
+    @_on_snapshot
+    def search_cocktails_for_ingredients(
+        self, ingredients: List[str], exclude: List[str] = None, limit: int = 5
+    ) -> List[Dict]:
+        """
+        Cocktails with any of several ingredients. Catalog ingredients are answered by the
+        exact index in one posting-list query; terms the catalog does not know
+        ("berries", "smoky") fall back to a single batched vector search. Each side gets
+        a share of the limit in proportion to its terms, so every term contributes.
+        """
+        try:
+            known, unknown = self._split_known_ingredients(ingredients)
+            exact = self.search_cocktails_by_ingredients(any_of=known, exclude=exclude, limit=limit) if known else []
+            similar = []
+            if unknown:
+                docs = self.search_cocktails_batch(
+                    [f"cocktail with {i}" for i in unknown],
+                    k=limit,
+                    filters={"type": "cocktail"},
+                    allowed_ids=self.ingredient_index.query(none_of=exclude) if exclude else None
+                )
+                similar = self._add_unique([], docs, limit)
+            return self._merge_by_share([exact, similar], [len(known), len(unknown)], limit)
+        except Exception as e:
+            print(f"Error searching by ingredients: {str(e)}")
             return []
-            
-        # Get embedding for reference cocktail
-        ingredients_text = " ".join(reference_cocktail['ingredients'])
-        query_embedding = self.embeddings.embed_query(ingredients_text)
+
+    @_on_snapshot
+    async def asearch_cocktails_for_ingredients(
+        self, ingredients: List[str], exclude: List[str] = None, limit: int = 5
+    ) -> List[Dict]:
+        """Async search_cocktails_for_ingredients"""
+        try:
+            known, unknown = self._split_known_ingredients(ingredients)
+            exact = await self.asearch_cocktails_by_ingredients(any_of=known, exclude=exclude, limit=limit) if known else []
+            similar = []
+            if unknown:
+                docs = await self.asearch_cocktails_batch(
+                    [f"cocktail with {i}" for i in unknown],
+                    k=limit,
+                    filters={"type": "cocktail"},
+                    allowed_ids=self.ingredient_index.query(none_of=exclude) if exclude else None
+                )
+                similar = self._add_unique([], docs, limit)
+            return self._merge_by_share([exact, similar], [len(known), len(unknown)], limit)
+        except Exception as e:
+            print(f"Error searching by ingredients: {str(e)}")
+            return []
+
+    @_on_snapshot
+    async def asearch_cocktails_by_ingredient(self, ingredient: str, limit: int = 5) -> List[Dict]:
+        """Async search_cocktails_by_ingredient"""
+        return await self._run_in_executor(self.search_cocktails_by_ingredient, ingredient, limit)
+
+    @_on_snapshot
+    async def asearch_cocktails_by_ingredients(
+        self,
+        include: List[str] = None,
+        exclude: List[str] = None,
+        any_of: List[str] = None,
+        limit: int = 5
+    ) -> List[Dict]:
+        """Async search_cocktails_by_ingredients"""
+        return await self._run_in_executor(
+            self.search_cocktails_by_ingredients, include, exclude, any_of, limit
+        )
         
-        # Find similar cocktails
-        return self.vector_store.search_similar(query_embedding, k=limit)
+    @_on_snapshot
+    def get_similar_cocktails(self, cocktail_name: str, limit: int = 5) -> List[Dict]:
+        """Find the cocktails closest to a named one, from the precomputed neighbor table"""
+        try:
+            position = self.name_index.lookup(cocktail_name)
+            if position is None:
+                return []
+            
+            reference = self._get_document(position).metadata['name'].lower()
+            # Duplicate rows of the same cocktail are skipped, so read a few extra neighbors
+            ids, _ = self.neighbor_table.neighbors(position)
+            if len(ids) < min(limit + 2, self._index_size() - 1):
+                # More than the table holds: search with the cocktail's own stored vector
+                _, found = self._search_batch(self._get_vectors(np.asarray([position])), limit + 3)
+                ids = found[0][(found[0] >= 0) & (found[0] != position)]
+            
+            results = []
+            for i in ids:
+                metadata = self._get_document(int(i)).metadata
+                if metadata['name'].lower() == reference:
+                    continue
+                results.append(self._cocktail_summary(metadata))
+                if len(results) == limit:
+                    break
+            return results
+        except Exception as e:
+            print(f"Error getting similar cocktails: {str(e)}")
+            return []
         
+    @_on_snapshot
+    async def aget_similar_cocktails(self, cocktail_name: str, limit: int = 5) -> List[Dict]:
+        """Async get_similar_cocktails"""
+        return await self._run_in_executor(self.get_similar_cocktails, cocktail_name, limit)
+
+    @_on_snapshot
+    def get_recipe(self, cocktail_name: str) -> Optional[Dict]:
+        """Full recipe of the cocktail best matching a name (typos allowed), or None"""
+        try:
+            position = self.name_index.lookup(cocktail_name)
+            if position is None:
+                return None
+            metadata = self._get_document(position).metadata
+            return {**self._cocktail_summary(metadata), 'instructions': metadata.get('instructions', '')}
+        except Exception as e:
+            print(f"Error getting recipe: {str(e)}")
+            return None
+
+    @_on_snapshot
+    async def aget_recipe(self, cocktail_name: str) -> Optional[Dict]:
+        """Async get_recipe"""
+        return await self._run_in_executor(self.get_recipe, cocktail_name)
+
+    @_on_snapshot
     def get_non_alcoholic_cocktails(self, limit: int = 5) -> List[Dict]:
         """Get non-alcoholic cocktails"""
         try:
-            # Search using explicit query for non-alcoholic drinks
-            results = self.vector_store.similarity_search(
-                "non-alcoholic cocktails",
-                k=limit * 2,  # Get more results to filter
-                filter={"type": "cocktail"}
-            )
-            
-            # Filter results to ensure they're non-alcoholic
-            non_alcoholic = []
-            for result in results:
-                if result.metadata['alcoholic'].lower() == 'non alcoholic':
-                    non_alcoholic.append({
-                        'name': result.metadata['name'],
-                        'ingredients': result.metadata['ingredients'],
-                        'category': result.metadata['category'],
-                        'glass_type': result.metadata['glass_type'],
-                        'alcoholic': result.metadata['alcoholic']
-                    })
-                    if len(non_alcoholic) >= limit:
-                        break
-                    
-            return non_alcoholic
+            # Search using explicit query, restricted to non-alcoholic drinks inside the index
+            results = self.search_cocktails(NON_ALCOHOLIC_QUERY, k=limit, filters=NON_ALCOHOLIC_FILTERS)
+            return [self._cocktail_summary(result.metadata) for result in results]
         except Exception as e:
             print(f"Error getting non-alcoholic cocktails: {str(e)}")
             return []
 
-    def search_with_preferences(self, query: str, k: int = 5):
-        """Search cocktails considering user preferences"""
+    @_on_snapshot
+    async def aget_non_alcoholic_cocktails(self, limit: int = 5) -> List[Dict]:
+        """Async get_non_alcoholic_cocktails"""
         try:
-            # Get user's preferences
-            preferences = list(self.favorite_ingredients)
-            
-            if preferences:
-                # Enhance query with preferences
-                enhanced_query = f"{query} with ingredients like {', '.join(preferences)}"
-            else:
-                enhanced_query = query
-            
-            # Search using enhanced query
-            results = self.vector_store.similarity_search(
-                enhanced_query,
-                k=k,
-                filter={"type": "cocktail"}  # Only return cocktail documents
-            )
-            
-            return results
+            results = await self.asearch_cocktails(NON_ALCOHOLIC_QUERY, k=limit, filters=NON_ALCOHOLIC_FILTERS)
+            return [self._cocktail_summary(result.metadata) for result in results]
+        except Exception as e:
+            print(f"Error getting non-alcoholic cocktails: {str(e)}")
+            return []
+
+    def _rank_with_preferences(
+        self, query: str, embedding: Optional[List[float]], k: int,
+        filters: Optional[Dict] = None, user_id: Optional[str] = None
+    ):
+        """
+        Nearest cocktails to an embedding, reranked towards the user's taste profile
+        and then fused with BM25 hits per RETRIEVAL_MODE (BM25 alone without an embedding)
+        """
+        filters = {"type": "cocktail", **(filters or {})}
+        if embedding is None:
+            return self._search_query(query, None, k, filters)
+        profile = self._taste_profile(user_id) if PREFERENCE_WEIGHT > 0 else None
+        fetch = k if RETRIEVAL_MODE == "vector" else k * HYBRID_FETCH_FACTOR
+        
+        if profile is None:
+            _, vector_ids = self._search_ids(embedding, fetch, filters)
+        else:
+            _, ids = self._search_ids(embedding, fetch * PREFERENCE_FETCH_FACTOR, filters)
+            scores = preference_scores(embedding, self._get_vectors(ids), profile, PREFERENCE_WEIGHT)
+            vector_ids = ids[np.argsort(-scores)[:fetch]]
+        return [self._get_document(int(i)) for i in self._fuse_lexical(query, vector_ids, k, filters)]
+
+    @_on_snapshot
+    def search_with_preferences(
+        self, query: str, k: int = 5, filters: Optional[Dict] = None, user_id: Optional[str] = None
+    ):
+        """Search cocktails, reranking the hits towards the user's favorite ingredients"""
+        try:
+            # The query is embedded on its own, so its embedding stays cacheable
+            embedding = self._embed_query(query)
+            return self._rank_with_preferences(query, embedding, k, filters, user_id)
+        except Exception as e:
+            print(f"Error in preference-based search: {str(e)}")
+            return []
+
+    @_on_snapshot
+    async def asearch_with_preferences(
+        self, query: str, k: int = 5, filters: Optional[Dict] = None, user_id: Optional[str] = None
+    ):
+        """Async search_with_preferences"""
+        try:
+            embedding = await self._aembed_query(query)
+            return await self._run_in_executor(self._rank_with_preferences, query, embedding, k, filters, user_id)
         except Exception as e:
             print(f"Error in preference-based search: {str(e)}")
             return []
 
-    def remove_favorite_ingredient(self, ingredient: str):
-        """Remove an ingredient from favorites"""
+    def remove_favorite_ingredient(self, ingredient: str, user_id: Optional[str] = None):
+        """Remove an ingredient from a user's favorites"""
         try:
             ingredient = ingredient.lower()
-            if ingredient in self.favorite_ingredients:
-                self.favorite_ingredients.remove(ingredient)
-                self._save_favorites()
+            if self.favorites.remove(user_id, ingredient):
                 return {"message": f"Removed {ingredient} from favorites"}
             return {"message": f"{ingredient} was not in your favorites"}
         except Exception as e:
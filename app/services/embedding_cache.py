@@ -0,0 +1,305 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "data/embedding_cache.sqlite")
+EMBEDDING_CACHE_MAX_MB = float(os.getenv("EMBEDDING_CACHE_MAX_MB", "256"))
+EMBEDDING_CACHE_MEMORY_ITEMS = int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", "2048"))
+# Disk hits refresh last_access in batches, at most this often (seconds) or every TOUCH_BATCH hits
+EMBEDDING_CACHE_TOUCH_INTERVAL = float(os.getenv("EMBEDDING_CACHE_TOUCH_INTERVAL", "30"))
+EMBEDDING_CACHE_TOUCH_BATCH = 256
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form of a text used both as cache key and as embedding input"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper with an in-process LRU tier and an on-disk SQLite tier.
+
+    Entries are keyed by a hash of (model, normalized text), so identical
+    queries are only sent to the embedding API once across restarts and
+    worker processes. The disk tier is evicted least-recently-used first
+    once it grows past max_bytes, tracked as a running byte total so the
+    table is only scanned when the limit is crossed; last_access updates of
+    disk hits are batched. Both tiers hold float32 vectors (about 6 KB per
+    1536-dim entry in memory); they become lists only when returned through
+    the Embeddings API. The async methods only touch the memory
+    tier on the event loop; disk reads and writes run in the default executor.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model: str,
+        path: Optional[str] = EMBEDDING_CACHE_PATH,
+        max_bytes: int = int(EMBEDDING_CACHE_MAX_MB * 1024 * 1024),
+        memory_items: int = EMBEDDING_CACHE_MEMORY_ITEMS
+    ):
+        self.embeddings = embeddings
+        self.model = model
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        # Guards the memory tier and stats; disk access has its own lock so
+        # a slow SQLite call never blocks memory hits on the event loop
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+
+        # The disk tier connects lazily in each process: a connection opened in
+        # a preloading gunicorn master must not be shared by forked workers
+        self.path = path or None
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_pid: Optional[int] = None
+        self._disk_bytes = 0
+        self._touched: Dict[str, float] = {}
+        self._last_touch_flush = time.time()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # Locks may have been held by another thread of the parent at fork time
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._touched = {}
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        """This process's disk tier connection, opened on first use; caller holds _db_lock"""
+        if self.path is None:
+            return None
+        if self._db is not None and self._db_pid == os.getpid():
+            return self._db
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, "
+                "size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings(last_access)"
+            )
+            db.commit()
+            self._disk_bytes = db.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+        except Exception as e:
+            print(f"Error opening embedding cache, continuing without disk tier: {e}")
+            self.path = None
+            return None
+        self._db, self._db_pid = db, os.getpid()
+        self._touched = {}
+        return db
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _memory_lookup(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Resolve keys from the memory tier"""
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+                    self.stats['memory_hits'] += 1
+        return found
+
+    def _disk_lookup(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Resolve keys from the disk tier, promoting hits to the memory tier"""
+        if self.path is None or not keys:
+            return {}
+        rows = []
+        with self._db_lock:
+            if self._connection() is None:
+                return {}
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                rows.extend(self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall())
+            now = time.time()
+            for key, _ in rows:
+                self._touched[key] = now
+            if (len(self._touched) >= EMBEDDING_CACHE_TOUCH_BATCH
+                    or (self._touched and now - self._last_touch_flush >= EMBEDDING_CACHE_TOUCH_INTERVAL)):
+                self._flush_touched()
+                self._db.commit()
+        found = {key: np.frombuffer(blob, dtype=np.float32) for key, blob in rows}
+        with self._lock:
+            for key, vector in found.items():
+                self._remember(key, vector)
+            self.stats['disk_hits'] += len(found)
+        return found
+
+    def _memory_store(self, entries: Dict[str, np.ndarray]):
+        with self._lock:
+            for key, vector in entries.items():
+                self._remember(key, vector)
+
+    def _disk_store(self, entries: Dict[str, np.ndarray]):
+        """Write freshly computed vectors to the disk tier"""
+        if self.path is None or not entries:
+            return
+        now = time.time()
+        rows = []
+        for key, vector in entries.items():
+            blob = vector.tobytes()
+            rows.append((key, blob, len(blob), now))
+        with self._db_lock:
+            if self._connection() is None:
+                return
+            for row in rows:
+                # A key always maps to the same vector, so an existing row needs no rewrite
+                cursor = self._db.execute(
+                    "INSERT OR IGNORE INTO embeddings (key, vector, size, last_access) VALUES (?, ?, ?, ?)", row
+                )
+                self._disk_bytes += row[2] * cursor.rowcount
+            if self._disk_bytes > self.max_bytes:
+                self._evict()
+            self._db.commit()
+
+    def _flush_touched(self):
+        """Write pending last_access updates of disk hits; caller holds _db_lock and commits"""
+        if self._touched:
+            self._db.executemany(
+                "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                [(now, key) for key, now in self._touched.items()]
+            )
+            self._touched = {}
+        self._last_touch_flush = time.time()
+
+    def _evict(self):
+        """Drop least recently used disk entries until the cache fits in max_bytes"""
+        # Resync the running total: other processes share the file
+        self._flush_touched()
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+        self._disk_bytes = total
+        if total <= self.max_bytes:
+            return
+        target = total - int(self.max_bytes * 0.9)
+        freed = 0
+        stale = []
+        for key, size in self._db.execute("SELECT key, size FROM embeddings ORDER BY last_access"):
+            stale.append((key,))
+            freed += size
+            if freed >= target:
+                break
+        self._db.executemany("DELETE FROM embeddings WHERE key = ?", stale)
+        self._disk_bytes = total - freed
+        with self._lock:
+            self.stats['evictions'] += len(stale)
+
+    def _keys(self, texts: List[str]):
+        normalized = [normalize_text(text) for text in texts]
+        return [self._key(text) for text in normalized], normalized
+
+    def _missing(self, keys: List[str], normalized: List[str], found: Dict[str, np.ndarray]) -> Dict[str, str]:
+        missing = {}
+        for key, text in zip(keys, normalized):
+            if key not in found and key not in missing:
+                missing[key] = text
+        with self._lock:
+            self.stats['misses'] += len(missing)
+        return missing
+
+    def _prepare(self, texts: List[str]):
+        keys, normalized = self._keys(texts)
+        unique = list(dict.fromkeys(keys))
+        found = self._memory_lookup(unique)
+        found.update(self._disk_lookup([key for key in unique if key not in found]))
+        return keys, found, self._missing(keys, normalized, found)
+
+    async def _aprepare(self, texts: List[str]):
+        keys, normalized = self._keys(texts)
+        unique = list(dict.fromkeys(keys))
+        found = self._memory_lookup(unique)
+        pending = [key for key in unique if key not in found]
+        if pending and self.path is not None:
+            loop = asyncio.get_running_loop()
+            found.update(await loop.run_in_executor(None, self._disk_lookup, pending))
+        return keys, found, self._missing(keys, normalized, found)
+
+    @staticmethod
+    def _computed(keys, vectors) -> Dict[str, np.ndarray]:
+        """Freshly computed vectors by key, as read-only float32 arrays"""
+        computed = {}
+        for key, vector in zip(keys, vectors):
+            vector = np.asarray(vector, dtype=np.float32)
+            vector.flags.writeable = False
+            computed[key] = vector
+        return computed
+
+    def _store(self, entries: Dict[str, np.ndarray]):
+        """Add freshly computed vectors to both tiers"""
+        self._memory_store(entries)
+        self._disk_store(entries)
+
+    async def _astore(self, entries: Dict[str, np.ndarray]):
+        self._memory_store(entries)
+        if self.path is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self._disk_store, entries)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = self._prepare(texts)
+        if missing:
+            computed = self._computed(missing.keys(), self.embeddings.embed_documents(list(missing.values())))
+            self._store(computed)
+            found.update(computed)
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        keys, found, missing = self._prepare([text])
+        if missing:
+            computed = self._computed(keys, [self.embeddings.embed_query(missing[keys[0]])])
+            self._store(computed)
+            found.update(computed)
+        return found[keys[0]].tolist()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = await self._aprepare(texts)
+        if missing:
+            computed = self._computed(missing.keys(), await self.embeddings.aembed_documents(list(missing.values())))
+            await self._astore(computed)
+            found.update(computed)
+        return [found[key].tolist() for key in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        keys, found, missing = await self._aprepare([text])
+        if missing:
+            computed = self._computed(keys, [await self.embeddings.aembed_query(missing[keys[0]])])
+            await self._astore(computed)
+            found.update(computed)
+        return found[keys[0]].tolist()
+
+    def get_stats(self) -> Dict:
+        """Hit/miss counters and current tier sizes"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['memory_items'] = len(self._memory)
+            stats['memory_bytes'] = sum(vector.nbytes for vector in self._memory.values())
+        with self._db_lock:
+            self._connection()
+            stats['disk_bytes'] = self._disk_bytes
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
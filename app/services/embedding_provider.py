@@ -0,0 +1,104 @@
+import os
+import re
+import zlib
+from typing import Callable, Dict, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from .embedding_cache import CachedEmbeddings, normalize_text
+
+# "openai" calls the OpenAI embeddings API; "local" computes hashed n-gram
+# embeddings on the CPU with no network access
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai").lower()
+LOCAL_EMBEDDING_DIM = int(os.getenv("LOCAL_EMBEDDING_DIM", "384"))
+
+WORD = re.compile(r"[a-z0-9]+")
+
+
+class HashedNgramEmbeddings(Embeddings):
+    """
+    Deterministic embeddings from hashed word and character n-grams.
+
+    Word unigrams and bigrams plus character 3-5 grams of each word are hashed
+    (crc32) into `dimension` signed buckets, weighted by sublinear term
+    frequency and L2-normalized. Texts sharing words or word fragments get
+    high cosine similarity, which is enough for catalog search and for the
+    caches and classifiers built on embedding similarity, at no API cost.
+    """
+
+    def __init__(self, dimension: int = LOCAL_EMBEDDING_DIM, word_weight: float = 1.0, char_weight: float = 0.5):
+        self.dimension = dimension
+        self.word_weight = word_weight
+        self.char_weight = char_weight
+        # Part of every cache key and index fingerprint, so changing the settings rebuilds the index
+        self.model = f"hashed-ngram-v1-{dimension}"
+
+    def _features(self, text: str) -> Dict[str, float]:
+        words = WORD.findall(normalize_text(text).lower())
+        features: Dict[str, float] = {}
+        for i, word in enumerate(words):
+            features[f"w:{word}"] = features.get(f"w:{word}", 0.0) + self.word_weight
+            if i:
+                bigram = f"b:{words[i - 1]} {word}"
+                features[bigram] = features.get(bigram, 0.0) + self.word_weight
+            padded = f"<{word}>"
+            for n in (3, 4, 5):
+                for start in range(len(padded) - n + 1):
+                    gram = f"c:{padded[start:start + n]}"
+                    features[gram] = features.get(gram, 0.0) + self.char_weight
+        return features
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        features = self._features(text)
+        if not features:
+            return vector
+        hashes = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in features), dtype=np.uint32, count=len(features))
+        # Sublinear term frequency damps long, repetitive instructions
+        weights = 1.0 + np.log(np.fromiter(features.values(), dtype=np.float32, count=len(features)) + 1.0)
+        signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+        np.add.at(vector, (hashes % self.dimension).astype(np.int64), signs * weights)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm > 0 else vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return np.vstack([self._embed(text) for text in texts]).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text).tolist()
+
+
+def _openai_embeddings() -> Embeddings:
+    from langchain_openai import OpenAIEmbeddings
+    # Against a custom endpoint (such as scripts/mock_openai.py) texts are sent as-is instead of
+    # being chunked with tiktoken, whose cl100k_base download needs network access
+    openai_embeddings = OpenAIEmbeddings(
+        openai_api_key=os.getenv("OPENAI_API_KEY"),
+        check_embedding_ctx_length=not os.getenv("OPENAI_BASE_URL")
+    )
+    # Behind the persistent cache, so repeated texts cost one API call across restarts and workers
+    return CachedEmbeddings(openai_embeddings, model=openai_embeddings.model)
+
+
+def _local_embeddings() -> Embeddings:
+    local_embeddings = HashedNgramEmbeddings()
+    # Recomputing is cheaper than a disk lookup, so only the in-memory tier is used
+    return CachedEmbeddings(local_embeddings, model=local_embeddings.model, path=None)
+
+
+# Embedding providers by EMBEDDING_PROVIDER name; each returns an Embeddings with `model` and get_stats()
+EMBEDDING_PROVIDERS: Dict[str, Callable[[], Embeddings]] = {
+    "openai": _openai_embeddings,
+    "local": _local_embeddings,
+}
+
+
+def create_embeddings(provider: str = EMBEDDING_PROVIDER) -> Embeddings:
+    """Embeddings for the configured provider"""
+    factory = EMBEDDING_PROVIDERS.get(provider)
+    if factory is None:
+        raise ValueError(f"Unknown EMBEDDING_PROVIDER {provider!r}; expected one of {sorted(EMBEDDING_PROVIDERS)}")
+    return factory()
@@ -0,0 +1,264 @@
+import os
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Minimum cosine similarity to a prototype phrase before its intent is trusted
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.9"))
+
+NUMBER_WORDS = {
+    'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5,
+    'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10
+}
+
+GREETING = re.compile(r"^(hi|hello|hey|hiya|howdy|yo|good (morning|afternoon|evening))\b[\s!.,]*(there|bot)?[\s!.]*$")
+HELP = re.compile(r"^(help|what can you do|how does this work|what do you do)\b")
+LIST_FAVORITES = re.compile(
+    r"^(?:(?:show|list|what are|tell me|see|view)(?: me)?(?: all)?(?: of)? )?"
+    r"my (?:current )?favou?rites?(?: ingredients)?[?.!]*$"
+)
+# Bare "add"/"remove" verbs only count with an explicit favorites target ("add sugar to it" is not one)
+ADD_FAVORITE = re.compile(
+    r"^(?:i (?:really )?(?:like|love|enjoy|adore) (?P<liked>.+?)|add (?P<added>.+?) to (?:my )?favou?rites)[.!]*$"
+)
+REMOVE_FAVORITE = re.compile(
+    r"^(?:i (?:don't|do not|dont) like (?P<disliked>.+?)|i hate (?P<hated>.+?)"
+    r"|(?:remove|delete) (?P<removed>.+?) from (?:my )?favou?rites)[.!]*$"
+)
+# Only a plain list request; questions about mocktails are left to the LLM
+NON_ALCOHOLIC = re.compile(
+    r"^(?:show|list|suggest|give|recommend|find)(?: me)?(?: some| a few| a couple of)?(?: \w+)? "
+    r"(?:mocktails?|(?:non[- ]?alcoholic|alcohol[- ]free|virgin) (?:cocktails?|drinks?))(?: please)?[.!]*$"
+)
+QUESTION_OR_NEGATION = re.compile(r"\?|\b(?:not|no|don't|dont|never|hate|without)\b")
+WITH_INGREDIENTS = re.compile(
+    r"^(?:show me |give me |find |suggest |recommend )?(?:some |a |an )?(?:\w+ )?"
+    r"(?:cocktails?|drinks?) (?:with|containing|made with) (?P<items>.+?)[?.!]*$"
+)
+RECIPE = re.compile(
+    r"^(?:how (?:do|can|should|would) (?:i|you|we) (?:make|mix|prepare)|(?:give me |show me |what(?:'s|s| is) )?"
+    r"(?:the |a )?recipe (?:for|of)|what(?:'s|s| is) in) (?:a |an |the )?(?P<name>.+?)(?: cocktail)?[?.!]*$"
+)
+SPLIT_ITEMS = re.compile(r"\s*(?:,|\band\b|&|\bor\b)\s*")
+
+# Phrases whose intent needs no extracted slots, matched by embedding similarity
+PROTOTYPES = {
+    'greeting': [
+        "hello, how are you?", "hi there", "good evening!", "hey, nice to meet you"
+    ],
+    'help': [
+        "what can you help me with?", "how do I use this?", "what kind of questions can I ask you?"
+    ],
+    'list_favorites': [
+        "what ingredients have I saved?", "remind me what I like", "which favorites do I have?"
+    ],
+    'non_alcoholic': [
+        "something without alcohol please", "I'm driving, what can I drink?", "drinks for kids"
+    ],
+}
+
+
+def _understanding(
+    primary: str,
+    secondary: str,
+    requires_cocktail_context: bool = False,
+    preference_action: str = "none",
+    ingredients: Optional[List[str]] = None,
+    show_current_favorites: bool = False,
+    search_type: str = "none",
+    filters: Optional[Dict] = None,
+    required_actions: Optional[List[str]] = None
+) -> Dict:
+    """Build a dict with the same shape LLMService._understand_message returns"""
+    return {
+        "intent": {
+            "primary": primary,
+            "secondary": secondary,
+            "requires_cocktail_context": requires_cocktail_context
+        },
+        "preferences": {
+            "action": preference_action,
+            "ingredients": ingredients or [],
+            "show_current_favorites": show_current_favorites
+        },
+        "cocktail_search": {
+            "type": search_type,
+            "filters": {
+                "count": None,
+                "is_alcoholic": None,
+                "ingredients": [],
+                "excluded_ingredients": [],
+                "similar_to": None,
+                "name": None,
+                "category": None,
+                "other_constraints": [],
+                **(filters or {})
+            }
+        },
+        "conversation": {
+            "topic": "cocktails" if requires_cocktail_context else "general",
+            "requires_clarification": False,
+            "sentiment": "neutral",
+            "is_follow_up": False
+        },
+        "required_actions": required_actions or []
+    }
+
+
+def _extract_count(text: str) -> Optional[int]:
+    match = re.search(r"\b(\d{1,2})\b", text)
+    if match:
+        return int(match.group(1))
+    for word, value in NUMBER_WORDS.items():
+        if re.search(rf"\b{word}\b", text):
+            return value
+    return None
+
+
+class IntentClassifier:
+    """
+    Local fast path for common intents. Rules handle messages whose slots can
+    be extracted reliably (ingredients must exist in the catalog), and
+    nearest-prototype matching over cached embeddings handles slot-free
+    intents. Anything below the confidence threshold returns None so the
+    caller falls back to the LLM.
+    """
+
+    def __init__(self, cocktail_service, threshold: float = INTENT_CONFIDENCE_THRESHOLD):
+        self.cocktail_service = cocktail_service
+        self.threshold = threshold
+        self._labels: List[str] = []
+        self._prototypes: Optional[np.ndarray] = None
+        self.stats = {'rules': 0, 'prototypes': 0, 'fallbacks': 0}
+
+    def _known_ingredients(self, text: str) -> Optional[List[str]]:
+        """Split a list of items, returning None unless every item is a catalog ingredient"""
+        items = [item.strip(" .!?") for item in SPLIT_ITEMS.split(text)]
+        items = [re.sub(r"^(the|some|a|an)\s+", "", item) for item in items if item]
+        index = self.cocktail_service.ingredient_index
+        if not items or not all(index.matching_ingredients(item) for item in items):
+            return None
+        return items
+
+    def _names_cocktail(self, text: str) -> bool:
+        """Whether the text names a cocktail, also with its conjunctions dropped ("gin and tonic")"""
+        name_index = self.cocktail_service.name_index
+        return name_index.mentions(text) or name_index.mentions(SPLIT_ITEMS.sub(" ", text))
+
+    def _favorite_ingredients(self, match: Optional[re.Match]) -> Optional[List[str]]:
+        """Ingredients of a favorites rule match, or None unless they are all known and name no cocktail"""
+        if not match:
+            return None
+        items = match.group(match.lastgroup)
+        if self._names_cocktail(items):
+            return None
+        return self._known_ingredients(items)
+
+    def classify_rules(self, message: str) -> Optional[Dict]:
+        """Rule-based classification; None when no rule applies confidently"""
+        text = " ".join(message.lower().strip().split())
+
+        if GREETING.match(text):
+            return _understanding("greeting", "casual_conversation")
+        if HELP.match(text):
+            return _understanding("help_request", "casual_conversation")
+        if LIST_FAVORITES.match(text):
+            return _understanding(
+                "preference_management", "list_favorites",
+                preference_action="list", show_current_favorites=True,
+                required_actions=["list_favorites"]
+            )
+
+        ingredients = self._favorite_ingredients(REMOVE_FAVORITE.match(text))
+        if ingredients:
+            return _understanding(
+                "preference_management", "remove_favorite",
+                preference_action="remove", ingredients=ingredients,
+                required_actions=["remove_favorite"]
+            )
+
+        ingredients = self._favorite_ingredients(ADD_FAVORITE.match(text))
+        if ingredients:
+            return _understanding(
+                "preference_management", "add_favorite",
+                preference_action="add", ingredients=ingredients,
+                required_actions=["add_favorite"]
+            )
+
+        if NON_ALCOHOLIC.match(text):
+            if QUESTION_OR_NEGATION.search(text) or self._names_cocktail(text):
+                return None
+            return _understanding(
+                "cocktail_request", "find_non_alcoholic", requires_cocktail_context=True,
+                search_type="by_category",
+                filters={"is_alcoholic": False, "count": _extract_count(text)}
+            )
+
+        match = RECIPE.match(text)
+        if match and self.cocktail_service.get_recipe(match.group("name")) is not None:
+            return _understanding(
+                "cocktail_request", "get_recipe", requires_cocktail_context=True,
+                search_type="by_name", filters={"name": match.group("name"), "count": 1}
+            )
+
+        match = WITH_INGREDIENTS.match(text)
+        if match:
+            ingredients = self._known_ingredients(match.group("items"))
+            if ingredients:
+                return _understanding(
+                    "cocktail_request", "find_by_ingredient", requires_cocktail_context=True,
+                    search_type="by_ingredient",
+                    filters={"ingredients": ingredients, "count": _extract_count(text)}
+                )
+        return None
+
+    async def _prototype_vectors(self) -> np.ndarray:
+        if self._prototypes is None:
+            labels, phrases = [], []
+            for label, examples in PROTOTYPES.items():
+                labels.extend([label] * len(examples))
+                phrases.extend(examples)
+            vectors = np.asarray(await self.cocktail_service.embeddings.aembed_documents(phrases), dtype=np.float32)
+            self._labels = labels
+            self._prototypes = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        return self._prototypes
+
+    async def classify_prototypes(self, message: str) -> Optional[Dict]:
+        """Nearest-prototype classification; None below the confidence threshold"""
+        prototypes = await self._prototype_vectors()
+        vector = np.asarray(await self.cocktail_service.embeddings.aembed_query(message), dtype=np.float32)
+        similarities = prototypes @ (vector / np.linalg.norm(vector))
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            return None
+
+        label = self._labels[best]
+        if label == 'greeting':
+            return _understanding("greeting", "casual_conversation")
+        if label == 'help':
+            return _understanding("help_request", "casual_conversation")
+        if label == 'list_favorites':
+            return _understanding(
+                "preference_management", "list_favorites",
+                preference_action="list", show_current_favorites=True,
+                required_actions=["list_favorites"]
+            )
+        return _understanding(
+            "cocktail_request", "find_non_alcoholic", requires_cocktail_context=True,
+            search_type="by_category", filters={"is_alcoholic": False}
+        )
+
+    async def classify(self, message: str) -> Optional[Dict]:
+        """Classify locally, or return None so the caller asks the LLM"""
+        understanding = self.classify_rules(message)
+        if understanding is not None:
+            self.stats['rules'] += 1
+            return understanding
+        try:
+            understanding = await self.classify_prototypes(message)
+        except Exception as e:
+            print(f"Error in prototype intent matching: {str(e)}")
+            understanding = None
+        self.stats['prototypes' if understanding is not None else 'fallbacks'] += 1
+        return understanding
@@ -1,11 +1,45 @@
-from langchain.memory import ConversationBufferMemory
 from langchain_openai import ChatOpenAI
-from typing import List, Dict
+from langchain_community.callbacks import get_openai_callback
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from pydantic import ValidationError
+from typing import AsyncIterator, List, Dict, Optional, Tuple
+import asyncio
+import json
 import os
+import time
 from app.services.cocktail_service import CocktailService
+from app.services.intent_classifier import IntentClassifier
+from app.services.response_cache import SemanticResponseCache
+from app.services.session_memory import Session, SessionStore, count_tokens
+from app.models.schemas import (
+    COCKTAIL_TOOLS, SearchByIngredients, GetNonAlcoholicCocktails,
+    GetSimilarCocktails, GetRecipe, SearchWithPreferences, UpdateFavorites
+)
+
+# Classify common intents locally before paying for the _understand_message LLM call
+LOCAL_INTENT_CLASSIFIER = os.getenv("LOCAL_INTENT_CLASSIFIER", "true").lower() == "true"
+
+# "two_call": one LLM call to understand the message, a second to answer it.
+# "tools": the model calls CocktailService operations in a single tool-calling exchange.
+CHAT_PIPELINE = os.getenv("CHAT_PIPELINE", "two_call").lower()
+
+# Serve answers to near-identical earlier messages from a semantic cache
+SEMANTIC_CACHE = os.getenv("SEMANTIC_CACHE", "true").lower() == "true"
+
+# Fold turns that leave the per-session token window into an LLM-written summary
+SESSION_SUMMARY = os.getenv("SESSION_SUMMARY", "false").lower() == "true"
+SESSION_SUMMARY_TOKENS = int(os.getenv("SESSION_SUMMARY_TOKENS", "200"))
+
+TOOL_SCHEMAS = {tool.__name__: tool for tool in COCKTAIL_TOOLS}
+
+TOOLS_SYSTEM_PROMPT = """You are an AI assistant who specializes in cocktails but can discuss any topic.
+Use the tools to look up cocktails or manage the user's favorite ingredients whenever the message needs it;
+only recommend cocktails returned by the tools. Include ingredients and measurements, consider the user's
+favorites, and give clear instructions if needed. For general conversation, answer directly without tools,
+be natural and engaging, and show personality while staying professional."""
 
 class LLMService:
-    def __init__(self):
+    def __init__(self, cocktail_service: Optional[CocktailService] = None):
         # You can switch between models by changing model_name:
         # - "gpt-3.5-turbo-0125" (latest GPT-3.5, better than old 3.5)
         # - "gpt-4-0125-preview" (latest GPT-4, most capable)
@@ -13,16 +47,29 @@ class LLMService:
         self.llm = ChatOpenAI(
             temperature=0.7,
             model_name="gpt-4-turbo-preview",  # Updated to latest GPT-3.5
-            api_key=os.getenv("OPENAI_API_KEY")
+            api_key=os.getenv("OPENAI_API_KEY"),
+            # Streamed responses report token usage too, for pipeline_stats
+            stream_usage=True
         )
-        self.memory = ConversationBufferMemory(
-            memory_key="chat_history",
-            return_messages=True,
-            output_key="answer",
-            input_key="question"
-        )
-        self.cocktail_service = CocktailService()
-        self.vector_store = self.cocktail_service.vector_store
+        # Evicted turns are only queued when something will summarize them
+        self.sessions = SessionStore(keep_evicted=SESSION_SUMMARY)
+        self._background_tasks = set()
+        self.cocktail_service = cocktail_service or CocktailService()
+        self.intent_classifier = IntentClassifier(self.cocktail_service) if LOCAL_INTENT_CLASSIFIER else None
+        
+        self.pipeline = CHAT_PIPELINE
+        self.llm_with_tools = self.llm.bind_tools(COCKTAIL_TOOLS)
+        self.llm_answer_only = self.llm.bind_tools(COCKTAIL_TOOLS, tool_choice="none")
+        self.response_cache = SemanticResponseCache() if SEMANTIC_CACHE else None
+        self.pipeline_stats = {
+            "pipeline": self.pipeline,
+            "messages": 0,
+            "llm_calls": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_cost_usd": 0.0,
+            "total_latency_s": 0.0
+        }
         
     def _format_cocktail_results(self, results) -> str:
         """Format cocktail results into a readable string"""
@@ -36,32 +83,298 @@ class LLMService:
                 ingredients = result.metadata.get("ingredients", "Unknown")
             
             formatted_results.append(f"- {name}: {ingredients}")
+            if isinstance(result, dict) and result.get("instructions"):
+                formatted_results.append(f"  Instructions: {result['instructions']}")
         
         return "\n".join(formatted_results)
         
-    async def process_message(self, message: str) -> str:
+    async def process_message(self, message: str, session_id: Optional[str] = None) -> str:
         """Process user message and return response"""
+        start = time.perf_counter()
+        session = self.sessions.get(session_id)
+        with get_openai_callback() as usage:
+            cache_key = await self._cache_key(message, session)
+            cached = self.response_cache.lookup(*cache_key) if cache_key else None
+            if cached is not None:
+                response = cached["response"]
+            else:
+                response, results, cacheable = await self._process_message(message, session)
+                if cache_key and cacheable:
+                    self.response_cache.store(*cache_key, response, self._results_payload(results))
+        self._record_usage(usage, time.perf_counter() - start)
+        self._remember(session, message, response)
+        return response
+
+    async def _process_message(self, message: str, session: Optional[Session] = None) -> Tuple[str, list, bool]:
+        """Returns the response, the cocktails it used, and whether it may be cached"""
         try:
-            # First, let's understand the message context and intent using LLM
-            understanding = await self._understand_message(message)
+            # First, understand the message context and intent: locally when confident, else using LLM
+            understanding = await self._understand_locally(message)
+            
+            if understanding is None and self.pipeline == "tools":
+                return await self._process_with_tools(message, session)
+            
+            if understanding is None:
+                understanding = await self._understand_message(message, session)
             
             # Use the understanding to generate appropriate response
-            return await self._generate_contextual_response(message, understanding)
+            response, results = await self._generate_contextual_response(message, understanding, session)
+            return response, results, not self._changes_favorites(understanding)
             
         except Exception as e:
             print(f"Error processing message: {str(e)}")
-            return "I apologize, but I encountered an error. Please try again or ask for help to see what I can do."
+            return "I apologize, but I encountered an error. Please try again or ask for help to see what I can do.", [], False
+
+    async def stream_message(self, message: str, session_id: Optional[str] = None) -> AsyncIterator[Dict]:
+        """
+        Process user message as a stream of events: one "results" event with the
+        retrieved cocktails, then "token" events from the final generation, then "done".
+        """
+        start = time.perf_counter()
+        session = self.sessions.get(session_id)
+        # Usage is recorded however the stream ends, since tokens were spent either way
+        with get_openai_callback() as usage:
+            try:
+                cache_key = await self._cache_key(message, session)
+                cached = self.response_cache.lookup(*cache_key) if cache_key else None
+                if cached is not None:
+                    self._remember(session, message, cached["response"])
+                    yield {"event": "results", "data": cached["results"]}
+                    yield {"event": "token", "data": cached["response"]}
+                    yield {"event": "done", "data": None}
+                    return
+            
+                understanding = await self._understand_locally(message)
+                tokens = []
+            
+                if understanding is None and self.pipeline == "tools":
+                    messages, results, content = await self._run_tools_exchange(message, session)
+                    cacheable = not self._tools_change_favorites(messages)
+                    yield {"event": "results", "data": self._results_payload(results)}
+                    if content is not None:
+                        tokens.append(content)
+                        yield {"event": "token", "data": content}
+                    else:
+                        async for chunk in self.llm_answer_only.astream(messages):
+                            if chunk.content:
+                                tokens.append(chunk.content)
+                                yield {"event": "token", "data": chunk.content}
+                else:
+                    if understanding is None:
+                        understanding = await self._understand_message(message, session)
+                    cacheable = not self._changes_favorites(understanding)
+                    prompt, results = await self._build_contextual_prompt(message, understanding, session)
+                    yield {"event": "results", "data": self._results_payload(results)}
+                    async for chunk in self.llm.astream([HumanMessage(content=prompt)]):
+                        if chunk.content:
+                            tokens.append(chunk.content)
+                            yield {"event": "token", "data": chunk.content}
+            
+                # Only completed streams are cached and remembered
+                response = "".join(tokens).strip()
+                if cache_key and cacheable:
+                    self.response_cache.store(*cache_key, response, self._results_payload(results))
+                self._remember(session, message, response)
+                yield {"event": "done", "data": None}
+            except asyncio.CancelledError:
+                # Client disconnected; let the cancellation close the upstream request
+                raise
+            except Exception as e:
+                print(f"Error streaming message: {str(e)}")
+                yield {
+                    "event": "error",
+                    "data": "I apologize, but I encountered an error. Please try again or ask for help to see what I can do."
+                }
+            finally:
+                self._record_usage(usage, time.perf_counter() - start)
+
+    async def _cache_key(self, message: str, session: Optional[Session] = None) -> Optional[Tuple[List[float], frozenset]]:
+        """Message embedding and active favorites, or None when the message must not hit the cache"""
+        if self.response_cache is None:
+            return None
+        # Answers after the first turn depend on the conversation, which the key does not capture
+        if session is not None and (session.turns or session.summary):
+            return None
+        # Messages that change favorites always have to run
+        if self.intent_classifier is not None:
+            understanding = self.intent_classifier.classify_rules(message)
+            if understanding is not None and self._changes_favorites(understanding):
+                return None
+        try:
+            embedding = await self.cocktail_service.embeddings.aembed_query(message)
+        except Exception as e:
+            print(f"Error embedding message for response cache: {str(e)}")
+            return None
+        return embedding, self.cocktail_service.favorites.get(self._user_id(session))
+
+    @staticmethod
+    def _changes_favorites(understanding: dict) -> bool:
+        return understanding.get("preferences", {}).get("action") in ["add", "remove"]
+
+    @staticmethod
+    def _tools_change_favorites(messages: list) -> bool:
+        return any(
+            call["name"] == UpdateFavorites.__name__ and call["args"].get("action") in ["add", "remove"]
+            for message in messages
+            for call in getattr(message, "tool_calls", None) or []
+        )
+
+    def _remember(self, session: Optional[Session], message: str, response: str):
+        """Record a completed exchange in the session, summarizing turns that fell out of the window"""
+        if session is None:
+            return
+        session.add("user", message)
+        session.add("assistant", response)
+        if SESSION_SUMMARY and session.evicted:
+            # Off the request path; the next message sees the summary once it is ready
+            task = asyncio.create_task(self._summarize(session))
+            self._background_tasks.add(task)
+            task.add_done_callback(self._background_tasks.discard)
+
+    async def _summarize(self, session: Session):
+        """Fold evicted turns into the session's rolling summary"""
+        evicted = session.take_evicted()
+        turns = "\n".join(f"{'User' if role == 'user' else 'Assistant'}: {content}" for role, content in evicted)
+        prompt = f"""Update the running summary of a conversation with a cocktail assistant.
+        Keep the user's tastes, constraints and the cocktails already discussed. Reply with the summary only,
+        in at most {SESSION_SUMMARY_TOKENS} tokens.
+
+        Current summary: {session.summary or "None"}
+
+        New turns:
+        {turns}"""
+        try:
+            response = await self.llm.agenerate([[HumanMessage(content=prompt)]])
+            summary = response.generations[0][0].text.strip()
+            # Enforce the budget even if the model ignores it
+            while count_tokens(summary) > SESSION_SUMMARY_TOKENS and " " in summary:
+                summary = summary.rsplit(" ", 1)[0]
+            session.summary = summary
+        except Exception as e:
+            print(f"Error summarizing session: {str(e)}")
+
+    @staticmethod
+    def _history_prompt(session: Optional[Session]) -> str:
+        """Conversation so far, for inclusion in a prompt"""
+        if session is None or not (session.turns or session.summary):
+            return ""
+        return f"\n\n        Conversation so far:\n{session.history_text()}\n"
 
-    async def _understand_message(self, message: str) -> dict:
+    @staticmethod
+    def _user_id(session: Optional[Session]) -> Optional[str]:
+        """Favorites are kept per session id; requests without one share the default user"""
+        return session.session_id if session is not None else None
+
+    async def _understand_locally(self, message: str) -> Optional[dict]:
+        """Local intent classification, or None when the LLM should decide"""
+        if self.intent_classifier is None:
+            return None
+        return await self.intent_classifier.classify(message)
+
+    def _results_payload(self, results) -> List[Dict]:
+        """Cocktail results as plain dicts for the client"""
+        return [
+            result if isinstance(result, dict) else self.cocktail_service._cocktail_summary(result.metadata)
+            for result in results
+        ]
+
+    def _record_usage(self, usage, latency: float):
+        """Accumulate per-pipeline LLM usage so the pipelines can be compared"""
+        stats = self.pipeline_stats
+        stats["messages"] += 1
+        stats["llm_calls"] += usage.successful_requests
+        stats["prompt_tokens"] += usage.prompt_tokens
+        stats["completion_tokens"] += usage.completion_tokens
+        stats["total_cost_usd"] += usage.total_cost
+        stats["total_latency_s"] += latency
+
+    async def _run_tools_exchange(
+        self, message: str, session: Optional[Session] = None
+    ) -> Tuple[list, List[Dict], Optional[str]]:
+        """
+        Let the model call tools once. Returns the conversation so far, the cocktails the
+        tools returned, and the answer text when the model replied without calling tools.
+        """
+        messages = [SystemMessage(content=TOOLS_SYSTEM_PROMPT)]
+        if session is not None:
+            if session.summary:
+                messages.append(SystemMessage(content=f"Summary of earlier conversation: {session.summary}"))
+            for role, content in session.messages():
+                messages.append(HumanMessage(content=content) if role == "user" else AIMessage(content=content))
+        messages.append(HumanMessage(content=message))
+        ai_message = await self.llm_with_tools.ainvoke(messages)
+        if not ai_message.tool_calls:
+            return messages, [], ai_message.content.strip()
+        
+        messages.append(ai_message)
+        user_id = self._user_id(session)
+        tool_results = await asyncio.gather(*(self._run_tool(call, user_id) for call in ai_message.tool_calls))
+        results = []
+        for call, result in zip(ai_message.tool_calls, tool_results):
+            messages.append(ToolMessage(content=json.dumps(result), tool_call_id=call["id"]))
+            if isinstance(result, list):
+                results.extend(result)
+        return messages, results, None
+
+    async def _process_with_tools(self, message: str, session: Optional[Session] = None) -> Tuple[str, list, bool]:
+        """Answer in one tool-calling exchange instead of a separate understanding call"""
+        messages, results, content = await self._run_tools_exchange(message, session)
+        cacheable = not self._tools_change_favorites(messages)
+        if content is not None:
+            return content, results, cacheable
+        final_message = await self.llm_answer_only.ainvoke(messages)
+        return final_message.content.strip(), results, cacheable
+
+    async def _run_tool(self, tool_call: Dict, user_id: Optional[str] = None):
+        """Validate a tool call against its schema and run the matching CocktailService operation"""
+        schema = TOOL_SCHEMAS.get(tool_call["name"])
+        if schema is None:
+            return {"error": f"Unknown tool: {tool_call['name']}"}
+        try:
+            args = schema(**tool_call["args"])
+        except ValidationError as e:
+            return {"error": f"Invalid arguments: {str(e)}"}
+        
+        try:
+            service = self.cocktail_service
+            if isinstance(args, SearchByIngredients):
+                return await service.asearch_cocktails_for_ingredients(
+                    args.ingredients, exclude=args.excluded_ingredients, limit=args.count
+                )
+            if isinstance(args, GetNonAlcoholicCocktails):
+                return await service.aget_non_alcoholic_cocktails(limit=args.count)
+            if isinstance(args, GetSimilarCocktails):
+                return await service.aget_similar_cocktails(args.cocktail_name, limit=args.count)
+            if isinstance(args, GetRecipe):
+                recipe = await service.aget_recipe(args.cocktail_name)
+                return [recipe] if recipe else {"error": f"No cocktail named {args.cocktail_name!r} in the catalog"}
+            if isinstance(args, SearchWithPreferences):
+                filters = {"alcoholic": "alcoholic"} if args.alcoholic_only else None
+                docs = await service.asearch_with_preferences(
+                    args.query, k=args.count, filters=filters, user_id=user_id
+                )
+                return [service._cocktail_summary(doc.metadata) for doc in docs]
+            if isinstance(args, UpdateFavorites):
+                for ingredient in args.ingredients if args.action != "list" else []:
+                    if args.action == "add":
+                        service.add_favorite_ingredient(ingredient, user_id)
+                    else:
+                        service.remove_favorite_ingredient(ingredient, user_id)
+                return {"favorites": service.get_favorite_ingredients(user_id)}
+        except Exception as e:
+            print(f"Error running tool {tool_call['name']}: {str(e)}")
+            return {"error": "The lookup failed"}
+
+    async def _understand_message(self, message: str, session: Optional[Session] = None) -> dict:
         """Use LLM to deeply understand the message context and intent"""
-        prompt = f"""As an AI assistant who specializes in cocktails but can discuss any topic, analyze this message deeply.
+        prompt = f"""As an AI assistant who specializes in cocktails but can discuss any topic, analyze this message deeply.{self._history_prompt(session)}
         Message: "{message}"
 
         Provide a detailed analysis in JSON format with the following structure:
         {{
             "intent": {{
                 "primary": string (e.g., "greeting", "cocktail_request", "preference_management", "general_chat", "help_request"),
-                "secondary": string (e.g., "add_favorite", "remove_favorite", "get_recipe", "find_similar", "casual_conversation"),
+                "secondary": string (e.g., "add_favorite", "remove_favorite", "get_recipe", "find_similar", "find_by_ingredient", "find_non_alcoholic", "casual_conversation"),
                 "requires_cocktail_context": boolean
             }},
             "preferences": {{
@@ -75,7 +388,9 @@ class LLMService:
                     "count": number or null,
                     "is_alcoholic": boolean or null,
                     "ingredients": [string],
+                    "excluded_ingredients": [string],
                     "similar_to": string or null,
+                    "name": string or null (the cocktail asked for by name),
                     "category": string or null,
                     "other_constraints": [string]
                 }}
@@ -90,7 +405,7 @@ class LLMService:
         }}"""
 
         try:
-            messages = [{"role": "user", "content": prompt}]
+            messages = [HumanMessage(content=prompt)]
             response = await self.llm.agenerate([messages])
             
             # Parse JSON response
@@ -107,91 +422,99 @@ class LLMService:
             print(f"Error in message understanding: {str(e)}")
             return {"intent": {"primary": "general_chat"}}
 
-    async def _generate_contextual_response(self, message: str, understanding: dict) -> str:
-        """Generate response based on message understanding"""
-        try:
-            # Get current favorites if needed
-            favorites = []
-            if any(action in understanding.get("required_actions", []) for action in ["list_favorites", "add_favorite", "remove_favorite"]):
-                favorites = self.cocktail_service.get_favorite_ingredients()
-
-            # Handle preference management
-            preferences = understanding.get("preferences", {})
-            if preferences.get("action") in ["add", "remove"]:
-                ingredients = preferences.get("ingredients", [])
-                if preferences["action"] == "add":
-                    for ingredient in ingredients:
-                        self.cocktail_service.add_favorite_ingredient(ingredient)
-                else:  # remove
-                    for ingredient in ingredients:
-                        self.cocktail_service.remove_favorite_ingredient(ingredient)
-                favorites = self.cocktail_service.get_favorite_ingredients()
-
-            # Build context for LLM response
-            cocktail_search = understanding.get("cocktail_search", {})
-            conversation = understanding.get("conversation", {})
-            
-            prompt = f"""As an AI assistant specializing in cocktails but capable of general conversation, respond to: "{message}"
+    async def _build_contextual_prompt(
+        self, message: str, understanding: dict, session: Optional[Session] = None
+    ) -> Tuple[str, list]:
+        """Apply preference changes, retrieve cocktails and build the response prompt"""
+        user_id = self._user_id(session)
 
-            Context:
-            - User's Intent: {understanding.get("intent", {})}
-            - Conversation Topic: {conversation.get("topic")}
-            - Current Favorites: {favorites if favorites else "None"}
-            - Search Parameters: {cocktail_search}
-            
-            If cocktail-related:
-            1. Use the vector store to find relevant cocktails
-            2. Include ingredients and measurements
-            3. Consider user preferences
-            4. Provide clear instructions if needed
-            
-            If general conversation:
-            1. Be natural and engaging
-            2. Use cocktail analogies if appropriate
-            3. Show personality while staying professional"""
-
-            # Get cocktail results if needed
-            results = []
-            if cocktail_search.get("type") != "none":
-                filters = cocktail_search.get("filters", {})
-                count = filters.get("count", 5)
-                
-                try:
-                    if filters.get("is_alcoholic") is False:
-                        results = self.cocktail_service.get_non_alcoholic_cocktails(limit=count)
-                    elif filters.get("similar_to"):
-                        results = self.cocktail_service.get_similar_cocktails(filters["similar_to"], limit=count)
-                    elif filters.get("ingredients"):
-                        for ingredient in filters["ingredients"]:
-                            ingredient_results = self.cocktail_service.search_cocktails_by_ingredient(ingredient, limit=count)
-                            if ingredient_results:
-                                results.extend(ingredient_results)
-                        # Remove duplicates and limit results
-                        seen = set()
-                        unique_results = []
-                        for r in results:
-                            name = r.get("name", "") if isinstance(r, dict) else r.metadata.get("name", "")
-                            if name not in seen:
-                                seen.add(name)
-                                unique_results.append(r)
-                        results = unique_results[:count]
-                    else:
-                        results = self.cocktail_service.search_with_preferences(message, k=count)
-                except Exception as e:
-                    print(f"Error in cocktail search: {str(e)}")
-                    # Continue with empty results
+        # Get current favorites if needed
+        favorites = []
+        if any(action in understanding.get("required_actions", []) for action in ["list_favorites", "add_favorite", "remove_favorite"]):
+            favorites = self.cocktail_service.get_favorite_ingredients(user_id)
 
-            if results:
-                formatted_results = self._format_cocktail_results(results)
-                prompt += f"\n\nAvailable cocktails:\n{formatted_results}"
+        # Handle preference management
+        preferences = understanding.get("preferences", {})
+        if preferences.get("action") in ["add", "remove"]:
+            ingredients = preferences.get("ingredients", [])
+            if preferences["action"] == "add":
+                for ingredient in ingredients:
+                    self.cocktail_service.add_favorite_ingredient(ingredient, user_id)
+            else:  # remove
+                for ingredient in ingredients:
+                    self.cocktail_service.remove_favorite_ingredient(ingredient, user_id)
+            favorites = self.cocktail_service.get_favorite_ingredients(user_id)
 
-            messages = [{"role": "user", "content": prompt}]
-            response = await self.llm.agenerate([messages])
-            return response.generations[0][0].text.strip()
+        # Build context for LLM response
+        cocktail_search = understanding.get("cocktail_search", {})
+        conversation = understanding.get("conversation", {})
+        
+        prompt = f"""As an AI assistant specializing in cocktails but capable of general conversation, respond to: "{message}"{self._history_prompt(session)}
+
+        Context:
+        - User's Intent: {understanding.get("intent", {})}
+        - Conversation Topic: {conversation.get("topic")}
+        - Current Favorites: {favorites if favorites else "None"}
+        - Search Parameters: {cocktail_search}
+        
+        If cocktail-related:
+        1. Use the vector store to find relevant cocktails
+        2. Include ingredients and measurements
+        3. Consider user preferences
+        4. Provide clear instructions if needed
+        
+        If general conversation:
+        1. Be natural and engaging
+        2. Use cocktail analogies if appropriate
+        3. Show personality while staying professional"""
+
+        # Get cocktail results if needed
+        results = []
+        if cocktail_search.get("type") != "none":
+            filters = cocktail_search.get("filters", {})
+            count = filters.get("count") or 5
             
-        except Exception as e:
-            print(f"Error generating contextual response: {str(e)}")
-            return "I apologize, but I encountered an error. Could you try rephrasing your request?"
+            try:
+                if filters.get("is_alcoholic") is False:
+                    results = await self.cocktail_service.aget_non_alcoholic_cocktails(limit=count)
+                elif filters.get("similar_to"):
+                    results = await self.cocktail_service.aget_similar_cocktails(filters["similar_to"], limit=count)
+                elif cocktail_search.get("type") == "by_name" and filters.get("name"):
+                    # Named drinks resolve in the local name index; unknown names fall through to search
+                    recipe = await self.cocktail_service.aget_recipe(filters["name"])
+                    results = [recipe] if recipe else await self.cocktail_service.asearch_with_preferences(
+                        message, k=count, user_id=user_id
+                    )
+                elif filters.get("ingredients"):
+                    # One exact index query (plus one batched vector search for unknown terms)
+                    results = await self.cocktail_service.asearch_cocktails_for_ingredients(
+                        filters["ingredients"],
+                        exclude=filters.get("excluded_ingredients") or [],
+                        limit=count
+                    )
+                else:
+                    search_filters = {"alcoholic": "alcoholic"} if filters.get("is_alcoholic") else None
+                    results = await self.cocktail_service.asearch_with_preferences(
+                        message, k=count, filters=search_filters, user_id=user_id
+                    )
+            except Exception as e:
+                print(f"Error in cocktail search: {str(e)}")
+                # Continue with empty results
+
+        if results:
+            formatted_results = self._format_cocktail_results(results)
+            prompt += f"\n\nAvailable cocktails:\n{formatted_results}"
+
+        return prompt, results
+
+    async def _generate_contextual_response(
+        self, message: str, understanding: dict, session: Optional[Session] = None
+    ) -> Tuple[str, list]:
+        """Generate response based on message understanding, returning it with the cocktails it used"""
+        prompt, results = await self._build_contextual_prompt(message, understanding, session)
+        messages = [HumanMessage(content=prompt)]
+        response = await self.llm.agenerate([messages])
+        return response.generations[0][0].text.strip(), results
 
     def _handle_help_request(self) -> str:
         """Handle help-related queries"""
@@ -222,7 +545,7 @@ What would you like to know about?"""
             Current context: You are a knowledgeable AI that specializes in cocktails but can engage in any topic of conversation.
             """
             
-            messages = [{"role": "user", "content": prompt}]
+            messages = [HumanMessage(content=prompt)]
             response = await self.llm.agenerate([messages])
             return response.generations[0][0].text.strip()
                 
@@ -264,7 +587,7 @@ What would you like to know about?"""
     async def _get_llm_response(self, prompt: str) -> str:
         """Get LLM response with quality checks"""
         try:
-            messages = [{"role": "user", "content": prompt}]
+            messages = [HumanMessage(content=prompt)]
             response = await self.llm.agenerate([messages])
             
             # Quality checks
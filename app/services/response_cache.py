@@ -0,0 +1,106 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, Optional
+
+import numpy as np
+
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+
+
+class SemanticResponseCache:
+    """
+    Answer cache looked up by nearest-neighbor similarity of message embeddings.
+
+    Entries are partitioned by the favorites set that was active when the
+    answer was generated, so a hit never serves an answer personalized for
+    different favorites; a session whose favorites change simply looks up
+    another partition, and answers for the old set stay valid for the
+    sessions that still have it. Entries expire after ttl seconds and the least
+    recently used entry is evicted once max_entries is reached.
+    """
+
+    def __init__(
+        self,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        ttl: float = SEMANTIC_CACHE_TTL,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, Dict]" = OrderedDict()
+        self._partitions: Dict[FrozenSet[str], List[int]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    @staticmethod
+    def _unit(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id, None)
+        if entry is not None:
+            partition = self._partitions.get(entry['favorites'])
+            if partition is not None:
+                partition.remove(entry_id)
+                if not partition:
+                    del self._partitions[entry['favorites']]
+
+    def lookup(self, embedding, favorites: FrozenSet[str]) -> Optional[Dict]:
+        """Closest cached answer for the same favorites above the similarity threshold"""
+        with self._lock:
+            now = time.time()
+            ids = [i for i in self._partitions.get(favorites, []) if now - self._entries[i]['created_at'] <= self.ttl]
+            for expired in set(self._partitions.get(favorites, [])) - set(ids):
+                self._remove(expired)
+
+            if ids:
+                matrix = np.vstack([self._entries[i]['embedding'] for i in ids])
+                similarities = matrix @ self._unit(embedding)
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    entry_id = ids[best]
+                    self._entries.move_to_end(entry_id)
+                    self.stats['hits'] += 1
+                    return self._entries[entry_id]
+
+            self.stats['misses'] += 1
+            return None
+
+    def store(self, embedding, favorites: FrozenSet[str], response: str, results: Optional[List[Dict]] = None):
+        """Cache an answer together with the cocktails it was based on"""
+        with self._lock:
+            while len(self._entries) >= self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.stats['evictions'] += 1
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = {
+                'embedding': self._unit(embedding),
+                'favorites': favorites,
+                'response': response,
+                'results': results or [],
+                'created_at': time.time()
+            }
+            self._partitions.setdefault(favorites, []).append(entry_id)
+
+    def clear(self):
+        """Drop every answer, e.g. after the catalog they were based on was replaced"""
+        with self._lock:
+            self.stats['invalidations'] += len(self._entries)
+            self._entries.clear()
+            self._partitions.clear()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,133 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Tuple
+
+SESSION_MAX_TOKENS = int(os.getenv("SESSION_MAX_TOKENS", "1500"))
+SESSION_TTL = float(os.getenv("SESSION_TTL", "1800"))
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+
+try:
+    import tiktoken
+    _encoding = tiktoken.encoding_for_model("gpt-4")
+except Exception:
+    # Offline or tiktoken unavailable: fall back to the usual ~4 characters per token
+    _encoding = None
+
+
+def count_tokens(text: str) -> int:
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return max(1, len(text) // 4)
+
+
+class Session:
+    """
+    Conversation turns for one session, kept within a token budget. With
+    keep_evicted, turns that fall out of the window are queued in `evicted`
+    until they are folded into the rolling summary; otherwise they are dropped.
+    """
+
+    def __init__(self, session_id: str, max_tokens: int, keep_evicted: bool = False):
+        self.session_id = session_id
+        self.max_tokens = max_tokens
+        self.turns: "deque[Tuple[str, str, int]]" = deque()
+        self.tokens = 0
+        self.summary = ""
+        self.keep_evicted = keep_evicted
+        self.evicted: List[Tuple[str, str]] = []
+        self.evicted_tokens = 0
+        self.last_active = time.time()
+
+    def add(self, role: str, content: str):
+        tokens = count_tokens(content)
+        self.turns.append((role, content, tokens))
+        self.tokens += tokens
+        # Always keep the newest turn, even if it alone exceeds the budget
+        while self.tokens > self.max_tokens and len(self.turns) > 1:
+            old_role, old_content, old_tokens = self.turns.popleft()
+            self.tokens -= old_tokens
+            if self.keep_evicted:
+                self.evicted.append((old_role, old_content))
+                self.evicted_tokens += old_tokens
+
+    def take_evicted(self) -> List[Tuple[str, str]]:
+        """Queued evicted turns, emptying the queue"""
+        evicted, self.evicted, self.evicted_tokens = self.evicted, [], 0
+        return evicted
+
+    def kept_tokens(self) -> int:
+        """Tokens held for this session: the window, queued evicted turns and the summary"""
+        return self.tokens + self.evicted_tokens + (count_tokens(self.summary) if self.summary else 0)
+
+    def messages(self) -> List[Tuple[str, str]]:
+        """(role, content) pairs inside the window, oldest first"""
+        return [(role, content) for role, content, _ in self.turns]
+
+    def history_text(self) -> str:
+        """Summary and recent turns formatted for a prompt"""
+        lines = []
+        if self.summary:
+            lines.append(f"Summary of earlier conversation: {self.summary}")
+        for role, content in self.messages():
+            lines.append(f"{'User' if role == 'user' else 'Assistant'}: {content}")
+        return "\n".join(lines)
+
+
+class SessionStore:
+    """
+    Per-session conversation memory. Idle sessions expire after ttl seconds
+    and the least recently active session is dropped once max_sessions is
+    reached, so memory stays bounded however many users connect.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = SESSION_MAX_TOKENS,
+        ttl: float = SESSION_TTL,
+        max_sessions: int = SESSION_MAX_SESSIONS,
+        keep_evicted: bool = False
+    ):
+        self.max_tokens = max_tokens
+        self.keep_evicted = keep_evicted
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'created': 0, 'expired': 0, 'evicted': 0}
+
+    def _expire(self, now: float):
+        # Sessions are kept in last-active order, so expired ones are at the front
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_active <= self.ttl:
+                break
+            del self._sessions[session_id]
+            self.stats['expired'] += 1
+
+    def get(self, session_id: Optional[str]) -> Optional[Session]:
+        """Session for an id, created on first use; None without an id"""
+        if not session_id:
+            return None
+        with self._lock:
+            now = time.time()
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                while len(self._sessions) >= self.max_sessions:
+                    self._sessions.popitem(last=False)
+                    self.stats['evicted'] += 1
+                session = Session(session_id, self.max_tokens, self.keep_evicted)
+                self._sessions[session_id] = session
+                self.stats['created'] += 1
+            session.last_active = now
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats['active'] = len(self._sessions)
+            stats['tokens'] = sum(session.kept_tokens() for session in self._sessions.values())
+        return stats
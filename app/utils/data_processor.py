@@ -1,76 +1,157 @@
+import ast
+import re
 import pandas as pd
-from typing import List
+from typing import Dict, Iterator, List, Optional
 from langchain.docstore.document import Document
 import os
+from ..database.catalog_cache import CATALOG_CACHE_DIR, CatalogCacheWriter, load_catalog_cache
+from ..database.index_manifest import file_sha256
 
-def process_cocktail_data(csv_path: str) -> List[Document]:
+# Rows parsed at a time; memory during ingestion is bounded by this, not the catalog size
+CATALOG_CHUNK_ROWS = int(os.getenv("CATALOG_CHUNK_ROWS", "50000"))
+CATALOG_COLUMNS = ['name', 'alcoholic', 'category', 'glassType', 'instructions', 'ingredients', 'ingredientMeasures']
+
+# List cells are Python list literals of quoted strings and None, e.g. "['1 oz ', None]"
+_LIST_ITEM = r"""'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|None"""
+_LIST_SHAPE = re.compile(rf"\[\s*(?:(?:{_LIST_ITEM})\s*(?:,\s*(?:{_LIST_ITEM})\s*)*,?\s*)?\]")
+_LIST_ITEMS = re.compile(r"""'((?:[^'\\]|\\.)*)'|"((?:[^"\\]|\\.)*)"|(None)""")
+
+
+def _literal_list(cell) -> Optional[list]:
+    """Parse one list cell with ast.literal_eval (never eval); None if it is not a list"""
+    try:
+        value = ast.literal_eval(cell)
+        return value if isinstance(value, list) else None
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+        return None
+
+
+def parse_list_column(cells: pd.Series) -> pd.Series:
+    """
+    Parse a column of list literals without evaluating code. Well-formed cells
+    are split with a regex over the whole column; cells with escapes or any
+    other shape fall back to ast.literal_eval. Unparseable cells become None.
+    """
+    cells = cells.astype(object)
+    is_text = cells.map(type) == str
+    text = cells.where(is_text, "")
+    simple = is_text & text.str.fullmatch(_LIST_SHAPE) & ~text.str.contains("\\", regex=False)
+
+    matches = cells[simple].str.findall(_LIST_ITEMS)
+    parsed = pd.Series(
+        [[None if none else (single or double) for single, double, none in items] for items in matches],
+        index=matches.index, dtype=object
+    )
+    fallback = cells[~simple].map(_literal_list)
+    return pd.concat([parsed, fallback]).reindex(cells.index)
+
+
+def _strip(column: pd.Series) -> pd.Series:
+    return column.astype(str).str.strip()
+
+
+def _ingredients_text(ingredients: List, measures: List) -> str:
+    return ", ".join(
+        str(ing) if measure is None else f"{measure} {ing}" for ing, measure in zip(ingredients, measures)
+    )
+
+
+def parse_catalog_chunk(df: pd.DataFrame) -> Dict[str, List]:
+    """Column-wise document fields for a chunk of catalog rows; rows with malformed lists are dropped"""
+    ingredients = parse_list_column(df['ingredients'])
+    measures = parse_list_column(df['ingredientMeasures'])
+    valid = ingredients.notna() & measures.notna()
+    for idx in df.index[~valid]:
+        print(f"Warning: Error processing row {idx}: malformed ingredients or measures")
+    df, ingredients, measures = df[valid], ingredients[valid], measures[valid]
+
+    return {
+        'name': _strip(df['name']).tolist(),
+        'category': _strip(df['category']).tolist(),
+        'glass_type': _strip(df['glassType']).tolist(),
+        'alcoholic': _strip(df['alcoholic']).tolist(),
+        'instructions': _strip(df['instructions']).tolist(),
+        'ingredients_text': [_ingredients_text(i, m) for i, m in zip(ingredients, measures)],
+        'ingredient_names': [[str(ing).strip() for ing in i] for i in ingredients],
+    }
+
+
+def iter_catalog_chunks(csv_path: str, chunk_rows: int = CATALOG_CHUNK_ROWS) -> Iterator[Dict[str, List]]:
+    """Stream the catalog CSV as parsed column chunks"""
+    for df in pd.read_csv(csv_path, usecols=CATALOG_COLUMNS, chunksize=chunk_rows):
+        yield parse_catalog_chunk(df)
+
+
+def build_documents(columns: Dict[str, List]) -> List[Document]:
+    """Documents from parsed catalog columns; text and metadata are assembled per column"""
+    content = (
+        "Cocktail Name: " + pd.Series(columns['name'], dtype=object)
+        + "\n                Ingredients: " + pd.Series(columns['ingredients_text'], dtype=object)
+        + "\n                Instructions: " + pd.Series(columns['instructions'], dtype=object)
+        + "\n                Glass Type: " + pd.Series(columns['glass_type'], dtype=object)
+        + "\n                Category: " + pd.Series(columns['category'], dtype=object)
+        + "\n                Alcoholic: " + pd.Series(columns['alcoholic'], dtype=object)
+    ).str.strip()
+
+    return [
+        Document(
+            page_content=text,
+            metadata={
+                'name': name,
+                'category': category,
+                'glass_type': glass_type,
+                'alcoholic': alcoholic,
+                'ingredients': ingredients_text,
+                'ingredient_names': ingredient_names,
+                'instructions': instructions,
+                'source': 'cocktails_database',
+                'type': 'cocktail'
+            }
+        )
+        for text, name, category, glass_type, alcoholic, ingredients_text, ingredient_names, instructions in zip(
+            content, columns['name'], columns['category'], columns['glass_type'], columns['alcoholic'],
+            columns['ingredients_text'], columns['ingredient_names'], columns['instructions']
+        )
+    ]
+
+
+def process_cocktail_data(csv_path: str, cache_dir: Optional[str] = CATALOG_CACHE_DIR) -> List[Document]:
     """
     Process cocktails CSV file into documents suitable for vector storage.
+    Parsed columns are cached in cache_dir, keyed by the CSV's hash, so later
+    runs skip parsing; pass cache_dir=None to always parse.
     """
     try:
         # Check if file exists
         if not os.path.exists(csv_path):
             raise FileNotFoundError(f"CSV file not found at {csv_path}")
 
-        # Read CSV file
-        df = pd.read_csv(csv_path)
-        
-        # Map CSV columns
-        df['glass_type'] = df['glassType']
-        df['ingredients'] = df['ingredients'].apply(eval)  # Convert string list to actual list
-        df['ingredientMeasures'] = df['ingredientMeasures'].apply(eval)
-        
+        catalog_sha256 = file_sha256(csv_path)
+        columns = load_catalog_cache(cache_dir, catalog_sha256) if cache_dir else None
+        if columns is not None:
+            documents = build_documents(columns)
+            print(f"Loaded {len(documents)} cocktail recipes from catalog cache")
+            return documents
+
+        writer = CatalogCacheWriter(cache_dir) if cache_dir else None
         documents = []
-        
-        # Process each cocktail into a Document
-        for idx, row in df.iterrows():
-            try:
-                # Combine ingredients with their measures
-                ingredients_with_measures = []
-                for ing, measure in zip(row['ingredients'], row['ingredientMeasures']):
-                    if pd.notna(measure):
-                        ingredients_with_measures.append(f"{measure} {ing}")
-                    else:
-                        ingredients_with_measures.append(ing)
-                
-                ingredients_text = ", ".join(ingredients_with_measures)
-                
-                # Create formatted content
-                content = f"""
-                Cocktail Name: {str(row['name']).strip()}
-                Ingredients: {ingredients_text}
-                Instructions: {str(row['instructions']).strip()}
-                Glass Type: {str(row['glass_type']).strip()}
-                Category: {str(row['category']).strip()}
-                Alcoholic: {str(row['alcoholic']).strip()}
-                """
-                
-                # Create metadata for searching
-                metadata = {
-                    'name': str(row['name']).strip(),
-                    'category': str(row['category']).strip(),
-                    'glass_type': str(row['glass_type']).strip(),
-                    'alcoholic': str(row['alcoholic']).strip(),
-                    'ingredients': ingredients_text,
-                    'source': 'cocktails_database',
-                    'type': 'cocktail'
-                }
-                
-                # Create Document object for vector store
-                doc = Document(
-                    page_content=content.strip(),
-                    metadata=metadata
-                )
-                
-                documents.append(doc)
-                
-            except Exception as row_error:
-                print(f"Warning: Error processing row {idx}: {str(row_error)}")
-                continue
-            
+        try:
+            for chunk in iter_catalog_chunks(csv_path):
+                if writer:
+                    writer.write(chunk)
+                documents.extend(build_documents(chunk))
+        except Exception:
+            if writer:
+                writer.abort()
+            raise
+
         if not documents:
+            if writer:
+                writer.abort()
             raise ValueError("No documents were successfully processed")
-            
+        if writer:
+            writer.commit(catalog_sha256)
+
         print(f"Successfully processed {len(documents)} cocktail recipes")
         return documents
         
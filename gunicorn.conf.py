@@ -0,0 +1,16 @@
+# Multi-worker deployment:
+#   VECTOR_STORE_MODE=shared gunicorn -c gunicorn.conf.py app.main:app
+#
+# preload_app imports app.main once in the master, so the index is loaded (or
+# built and persisted) a single time before workers are forked. In "shared"
+# mode every worker then serves the same memory-mapped files from the page
+# cache instead of holding a private copy of the index. SQLite stores (favorites,
+# embedding cache) open their connections lazily in each worker, never in the master.
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = 120
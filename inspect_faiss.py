@@ -1,6 +1,7 @@
 import faiss
 import numpy as np
 import os
+import json
 
 # Check if the index file exists
 index_path = "data/vector_store/index.faiss"
@@ -40,5 +41,15 @@ try:
         print(f"Number of centroids: {index.nlist}")
         print(f"Quantizer type: {type(index.quantizer)}")
 
+    # Show what the index was built from
+    manifest_path = "data/vector_store/manifest.json"
+    print("\n=== Index Manifest ===")
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            for key, value in json.load(f).items():
+                print(f"{key}: {value}")
+    else:
+        print("No manifest found (index will be rebuilt on next startup)")
+
 except Exception as e:
     print(f"Error loading or inspecting index: {e}")
\ No newline at end of file
@@ -0,0 +1,242 @@
+"""
+Retrieval micro-benchmark over synthetic catalogs.
+
+Generates catalogs with the data/cocktails.csv schema at each size, then
+times ingestion (cold and from the catalog cache), index build, index load
+and the main query paths with the local embedding provider, recording
+resident memory after each stage:
+
+    python scripts/benchmark_retrieval.py --sizes 400,10000,100000
+    python scripts/benchmark_retrieval.py --sizes 400 --compare benchmark_results/retrieval_<commit>.json
+
+Each size runs in its own process so memory numbers are not polluted by
+earlier sizes. Results are written as JSON named after the current commit.
+"""
+import argparse
+import ast
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE_CATALOG = os.path.join(ROOT, "data", "cocktails.csv")
+
+QUERIES = [
+    "refreshing summer drink with lime", "creamy dessert cocktail", "strong whiskey drink",
+    "fruity tropical punch", "hot drink for winter", "bitter aperitif", "sweet and sour",
+    "coffee cocktail", "light low alcohol spritz", "spicy tequila cocktail",
+]
+FAVORITES = ["lime", "rum", "mint"]
+
+
+def generate_catalog(size: int, path: str, seed: int = 0):
+    """Synthetic catalog that reuses the real catalog's vocabulary and list lengths"""
+    source = pd.read_csv(SOURCE_CATALOG)
+    rng = np.random.default_rng(seed)
+    ingredient_lists = source["ingredients"].apply(ast.literal_eval)
+    vocabulary = sorted({ingredient for ingredients in ingredient_lists for ingredient in ingredients})
+    measures = sorted({m for ms in source["ingredientMeasures"].apply(ast.literal_eval) for m in ms if m})
+    lengths = ingredient_lists.apply(len).to_numpy()
+
+    rows = rng.integers(0, len(source), size)
+    counts = lengths[rng.integers(0, len(lengths), size)]
+    ingredients, ingredient_measures = [], []
+    for count in counts:
+        picked = rng.choice(len(vocabulary), size=count, replace=False)
+        ingredients.append(str([vocabulary[i] for i in picked]))
+        ingredient_measures.append(str([measures[i] for i in rng.integers(0, len(measures), count)]))
+
+    catalog = pd.DataFrame({
+        "id": np.arange(size),
+        "name": [f"{source['name'].iloc[r]} {i}" for i, r in enumerate(rows)],
+        "alcoholic": source["alcoholic"].to_numpy()[rng.integers(0, len(source), size)],
+        "category": source["category"].to_numpy()[rng.integers(0, len(source), size)],
+        "glassType": source["glassType"].to_numpy()[rng.integers(0, len(source), size)],
+        "instructions": source["instructions"].to_numpy()[rows],
+        "drinkThumbnail": "",
+        "ingredients": ingredients,
+        "ingredientMeasures": ingredient_measures,
+        "text": "",
+    })
+    catalog.to_csv(path)
+
+
+def rss_mb() -> float:
+    """Current resident set size"""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def timed(func, *args, **kwargs) -> Dict:
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return {"seconds": time.perf_counter() - start, "rss_mb": rss_mb(), "peak_rss_mb": peak_rss_mb()}
+
+
+def latency(func, args_list: List[tuple], repeat: int) -> Dict:
+    samples = []
+    for _ in range(repeat):
+        for args in args_list:
+            start = time.perf_counter()
+            func(*args)
+            samples.append(time.perf_counter() - start)
+    samples_ms = np.asarray(samples) * 1000
+    return {
+        "n": len(samples),
+        "mean_ms": float(samples_ms.mean()),
+        "p50_ms": float(np.percentile(samples_ms, 50)),
+        "p95_ms": float(np.percentile(samples_ms, 95)),
+        "max_ms": float(samples_ms.max()),
+    }
+
+
+def run_size(size: int, workdir: str, repeat: int, seed: int) -> Dict:
+    """Benchmark one catalog size; runs in a fresh process"""
+    catalog_path = os.path.join(workdir, "cocktails.csv")
+    os.environ.update({
+        "EMBEDDING_PROVIDER": "local",
+        "COCKTAILS_CSV": catalog_path,
+        "VECTOR_STORE_DIR": os.path.join(workdir, "vector_store"),
+        "CATALOG_CACHE_DIR": os.path.join(workdir, "catalog_cache"),
+        "FAVORITES_DB_PATH": os.path.join(workdir, "favorites.sqlite"),
+        "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "unused"),
+    })
+    # The app resolves relative data paths from the repository root
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+
+    result = {"size": size, "stages": {}, "queries": {}}
+    result["stages"]["generate"] = timed(generate_catalog, size, catalog_path, seed)
+
+    from app.utils.data_processor import process_cocktail_data
+    from app.services.cocktail_service import CocktailService
+    result["stages"]["ingest"] = timed(process_cocktail_data, catalog_path)
+    result["stages"]["ingest_cached"] = timed(process_cocktail_data, catalog_path)
+    result["stages"]["build"] = timed(CocktailService)
+
+    # Drop the process-wide catalog so the next instance loads from disk
+    CocktailService._catalog = None
+    service = None
+
+    def load():
+        nonlocal service
+        service = CocktailService()
+
+    result["stages"]["load"] = timed(load)
+    for ingredient in FAVORITES:
+        service.add_favorite_ingredient(ingredient, "benchmark")
+
+    ingredients = service.ingredient_index.postings
+    common = sorted(ingredients, key=lambda name: -len(ingredients[name]))[:10]
+    queries = [(query,) for query in QUERIES]
+    result["queries"] = {
+        "search_cocktails": latency(service.search_cocktails, queries, repeat),
+        # BM25 alone, as served when the embedding service is down
+        "search_cocktails_lexical": latency(lambda query: service._search_query(query, None, 5), queries, repeat),
+        "search_cocktails_by_ingredient": latency(
+            service.search_cocktails_by_ingredient, [(name,) for name in common], repeat
+        ),
+        "search_cocktails_for_ingredients": latency(
+            service.search_cocktails_for_ingredients, [([a, b],) for a, b in zip(common, common[1:])], repeat
+        ),
+        "get_non_alcoholic_cocktails": latency(service.get_non_alcoholic_cocktails, [(5,), (10,)], repeat),
+        "search_with_preferences": latency(
+            lambda query: service.search_with_preferences(query, user_id="benchmark"), queries, repeat
+        ),
+    }
+    result["final_rss_mb"] = rss_mb()
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(current: Dict, baseline_path: str):
+    """Print current/baseline ratios for every timing present in both runs"""
+    with open(baseline_path) as f:
+        baseline = {run["size"]: run for run in json.load(f)["results"]}
+    print(f"\nCompared with {baseline_path} (ratio < 1 is faster):")
+    for run in current["results"]:
+        before = baseline.get(run["size"])
+        if before is None:
+            continue
+        for stage, values in run["stages"].items():
+            if stage in before["stages"]:
+                ratio = values["seconds"] / max(before["stages"][stage]["seconds"], 1e-9)
+                print(f"  {run['size']:>8} {stage:<34} {ratio:6.2f}x")
+        for query, values in run["queries"].items():
+            if query in before["queries"]:
+                ratio = values["p50_ms"] / max(before["queries"][query]["p50_ms"], 1e-9)
+                print(f"  {run['size']:>8} {query:<34} {ratio:6.2f}x (p50)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="400,4000,40000",
+                        help="comma-separated catalog sizes (e.g. 400,10000,100000,1000000)")
+    parser.add_argument("--repeat", type=int, default=5, help="passes over each query set")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="results file (default: benchmark_results/retrieval_<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--run-size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_size:
+        print(json.dumps(run_size(args.run_size, args.workdir, args.repeat, args.seed)))
+        return
+
+    commit = git_commit()
+    results = []
+    for size in [int(s) for s in args.sizes.split(",")]:
+        with tempfile.TemporaryDirectory(prefix=f"cocktail-bench-{size}-") as workdir:
+            print(f"Benchmarking {size} cocktails...", file=sys.stderr)
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--run-size", str(size), "--workdir", workdir,
+                 "--repeat", str(args.repeat), "--seed", str(args.seed)],
+                check=True, capture_output=True, text=True
+            ).stdout
+            # The app prints progress; the result is the last line
+            run = json.loads(output.strip().splitlines()[-1])
+            results.append(run)
+            stages = ", ".join(f"{name} {values['seconds']:.2f}s" for name, values in run["stages"].items())
+            queries = ", ".join(f"{name} {values['p50_ms']:.1f}ms" for name, values in run["queries"].items())
+            print(f"  {stages}\n  p50: {queries}\n  peak RSS {run['peak_rss_mb']:.0f} MB", file=sys.stderr)
+
+    report = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "embedding_provider": "local",
+        "results": results,
+    }
+    output_path = args.output or os.path.join(ROOT, "benchmark_results", f"retrieval_{commit}.json")
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output_path}", file=sys.stderr)
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""
+Build (or verify) the persisted vector store ahead of serving, so the first
+request of a fresh deployment does not pay for embedding the catalog:
+
+    OPENAI_API_KEY=... python scripts/build_index.py
+
+Uses the same configuration as the app (COCKTAILS_CSV, VECTOR_STORE_DIR,
+EMBEDDING_PROVIDER, VECTOR_INDEX_TYPE, ...). An index whose manifest already
+matches the catalog is only loaded, so running it again is cheap.
+"""
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database.index_manifest import load_manifest
+from app.services.cocktail_service import VECTOR_STORE_DIR, CocktailService
+
+
+def main():
+    CocktailService()
+    manifest = load_manifest(VECTOR_STORE_DIR) or {}
+    summary = {key: manifest.get(key) for key in ('num_documents', 'index_type', 'encoding', 'embedding_model', 'built_at')}
+    summary['embedding'] = manifest.get('embedding')
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
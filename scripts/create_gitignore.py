@@ -38,6 +38,11 @@ ENV/
 # Project specific
 data/vector_store/
 data/favorites.json
+data/favorites.sqlite*
+data/embedding_cache.sqlite*
+data/catalog_cache/
+data/mock_openai_cassette.jsonl
+benchmark_results/
 
 # Logs
 *.log
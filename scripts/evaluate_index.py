@@ -0,0 +1,166 @@
+"""
+Recall, latency and size of the approximate index types and vector encodings
+against exact search.
+
+Uses the catalog vectors exported next to the persisted index (vectors.npy in
+VECTOR_STORE_DIR), or a synthetic clustered set with --synthetic. Queries are
+catalog vectors with a little noise added, so their true neighbors are known
+from an exact flat search:
+
+    python scripts/evaluate_index.py --k 5 --nprobe 1,4,16,64 --ef-search 16,32,64,128
+    python scripts/evaluate_index.py --synthetic 200000 --dim 384
+    python scripts/evaluate_index.py --types flat --encodings fp32,fp16,sq8,pq --rerank
+
+Pick the smallest nprobe / efSearch whose recall@k is acceptable and set it
+with IVF_NPROBE / HNSW_EF_SEARCH; pick the encoding with VECTOR_ENCODING.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+import faiss
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database.index_factory import (
+    RERANK_FACTOR, build_index, configure_search, factory_string, is_exact, rerank_exact, search_parameters
+)
+from app.database.shared_index import VECTORS_FILE
+
+
+def load_vectors(args: argparse.Namespace) -> np.ndarray:
+    rng = np.random.default_rng(args.seed)
+    if args.synthetic:
+        # Gaussian clusters, roughly like topic structure in real embeddings
+        centers = rng.standard_normal((max(8, args.synthetic // 500), args.dim)).astype(np.float32)
+        vectors = centers[rng.integers(0, len(centers), args.synthetic)]
+        vectors += 0.5 * rng.standard_normal(vectors.shape).astype(np.float32)
+    else:
+        path = args.vectors or os.path.join(os.getenv("VECTOR_STORE_DIR", "data/vector_store"), VECTORS_FILE)
+        vectors = np.load(path)
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def make_queries(vectors: np.ndarray, count: int, noise: float, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed + 1)
+    queries = vectors[rng.integers(0, len(vectors), count)]
+    queries = queries + noise * rng.standard_normal(queries.shape).astype(np.float32) / np.sqrt(vectors.shape[1])
+    return np.ascontiguousarray(queries / np.linalg.norm(queries, axis=1, keepdims=True), dtype=np.float32)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    hits = sum(len(set(row[row >= 0]) & set(expected)) for row, expected in zip(found, truth))
+    return hits / (len(truth) * k)
+
+
+def measure(
+    index: faiss.Index, queries: np.ndarray, k: int, truth: np.ndarray, params,
+    rerank_vectors: Optional[np.ndarray] = None
+) -> Dict:
+    """Recall@k, per-query latency (one query at a time) and batched throughput"""
+    def search(query_vectors: np.ndarray) -> np.ndarray:
+        if rerank_vectors is None:
+            return index.search(query_vectors, k, params=params)[1]
+        _, candidates = index.search(query_vectors, k * RERANK_FACTOR, params=params)
+        return rerank_exact(query_vectors, candidates, rerank_vectors, k)[1]
+
+    latencies = []
+    found = np.empty((len(queries), k), dtype=np.int64)
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        found[i] = search(query[None, :])[0]
+        latencies.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    search(queries)
+    batch_seconds = time.perf_counter() - start
+    latencies_ms = np.asarray(latencies) * 1000
+    return {
+        "recall": recall_at_k(found, truth),
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+        "batch_qps": len(queries) / batch_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", help="vectors .npy file (default: VECTOR_STORE_DIR/vectors.npy)")
+    parser.add_argument("--synthetic", type=int, help="evaluate on this many synthetic vectors instead")
+    parser.add_argument("--dim", type=int, default=1536, help="dimension of synthetic vectors")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--noise", type=float, default=0.3, help="query perturbation relative to vector norm")
+    parser.add_argument("--nprobe", default="1,4,16,64")
+    parser.add_argument("--ef-search", default="16,32,64,128")
+    parser.add_argument("--types", default="flat,ivf,hnsw")
+    parser.add_argument("--encodings", default="fp32", help="comma-separated: fp32,fp16,sq8,pq")
+    parser.add_argument("--rerank", action="store_true", help="also report compressed encodings with exact rerank")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    vectors = load_vectors(args)
+    queries = make_queries(vectors, args.queries, args.noise, args.seed)
+    exact = build_index(vectors, "flat", "fp32")
+    _, truth = exact.search(queries, args.k)
+    print(f"{len(vectors)} vectors, dim {vectors.shape[1]}, {len(queries)} queries, k={args.k}")
+
+    results: List[Dict] = []
+    print(
+        f"{'index':<24}{'setting':<16}{'rerank':<8}{'recall@k':>10}{'p50 ms':>10}{'p95 ms':>10}"
+        f"{'batch qps':>12}{'size MB':>10}{'build s':>10}"
+    )
+    for index_type in args.types.split(","):
+        for encoding in args.encodings.split(","):
+            start = time.perf_counter()
+            index = build_index(vectors, index_type, encoding)
+            build_seconds = time.perf_counter() - start
+            size_mb = len(faiss.serialize_index(index)) / 2 ** 20
+            if index_type == "ivf":
+                settings = [("nprobe", int(v)) for v in args.nprobe.split(",")]
+            elif index_type == "hnsw":
+                settings = [("efSearch", int(v)) for v in args.ef_search.split(",")]
+            else:
+                settings = [("exhaustive", None)]
+            reranks = [False, True] if args.rerank and not is_exact(index) else [False]
+
+            for name, value in settings:
+                if name == "nprobe":
+                    configure_search(index, nprobe=value)
+                elif name == "efSearch":
+                    configure_search(index, ef_search=value)
+                for rerank in reranks:
+                    row = measure(
+                        index, queries, args.k, truth, search_parameters(index), vectors if rerank else None
+                    )
+                    row.update({
+                        "index_type": index_type,
+                        "encoding": encoding,
+                        "factory": factory_string(index_type, len(vectors), vectors.shape[1], encoding),
+                        "setting": name,
+                        "value": value,
+                        "rerank": rerank,
+                        "index_mb": size_mb,
+                        "build_seconds": build_seconds,
+                    })
+                    results.append(row)
+                    setting = f"{name}={value}" if value is not None else name
+                    print(
+                        f"{row['factory']:<24}{setting:<16}{'yes' if rerank else 'no':<8}{row['recall']:>10.3f}"
+                        f"{row['p50_ms']:>10.3f}{row['p95_ms']:>10.3f}{row['batch_qps']:>12.0f}"
+                        f"{size_mb:>10.2f}{build_seconds:>10.2f}"
+                    )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"vectors": len(vectors), "dimension": vectors.shape[1], "k": args.k, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Load generator for the chat API.
+
+Runs a fixed number of virtual users against /chat (or /chat/stream), each
+with its own session cookie, and reports latency percentiles, throughput
+and errors:
+
+    python scripts/load_test.py --url http://127.0.0.1:8080 --concurrency 20 --requests 500
+
+Run the app against scripts/mock_openai.py for offline, reproducible numbers.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+
+DEFAULT_MESSAGES = [
+    "Suggest a cocktail with gin and lime",
+    "What can I make with vodka and cranberry juice?",
+    "Show me some non-alcoholic drinks",
+    "I like rum",
+    "Recommend something fruity and refreshing",
+    "What are my favorite ingredients?",
+    "Give me 3 cocktails with tequila",
+    "Something similar to a Mojito",
+    "hello",
+    "What's a good drink for a cold evening?",
+]
+# The app answers failures with HTTP 200 and an apology, so those are counted as errors too
+FALLBACK_ANSWER = "I apologize, but I"
+
+
+async def send(client: httpx.AsyncClient, url: str, message: str, stream: bool) -> Dict:
+    """One request; returns latency, time to first byte and status"""
+    start = time.perf_counter()
+    first_byte = None
+    try:
+        if stream:
+            async with client.stream("POST", f"{url}/chat/stream", json={"text": message}) as response:
+                status = response.status_code
+                failed = False
+                async for line in response.aiter_lines():
+                    if first_byte is None and line.startswith("event: token"):
+                        first_byte = time.perf_counter() - start
+                    failed = failed or line.startswith("event: error")
+                if failed:
+                    status = 599
+        else:
+            response = await client.post(f"{url}/chat", json={"text": message})
+            status = response.status_code
+            if status == 200 and response.json().get("response", "").startswith(FALLBACK_ANSWER):
+                status = 599
+    except httpx.HTTPError as e:
+        return {"latency": time.perf_counter() - start, "ttfb": None, "status": 0, "error": type(e).__name__}
+    return {"latency": time.perf_counter() - start, "ttfb": first_byte, "status": status, "error": None}
+
+
+async def virtual_user(url: str, queue: asyncio.Queue, results: List[Dict], stream: bool, timeout: float):
+    # One client per user, so each keeps its own session_id cookie
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        while True:
+            message = await queue.get()
+            if message is None:
+                return
+            results.append(await send(client, url, message, stream))
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    return float(np.percentile(values, q)) if values else None
+
+
+def summarize(results: List[Dict], elapsed: float) -> Dict:
+    ok = [r for r in results if r["status"] == 200]
+    latencies = [r["latency"] for r in ok]
+    ttfbs = [r["ttfb"] for r in ok if r["ttfb"] is not None]
+    statuses: Dict[str, int] = {}
+    for r in results:
+        if r["status"] != 200:
+            key = r["error"] or str(r["status"])
+            statuses[key] = statuses.get(key, 0) + 1
+    summary = {
+        "requests": len(results),
+        "ok": len(ok),
+        "errors": len(results) - len(ok),
+        "error_breakdown": statuses,
+        "elapsed_s": elapsed,
+        "rps": len(ok) / elapsed if elapsed else 0.0,
+        "latency_s": {
+            "mean": float(np.mean(latencies)) if latencies else None,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": max(latencies) if latencies else None,
+        },
+    }
+    if ttfbs:
+        summary["ttfb_s"] = {"p50": percentile(ttfbs, 50), "p95": percentile(ttfbs, 95), "p99": percentile(ttfbs, 99)}
+    return summary
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    messages = DEFAULT_MESSAGES
+    if args.messages:
+        with open(args.messages) as f:
+            messages = [line.strip() for line in f if line.strip()]
+    rng = random.Random(args.seed)
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for _ in range(args.warmup + args.requests):
+        queue.put_nowait(rng.choice(messages))
+    for _ in range(args.concurrency):
+        queue.put_nowait(None)
+
+    results: List[Dict] = []
+    users = [
+        asyncio.create_task(virtual_user(args.url, queue, results, args.stream, args.timeout))
+        for _ in range(args.concurrency)
+    ]
+    # Warm-up requests populate caches and connections and are not reported
+    while len(results) < args.warmup:
+        await asyncio.sleep(0.01)
+    del results[:args.warmup]
+    start = time.perf_counter()
+    await asyncio.gather(*users)
+    return summarize(results, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--stream", action="store_true", help="drive /chat/stream and report time to first token")
+    parser.add_argument("--messages", help="file with one message per line (default: built-in mix)")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the summary as JSON to this file")
+    args = parser.parse_args()
+
+    summary = asyncio.run(run(args))
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "summary": summary}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+Local stand-in for the OpenAI chat completions and embeddings endpoints.
+
+Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:8090/v1 (any API key
+works). Latency, jitter and error rates are configurable so load tests can be
+run offline and reproducibly:
+
+    python scripts/mock_openai.py --latency-ms 300 --jitter-ms 100 --error-rate 0.01
+
+With --mode record, requests are forwarded to the real API and the responses
+saved to --cassette; --mode replay serves them back, falling back to synthetic
+responses for requests that were never recorded.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.services.embedding_provider import HashedNgramEmbeddings
+
+OPENAI_API_URL = "https://api.openai.com/v1"
+# text-embedding-ada-002 dimension, so indexes built against the mock match real ones in shape
+EMBEDDING_DIM = 1536
+
+UNDERSTANDING = {
+    "intent": {"primary": "cocktail_request", "secondary": "get_recipe", "requires_cocktail_context": True},
+    "preferences": {"action": "none", "ingredients": [], "show_current_favorites": False},
+    "cocktail_search": {
+        "type": "by_ingredient",
+        "filters": {"count": 3, "is_alcoholic": None, "ingredients": ["lime"], "excluded_ingredients": [],
+                    "similar_to": None, "category": None, "other_constraints": []}
+    },
+    "conversation": {"topic": "cocktails", "requires_clarification": False, "sentiment": "neutral", "is_follow_up": False},
+    "required_actions": []
+}
+ANSWER = (
+    "Here are a few cocktails you might enjoy. A Margarita combines tequila, triple sec and fresh lime juice, "
+    "shaken with ice and served in a salt-rimmed glass. A Mojito muddles mint with sugar and lime before "
+    "adding white rum and soda water. Let me know if you would like more suggestions."
+)
+
+
+class Settings:
+    def __init__(self, args: argparse.Namespace):
+        self.latency = args.latency_ms / 1000
+        self.jitter = args.jitter_ms / 1000
+        self.token_delay = args.token_delay_ms / 1000
+        self.error_rate = args.error_rate
+        self.rate_limit_rate = args.rate_limit_rate
+        self.mode = args.mode
+        self.cassette = args.cassette
+        self.seed = args.seed
+
+
+class Cassette:
+    """Recorded responses keyed by a hash of the endpoint and request body"""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self.entries[entry["key"]] = entry["response"]
+
+    @staticmethod
+    def key(endpoint: str, body: Dict) -> str:
+        body = {k: v for k, v in body.items() if k not in ("stream", "stream_options", "user")}
+        return hashlib.sha256(f"{endpoint}\0{json.dumps(body, sort_keys=True)}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        return self.entries.get(key)
+
+    def put(self, key: str, response: Dict):
+        with self._lock:
+            self.entries[key] = response
+            with open(self.path, "a") as f:
+                f.write(json.dumps({"key": key, "response": response}) + "\n")
+
+
+def _message_text(body: Dict) -> str:
+    return "\n".join(
+        str(message.get("content") or "") for message in body.get("messages", []) if message.get("role") != "system"
+    )
+
+
+def _usage(prompt: str, completion: str) -> Dict:
+    prompt_tokens = max(1, len(prompt) // 4)
+    completion_tokens = max(1, len(completion) // 4)
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+def synthetic_completion(body: Dict) -> Dict:
+    """Plausible completion for the prompts LLMService sends"""
+    prompt = _message_text(body)
+    message: Dict = {"role": "assistant", "content": ANSWER}
+    finish_reason = "stop"
+
+    tools = body.get("tools") or []
+    already_called = any(m.get("role") == "tool" for m in body.get("messages", []))
+    if tools and body.get("tool_choice") != "none" and not already_called:
+        names = [tool["function"]["name"] for tool in tools]
+        name = "SearchWithPreferences" if "SearchWithPreferences" in names else names[0]
+        arguments = {"query": prompt.splitlines()[-1] if prompt else "cocktail", "count": 3}
+        message = {"role": "assistant", "content": None, "tool_calls": [{
+            "id": f"call_{uuid.uuid4().hex[:24]}", "type": "function",
+            "function": {"name": name, "arguments": json.dumps(arguments)}
+        }]}
+        finish_reason = "tool_calls"
+    elif "analyze this message deeply" in prompt:
+        message["content"] = json.dumps(UNDERSTANDING)
+    elif "running summary" in prompt:
+        message["content"] = "The user asked for cocktail suggestions."
+
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "gpt-3.5-turbo"),
+        "choices": [{"index": 0, "message": message, "finish_reason": finish_reason, "logprobs": None}],
+        "usage": _usage(prompt, message.get("content") or ""),
+    }
+
+
+_embedder = HashedNgramEmbeddings(dimension=EMBEDDING_DIM)
+
+
+def synthetic_embeddings(body: Dict) -> Dict:
+    """Deterministic embeddings; token-id inputs are embedded by their ids"""
+    inputs = body.get("input", [])
+    if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+        inputs = [inputs]
+    texts: List[str] = [text if isinstance(text, str) else " ".join(map(str, text)) for text in inputs]
+    vectors = _embedder.embed_documents(texts)
+    return {
+        "object": "list",
+        "data": [{"object": "embedding", "index": i, "embedding": vector} for i, vector in enumerate(vectors)],
+        "model": body.get("model", "text-embedding-ada-002"),
+        "usage": {"prompt_tokens": sum(len(t) // 4 for t in texts), "total_tokens": sum(len(t) // 4 for t in texts)},
+    }
+
+
+def _chunk(completion: Dict, delta: Dict, finish_reason: Optional[str] = None) -> str:
+    chunk = {
+        "id": completion["id"], "object": "chat.completion.chunk", "created": completion["created"],
+        "model": completion["model"],
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason, "logprobs": None}],
+    }
+    return f"data: {json.dumps(chunk)}\n\n"
+
+
+async def stream_completion(completion: Dict, token_delay: float, include_usage: bool = False):
+    """Replay a completion as server-sent chunks, a few characters at a time"""
+    message = completion["choices"][0]["message"]
+    yield _chunk(completion, {"role": "assistant", "content": ""})
+    if message.get("tool_calls"):
+        calls = [{"index": i, **call} for i, call in enumerate(message["tool_calls"])]
+        yield _chunk(completion, {"tool_calls": calls})
+    content = message.get("content") or ""
+    for start in range(0, len(content), 16):
+        await asyncio.sleep(token_delay)
+        yield _chunk(completion, {"content": content[start:start + 16]})
+    yield _chunk(completion, {}, completion["choices"][0]["finish_reason"])
+    if include_usage:
+        # Like the real API with stream_options.include_usage: a final chunk with usage and no choices
+        chunk = {
+            "id": completion["id"], "object": "chat.completion.chunk", "created": completion["created"],
+            "model": completion["model"], "choices": [], "usage": completion.get("usage"),
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+def create_app(settings: Settings) -> FastAPI:
+    app = FastAPI(title="Mock OpenAI")
+    cassette = Cassette(settings.cassette)
+    rng = random.Random(settings.seed)
+    stats = {"requests": 0, "errors": 0, "rate_limited": 0, "replayed": 0, "recorded": 0}
+
+    async def upstream(endpoint: str, body: Dict, authorization: str) -> Dict:
+        import httpx
+        async with httpx.AsyncClient(timeout=120) as client:
+            response = await client.post(
+                f"{OPENAI_API_URL}/{endpoint}",
+                json={**body, "stream": False} if endpoint == "chat/completions" else body,
+                headers={"Authorization": authorization}
+            )
+            response.raise_for_status()
+            return response.json()
+
+    async def respond(request: Request, endpoint: str, synthesize):
+        body = await request.json()
+        stats["requests"] += 1
+        await asyncio.sleep(max(0.0, settings.latency + rng.uniform(-settings.jitter, settings.jitter)))
+
+        roll = rng.random()
+        if roll < settings.rate_limit_rate:
+            stats["rate_limited"] += 1
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached (mock)", "type": "requests", "code": "rate_limit_exceeded"}},
+                status_code=429, headers={"retry-after": "1"}
+            )
+        if roll < settings.rate_limit_rate + settings.error_rate:
+            stats["errors"] += 1
+            return JSONResponse({"error": {"message": "Internal error (mock)", "type": "server_error"}}, status_code=500)
+
+        key = Cassette.key(endpoint, body)
+        result = None
+        if settings.mode == "replay":
+            result = cassette.get(key)
+            if result is not None:
+                stats["replayed"] += 1
+        elif settings.mode == "record":
+            result = await upstream(endpoint, body, request.headers.get("authorization", ""))
+            cassette.put(key, result)
+            stats["recorded"] += 1
+        if result is None:
+            result = synthesize(body)
+
+        if body.get("stream"):
+            include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+            return StreamingResponse(
+                stream_completion(result, settings.token_delay, include_usage), media_type="text/event-stream"
+            )
+        return JSONResponse(result)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        return await respond(request, "chat/completions", synthetic_completion)
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        return await respond(request, "embeddings", synthetic_embeddings)
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=float(os.getenv("MOCK_LATENCY_MS", "200")))
+    parser.add_argument("--jitter-ms", type=float, default=float(os.getenv("MOCK_JITTER_MS", "50")))
+    parser.add_argument("--token-delay-ms", type=float, default=float(os.getenv("MOCK_TOKEN_DELAY_MS", "20")),
+                        help="delay between streamed chunks")
+    parser.add_argument("--error-rate", type=float, default=float(os.getenv("MOCK_ERROR_RATE", "0")),
+                        help="fraction of requests answered with HTTP 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=float(os.getenv("MOCK_RATE_LIMIT_RATE", "0")),
+                        help="fraction of requests answered with HTTP 429")
+    parser.add_argument("--mode", choices=["synthetic", "record", "replay"], default="synthetic")
+    parser.add_argument("--cassette", default="data/mock_openai_cassette.jsonl")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(Settings(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
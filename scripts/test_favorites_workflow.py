@@ -51,16 +51,10 @@ async def test_favorites_workflow():
     persisted_favorites = new_service.get_favorite_ingredients()
     print(f"Favorites from new instance: {persisted_favorites}")
     
-    # 5. Check favorites.json file
-    print("\n5. Checking favorites.json file:")
-    favorites_file = "data/favorites.json"
-    if os.path.exists(favorites_file):
-        with open(favorites_file, 'r') as f:
-            import json
-            file_content = json.load(f)
-            print(f"File contents: {file_content}")
-    else:
-        print("favorites.json file not found!")
+    # 5. Check the favorites database
+    print("\n5. Checking favorites database:")
+    from app.database.favorites_store import DEFAULT_USER
+    print(f"Stored favorites: {sorted(new_service.favorites.get(DEFAULT_USER))}")
 
 if __name__ == "__main__":
     asyncio.run(test_favorites_workflow()) 
\ No newline at end of file
@@ -0,0 +1,51 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.database.index_factory import build_index
+from app.database.metadata_index import EXACT_FILTER_MAX, ids_to_bitmap, search_with_bitmap
+
+
+def _catalog(num_vectors: int = 30000, dimension: int = 64, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((60, dimension)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), num_vectors)]
+    return vectors + 0.5 * rng.standard_normal(vectors.shape).astype(np.float32)
+
+
+def _exact_top_k(vectors: np.ndarray, queries: np.ndarray, allowed: np.ndarray, k: int) -> np.ndarray:
+    distances = ((queries[:, None, :] - vectors[allowed][None, :, :]) ** 2).sum(axis=2)
+    return allowed[np.argsort(distances, axis=1, kind='stable')[:, :k]]
+
+
+def test_filtered_search():
+    print("\n=== Testing Filtered Search on Approximate Indexes ===")
+    vectors = _catalog()
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(0, len(vectors), 20)] + 0.1
+    k = 10
+
+    for index_type in ("hnsw", "ivf"):
+        index = build_index(vectors, index_type)
+        # A selective filter (like glass_type='jar') and one too large for the exact scan
+        for count in (66, EXACT_FILTER_MAX * 4):
+            allowed = np.sort(rng.choice(len(vectors), count, replace=False))
+            _, ids = search_with_bitmap(index, queries, k, ids_to_bitmap(allowed, len(vectors)))
+            found = (ids >= 0).sum(axis=1)
+            assert found.min() == k, f"{index_type}: only {found.min()} of {k} results for {count} matches"
+            assert np.isin(ids, allowed).all(), f"{index_type}: result outside the filter"
+            if count <= EXACT_FILTER_MAX:
+                assert (ids == _exact_top_k(vectors, queries, allowed, k)).all(), f"{index_type}: not exact"
+            print(f"✓ {index_type}, {count} matching rows: {k} results for every query")
+
+        # Fewer matches than k: every match comes back
+        allowed = np.arange(3)
+        _, ids = search_with_bitmap(index, queries, k, ids_to_bitmap(allowed, len(vectors)))
+        assert ((ids >= 0).sum(axis=1) == 3).all()
+        print(f"✓ {index_type}, 3 matching rows: all 3 returned")
+
+
+if __name__ == "__main__":
+    test_filtered_search()